@@ -0,0 +1,131 @@
+"""Compare per-lecture stat calls with the directory index on a slow filesystem stand-in.
+
+Usage: python benchmarks/directory_index.py [--chapters 20] [--lectures 25] [--latency-ms 2]
+
+Every metadata call (stat, directory listing, per-entry stat) sleeps for
+``--latency-ms`` first, the way a round trip to an NFS or SMB server would. The
+old path checks each lecture with ``isfile`` and ``getsize``, two stats each;
+the new path lists every chapter folder once and reads sizes from the listing.
+"""
+
+import argparse
+import os
+import stat
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from download_cache import DirectoryIndex, DownloadCache  # noqa: E402
+
+
+class SlowFilesystem:
+    def __init__(self, latency):
+        self.latency = latency
+        self.calls = 0
+
+    def _wait(self):
+        self.calls += 1
+        time.sleep(self.latency)
+
+    def stat(self, path):
+        self._wait()
+        return os.stat(path)
+
+    def scandir(self, path):
+        self._wait()
+        return _SlowListing(self, os.scandir(path))
+
+
+class _SlowListing:
+    def __init__(self, filesystem, listing):
+        self.filesystem = filesystem
+        self.listing = listing
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.listing.close()
+
+    def __iter__(self):
+        return (_SlowEntry(self.filesystem, entry) for entry in self.listing)
+
+
+class _SlowEntry:
+    """is_file() comes with the listing (d_type); stat() is another round trip."""
+
+    def __init__(self, filesystem, entry):
+        self.filesystem = filesystem
+        self.entry = entry
+        self.name = entry.name
+
+    def is_file(self):
+        return self.entry.is_file()
+
+    def stat(self):
+        self.filesystem._wait()
+        return self.entry.stat()
+
+
+def make_course(root, chapters, lectures):
+    """Write small lecture files (with a caption beside each) and return the completed plan."""
+    cache = DownloadCache("bench", os.path.join(root, "cache"))
+    plan = []
+    for chapter in range(1, chapters + 1):
+        folder = os.path.join(root, f"{chapter:02d} Chapter")
+        os.makedirs(folder)
+        for lecture in range(1, lectures + 1):
+            path = os.path.join(folder, f"{lecture:03d} Lecture.mp4")
+            with open(path, "wb") as file:
+                file.write(b"\0" * lecture)
+            with open(os.path.join(folder, f"{lecture:03d} Lecture_en.srt"), "wb") as file:
+                file.write(b"1\n")
+            cache.mark_download_completed(cache.mark_download_started(chapter, lecture, "Lecture", lecture, "Video"), path)
+            plan.append((chapter, lecture, path))
+    cache.save_cache()
+    return plan
+
+
+def per_lecture_stats(root, plan, filesystem):
+    """The previous check: isfile() then getsize(), one stat each."""
+    cache = DownloadCache("bench", os.path.join(root, "cache"))
+    done = 0
+    for chapter, lecture, path in plan:
+        record = cache.cache_data["downloads"][cache.get_download_key(chapter, lecture, "Lecture")]
+        if stat.S_ISREG(filesystem.stat(path).st_mode) and filesystem.stat(path).st_size == record["file_size"]:
+            done += 1
+    return done
+
+
+def directory_index(root, plan, filesystem):
+    index = DirectoryIndex(scandir=filesystem.scandir, stat_path=filesystem.stat)
+    cache = DownloadCache("bench", os.path.join(root, "cache"), directory_index=index)
+    return sum(cache.is_download_completed(chapter, lecture, "Lecture", path)[0] for chapter, lecture, path in plan)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--chapters", type=int, default=20)
+    parser.add_argument("--lectures", type=int, default=25, help="Lectures per chapter")
+    parser.add_argument("--latency-ms", type=float, default=2, help="Delay added to every metadata call")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as root:
+        plan = make_course(root, args.chapters, args.lectures)
+        print(f"{len(plan)} completed lectures in {args.chapters} folders, {args.latency_ms:g} ms per metadata call")
+        print(f"{'method':<18}{'calls':>8}{'time':>10}{'completed':>11}")
+        timings = []
+        for label, check in (("per-lecture stat", per_lecture_stats), ("directory index", directory_index)):
+            filesystem = SlowFilesystem(args.latency_ms / 1000)
+            start = time.perf_counter()
+            done = check(root, plan, filesystem)
+            elapsed = time.perf_counter() - start
+            timings.append(elapsed)
+            print(f"{label:<18}{filesystem.calls:>8}{elapsed:>9.2f}s{done:>11}")
+    print(f"speed-up {timings[0] / timings[1]:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
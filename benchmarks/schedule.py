@@ -0,0 +1,80 @@
+"""Simulate the total download time of a course under each scheduling policy.
+
+Usage: python benchmarks/schedule.py [--workers 4] [--curriculum saved.json]
+
+Each lecture takes a fixed overhead plus a time proportional to its
+``time_estimation``; lectures are handed in policy order to whichever worker
+becomes free first, the way the dispatcher does. Without ``--curriculum`` a few
+typical course shapes are generated; with it, a curriculum saved by
+``main.py --save`` is used.
+"""
+
+import argparse
+import heapq
+import json
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils import schedule  # noqa: E402
+
+
+def lecture(seconds):
+    return {"_class": "lecture", "asset": {"asset_type": "Video", "time_estimation": seconds}}
+
+
+def generated_courses(seed=1):
+    rng = random.Random(seed)
+    short = lambda: int(rng.lognormvariate(6, 0.6))  # noqa: E731 - around 7 minutes, a few up to half an hour
+    return {
+        "typical course": [[lecture(short()) for _ in range(12)] for _ in range(15)],
+        "long project at the end": [[lecture(short()) for _ in range(10)] for _ in range(10)]
+        + [[lecture(rng.randint(2, 3) * 3600) for _ in range(3)]],
+        "recorded live sessions": [[lecture(rng.randint(45, 180) * 60) for _ in range(4)] for _ in range(6)],
+        "mixed with articles": [[lecture(short()) if rng.random() < 0.7 else {"_class": "lecture", "asset": {"asset_type": "Article"}}
+                                 for _ in range(15)] for _ in range(10)],
+    }
+
+
+def load_course(path):
+    with open(path, "r", encoding="utf-8") as file:
+        curriculum = json.load(file)
+    return [[item for item in chapter.get("children", []) if item.get("_class") == "lecture"] for chapter in curriculum]
+
+
+def plan_for(chapters):
+    return [(f"{mindex:02}", {}, f"{lindex:02}", item, mindex)
+            for mindex, lectures in enumerate(chapters, start=1) for lindex, item in enumerate(lectures, start=1)]
+
+
+def makespan(plan, workers, seconds_per_video_second, overhead):
+    free_at = [0.0] * workers
+    for entry in plan:
+        start = heapq.heappop(free_at)
+        heapq.heappush(free_at, start + overhead + schedule.estimated_seconds(entry[3]) * seconds_per_video_second)
+    return max(free_at)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", type=int, default=4, help="Lectures downloaded at once (--concurrent)")
+    parser.add_argument("--speed", type=float, default=0.05, help="Download seconds per second of video")
+    parser.add_argument("--overhead", type=float, default=3, help="Fixed seconds per lecture (API calls, remux)")
+    parser.add_argument("--curriculum", help="A curriculum saved with --save instead of the generated shapes")
+    args = parser.parse_args()
+
+    courses = {os.path.basename(args.curriculum): load_course(args.curriculum)} if args.curriculum else generated_courses()
+    print(f"{args.workers} workers; times in minutes; bound = max(total / workers, longest lecture)")
+    print(f"{'course':<26}{'lectures':>9}{'bound':>8}" + "".join(f"{policy:>15}" for policy in schedule.POLICIES))
+    for name, chapters in courses.items():
+        plan = plan_for(chapters)
+        costs = [args.overhead + schedule.estimated_seconds(entry[3]) * args.speed for entry in plan]
+        bound = max(sum(costs) / args.workers, max(costs, default=0))
+        spans = [makespan(schedule.order(plan, policy), args.workers, args.speed, args.overhead) for policy in schedule.POLICIES]
+        print(f"{name:<26}{len(plan):>9}{bound / 60:>8.1f}" + "".join(f"{span / 60:>15.1f}" for span in spans))
+
+
+if __name__ == "__main__":
+    main()
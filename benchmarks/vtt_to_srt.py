@@ -0,0 +1,86 @@
+"""Compare the old file round-trip SRT conversion with the single-pass converter.
+
+Usage: python benchmarks/vtt_to_srt.py [--hours 6] [--repeat 5]
+
+The old path writes the VTT, parses it with webvtt, writes the SRT and deletes
+the VTT. The new path converts the downloaded bytes and writes only the SRT.
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import webvtt  # noqa: E402
+
+from utils.vtt_to_srt import vtt_to_srt  # noqa: E402
+
+
+def make_captions(hours, cue_seconds=3):
+    lines = ["WEBVTT", "Kind: captions", "Language: en", ""]
+    for index in range(int(hours * 3600 / cue_seconds)):
+        start = index * cue_seconds
+        lines += [
+            f"{start // 3600:02d}:{start // 60 % 60:02d}:{start % 60:02d}.000 --> "
+            f"{(start + 2) // 3600:02d}:{(start + 2) // 60 % 60:02d}:{(start + 2) % 60:02d}.500 align:start position:0%",
+            f"<c>cue {index}</c> and a typical amount of spoken text for one caption",
+            "with a second line that wraps around",
+            "",
+        ]
+    return "\n".join(lines).encode("utf-8")
+
+
+def round_trip(data, directory):
+    vtt_path, srt_path = os.path.join(directory, "old.vtt"), os.path.join(directory, "old.srt")
+    with open(vtt_path, "wb") as file:
+        file.write(data)
+    webvtt.read(vtt_path).save_as_srt(srt_path)
+    os.remove(vtt_path)
+    return srt_path
+
+
+def single_pass(data, directory):
+    srt_path = os.path.join(directory, "new.srt")
+    with open(srt_path, "wb") as file:
+        file.write(vtt_to_srt(data))
+    return srt_path
+
+
+def measure(fn, data, directory, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(data, directory)
+        best = min(best, time.perf_counter() - start)
+    tracemalloc.start()
+    fn(data, directory)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return best, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--hours", type=float, default=6, help="Length of the generated caption track")
+    parser.add_argument("--repeat", type=int, default=5, help="Timed runs per method; the best is reported")
+    args = parser.parse_args()
+
+    data = make_captions(args.hours)
+    print(f"{args.hours:g} h of captions: {len(data) / 1024 ** 2:.1f} MiB VTT")
+    with tempfile.TemporaryDirectory() as directory:
+        old_time, old_peak = measure(round_trip, data, directory, args.repeat)
+        new_time, new_peak = measure(single_pass, data, directory, args.repeat)
+        with open(os.path.join(directory, "old.srt"), "rb") as old, open(os.path.join(directory, "new.srt"), "rb") as new:
+            identical = old.read() == new.read()
+    print(f"{'method':<14}{'best time':>12}{'peak alloc':>14}")
+    print(f"{'round trip':<14}{old_time * 1000:>10.1f}ms{old_peak / 1024 ** 2:>11.1f}MiB")
+    print(f"{'single pass':<14}{new_time * 1000:>10.1f}ms{new_peak / 1024 ** 2:>11.1f}MiB")
+    print(f"speed-up {old_time / new_time:.1f}x, peak allocation {old_peak / max(new_peak, 1):.1f}x lower, identical output: {identical}")
+
+
+if __name__ == "__main__":
+    main()
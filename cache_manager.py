@@ -17,16 +17,16 @@ def list_all_caches():
         print("❌ No cache directory found")
         return
 
-    cache_files = list(cache_dir.glob("course_*.json"))
-    if not cache_files:
+    # A course whose journal was never compacted has no snapshot file yet.
+    course_ids = sorted({path.stem.replace("course_", "") for pattern in ("course_*.json", "course_*.journal") for path in cache_dir.glob(pattern)})
+    if not course_ids:
         print("❌ No cache files found")
         return
 
     print("📁 Available Course Caches:")
     print("=" * 50)
 
-    for cache_file in cache_files:
-        course_id = cache_file.stem.replace("course_", "")
+    for course_id in course_ids:
         cache = DownloadCache(course_id)
         summary = cache.get_download_summary()
 
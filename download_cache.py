@@ -4,31 +4,209 @@
 import hashlib
 import json
 import os
+import stat
 import tempfile
 import threading
 from datetime import datetime
 from pathlib import Path
 
 
+# Journal entries folded into the snapshot before the journal is truncated.
+JOURNAL_COMPACT_EVERY = 500
+
+
+class JsonFileStore:
+    """Original backend: every change atomically rewrites the whole cache file."""
+
+    def __init__(self, cache_file):
+        self.cache_file = Path(cache_file)
+
+    def load(self):
+        if not self.cache_file.exists():
+            return None
+        with self.cache_file.open("r", encoding="utf-8") as file:
+            cache_data = json.load(file)
+        if not isinstance(cache_data.get("downloads"), dict):
+            raise json.JSONDecodeError("downloads must be an object", "", 0)
+        return cache_data
+
+    def replay(self, cache_data):
+        return 0
+
+    def record(self, cache_data, section, key):
+        self.write_snapshot(cache_data)
+
+    def write_snapshot(self, cache_data):
+        temp_name = None
+        try:
+            with tempfile.NamedTemporaryFile("w", encoding="utf-8", delete=False, dir=self.cache_file.parent, suffix=".tmp") as file:
+                json.dump(cache_data, file, indent=2, ensure_ascii=False)
+                temp_name = file.name
+            os.replace(temp_name, self.cache_file)
+        except OSError as error:
+            if temp_name and os.path.exists(temp_name):
+                os.unlink(temp_name)
+            print(f"Failed to save cache: {error}")
+            return False
+        return True
+
+    def close(self, cache_data):
+        pass
+
+    def clear(self):
+        if self.cache_file.exists():
+            self.cache_file.unlink()
+
+
+class JournalStore(JsonFileStore):
+    """Append each record change to ``course_<id>.journal`` and fold it into the JSON snapshot periodically.
+
+    The snapshot keeps the original file format, so caches written by older versions load
+    unchanged and are carried over the first time the journal is compacted.
+    """
+
+    def __init__(self, cache_file, compact_every=JOURNAL_COMPACT_EVERY):
+        super().__init__(cache_file)
+        self.journal_file = self.cache_file.with_suffix(".journal")
+        self.compact_every = compact_every
+        self._journal = None
+        self._pending = 0
+
+    def replay(self, cache_data):
+        if not self.journal_file.exists():
+            return 0
+        applied = 0
+        with self.journal_file.open("r", encoding="utf-8") as file:
+            for line in file:
+                try:
+                    event = json.loads(line)
+                    cache_data.setdefault(event["section"], {})[event["key"]] = event["record"]
+                except (json.JSONDecodeError, KeyError, TypeError, AttributeError):
+                    continue  # A torn final line from an interrupted run.
+                cache_data["last_updated"] = event.get("at", cache_data.get("last_updated"))
+                applied += 1
+        self._pending = applied
+        return applied
+
+    def record(self, cache_data, section, key):
+        event = {"section": section, "key": key, "record": cache_data[section][key], "at": cache_data["last_updated"]}
+        try:
+            if self._journal is None:
+                self._journal = self.journal_file.open("a", encoding="utf-8")
+            self._journal.write(json.dumps(event, ensure_ascii=False) + "\n")
+            self._journal.flush()
+        except OSError as error:
+            print(f"Failed to append to the cache journal: {error}")
+            self.write_snapshot(cache_data)
+            return
+        self._pending += 1
+        if self._pending >= self.compact_every:
+            self.write_snapshot(cache_data)
+
+    def write_snapshot(self, cache_data):
+        if not super().write_snapshot(cache_data):
+            return False
+        self._close_journal()
+        try:
+            self.journal_file.unlink(missing_ok=True)
+        except OSError as error:
+            print(f"Failed to truncate the cache journal: {error}")
+        self._pending = 0
+        return True
+
+    def close(self, cache_data):
+        if self._pending:
+            self.write_snapshot(cache_data)
+        self._close_journal()
+
+    def clear(self):
+        self._close_journal()
+        self.journal_file.unlink(missing_ok=True)
+        self._pending = 0
+        super().clear()
+
+    def _close_journal(self):
+        if self._journal is not None:
+            self._journal.close()
+            self._journal = None
+
+
+STORAGE_BACKENDS = {"json": JsonFileStore, "journal": JournalStore}
+
+
+class DirectoryIndex:
+    """What is already on disk, read with one ``scandir`` per output folder instead of a stat per lecture.
+
+    A folder is listed the first time something inside it is looked up and kept for the
+    rest of the run. Existence comes from the listing itself; a file's size comes from
+    its entry on first use and is stat'ed again on later lookups, so a file that changes
+    during the run is noticed. Files written during the run are recorded through ``refresh``.
+    """
+
+    def __init__(self, scandir=os.scandir, stat_path=os.stat):
+        self._scandir = scandir
+        self._stat_path = stat_path
+        self._lock = threading.Lock()
+        self._folders = {}
+
+    def _list(self, folder):
+        try:
+            with self._scandir(folder) as entries:
+                return {entry.name: entry for entry in entries}
+        except (FileNotFoundError, NotADirectoryError):
+            return {}
+
+    def stat(self, path):
+        """Return the ``stat_result`` of the regular file at ``path``, or None if there is none."""
+        folder, name = os.path.split(os.path.abspath(path))
+        with self._lock:
+            entries = self._folders.get(folder)
+            if entries is None:
+                entries = self._folders[folder] = self._list(folder)
+            entry = entries.get(name)
+            if entry is None:
+                return None
+            if not isinstance(entry, os.stat_result):
+                try:
+                    result = entry.stat() if entry.is_file() else None
+                except OSError:
+                    result = None
+                entries[name] = result
+                return result
+        return self.refresh(path)
+
+    def refresh(self, path):
+        """Stat ``path`` once after it was written and keep the result for later lookups."""
+        folder, name = os.path.split(os.path.abspath(path))
+        try:
+            result = self._stat_path(path)
+        except OSError:
+            result = None
+        if result is not None and not stat.S_ISREG(result.st_mode):
+            result = None
+        with self._lock:
+            entries = self._folders.get(folder)
+            if entries is not None:
+                entries[name] = result
+        return result
+
+
 class DownloadCache:
-    def __init__(self, course_id, cache_dir="cache"):
+    def __init__(self, course_id, cache_dir="cache", backend="journal", directory_index=None):
         self.course_id = str(course_id)
         self.cache_dir = Path(cache_dir)
         self.cache_dir.mkdir(exist_ok=True)
         self.cache_file = self.cache_dir / f"course_{self.course_id}.json"
+        self.storage = STORAGE_BACKENDS[backend](self.cache_file)
         self._lock = threading.RLock()
+        self.directory_index = directory_index or DirectoryIndex()
         self.cache_data = self.load_cache()
+        self.cache_data.setdefault("files", {})
+        self._rebuild_index()
 
     def load_cache(self):
-        if not self.cache_file.exists():
-            return self.create_new_cache()
         try:
-            with self.cache_file.open("r", encoding="utf-8") as file:
-                cache_data = json.load(file)
-            if not isinstance(cache_data.get("downloads"), dict):
-                raise json.JSONDecodeError("downloads must be an object", "", 0)
-            print(f"Loaded download cache for course {self.course_id}")
-            return cache_data
+            cache_data = self.storage.load()
         except (json.JSONDecodeError, OSError) as error:
             backup_path = self.cache_file.with_suffix(self.cache_file.suffix + f".corrupt-{datetime.now():%Y%m%d%H%M%S}")
             try:
@@ -36,27 +214,44 @@ class DownloadCache:
                 print(f"Cache was corrupt ({error}); moved it to {backup_path}.")
             except OSError:
                 print(f"Cache was corrupt ({error}); creating a new cache.")
-            return self.create_new_cache()
+            cache_data = None
+        loaded = cache_data is not None
+        if cache_data is None:
+            cache_data = self.create_new_cache()
+        if self.storage.replay(cache_data) or loaded:
+            print(f"Loaded download cache for course {self.course_id}")
+        return cache_data
 
     def create_new_cache(self):
         now = datetime.now().isoformat()
         return {"course_id": self.course_id, "created_at": now, "last_updated": now,
                 "total_downloads": 0, "completed_downloads": 0,
-                "failed_downloads": 0, "downloads": {}, "curriculum": None}
+                "failed_downloads": 0, "downloads": {}, "files": {}, "curriculum": None}
 
     def save_cache(self):
+        """Write a full snapshot; per-record changes go through ``_save_record`` instead."""
         with self._lock:
             self.cache_data["last_updated"] = datetime.now().isoformat()
-            temp_name = None
-            try:
-                with tempfile.NamedTemporaryFile("w", encoding="utf-8", delete=False, dir=self.cache_dir, suffix=".tmp") as file:
-                    json.dump(self.cache_data, file, indent=2, ensure_ascii=False)
-                    temp_name = file.name
-                os.replace(temp_name, self.cache_file)
-            except OSError as error:
-                if temp_name and os.path.exists(temp_name):
-                    os.unlink(temp_name)
-                print(f"Failed to save cache: {error}")
+            self.storage.write_snapshot(self.cache_data)
+
+    def _save_record(self, key, section="downloads"):
+        with self._lock:
+            self.cache_data["last_updated"] = datetime.now().isoformat()
+            self.storage.record(self.cache_data, section, key)
+
+    def _rebuild_index(self):
+        """Recompute the status -> keys index from the records; done once per load."""
+        self._status_index = {}
+        for key, record in self.cache_data["downloads"].items():
+            self._status_index.setdefault(record.get("status"), set()).add(key)
+        self._sync_counts()
+
+    def _set_status(self, key, record, status):
+        previous = record.get("status")
+        if previous in self._status_index:
+            self._status_index[previous].discard(key)
+        record["status"] = status
+        self._status_index.setdefault(status, set()).add(key)
 
     def get_download_key(self, chapter_index, lecture_index, lecture_title):
         key_string = f"{chapter_index}_{lecture_index}_{lecture_title}"
@@ -69,45 +264,84 @@ class DownloadCache:
             if not record or record.get("status") != "completed":
                 return False, None
             cached_size = record.get("file_size", 0)
-        if not os.path.isfile(expected_path) or cached_size <= 0:
+        on_disk = self.directory_index.stat(expected_path)
+        if on_disk is None or cached_size <= 0:
             return False, None
-        return (os.path.getsize(expected_path) == cached_size), record
+        return (on_disk.st_size == cached_size), record
 
     def mark_download_started(self, chapter_index, lecture_index, lecture_title, lecture_id, asset_type):
         key = self.get_download_key(chapter_index, lecture_index, lecture_title)
         with self._lock:
             previous = self.cache_data["downloads"].get(key, {})
-            self.cache_data["downloads"][key] = {
+            record = {
                 "chapter_index": chapter_index, "lecture_index": lecture_index,
                 "lecture_title": lecture_title, "lecture_id": lecture_id,
-                "asset_type": asset_type, "status": "started",
+                "asset_type": asset_type, "status": previous.get("status"),
                 "started_at": datetime.now().isoformat(), "file_size": 0,
                 "file_path": "", "attempts": previous.get("attempts", 0) + 1,
             }
+            self._set_status(key, record, "started")
+            self.cache_data["downloads"][key] = record
             self._sync_counts()
-            self.save_cache()
+            self._save_record(key)
         return key
 
+    def get_record(self, key):
+        """A copy of the lecture's record, or None."""
+        with self._lock:
+            record = self.cache_data["downloads"].get(key)
+            return dict(record) if record is not None else None
+
+    def record_retry(self, key):
+        """Count an automatic retry made while the lecture was downloading."""
+        with self._lock:
+            record = self.cache_data["downloads"].get(key)
+            if record is None:
+                return
+            record["attempts"] = record.get("attempts", 0) + 1
+            self._save_record(key)
+
     def mark_download_completed(self, key, file_path):
-        if not os.path.isfile(file_path) or os.path.getsize(file_path) <= 0:
+        on_disk = self.directory_index.refresh(file_path)
+        if on_disk is None or on_disk.st_size <= 0:
             self.mark_download_failed(key, "Expected output file was not created or is empty.")
             return
         with self._lock:
-            if key not in self.cache_data["downloads"]:
+            record = self.cache_data["downloads"].get(key)
+            if record is None:
                 return
-            self.cache_data["downloads"][key].update({"status": "completed", "completed_at": datetime.now().isoformat(),
-                                                        "file_path": str(file_path), "file_size": os.path.getsize(file_path)})
+            self._set_status(key, record, "completed")
+            record.update({"completed_at": datetime.now().isoformat(), "file_path": str(file_path), "file_size": on_disk.st_size})
             self._sync_counts()
-            self.save_cache()
+            self._save_record(key)
 
     def mark_download_failed(self, key, error_message=""):
         with self._lock:
             record = self.cache_data["downloads"].get(key)
             if not record:
                 return
-            record.update({"status": "failed", "failed_at": datetime.now().isoformat(), "error": str(error_message)})
+            self._set_status(key, record, "failed")
+            record.update({"failed_at": datetime.now().isoformat(), "error": str(error_message)})
             self._sync_counts()
-            self.save_cache()
+            self._save_record(key)
+
+    def is_file_completed(self, file_key, path):
+        """True when a supplementary file or caption was finished earlier and is still intact on disk."""
+        with self._lock:
+            record = self.cache_data["files"].get(file_key)
+        if not record:
+            return False
+        on_disk = self.directory_index.stat(path)
+        return on_disk is not None and on_disk.st_size == record.get("size")
+
+    def mark_file_completed(self, file_key, path, etag=None):
+        on_disk = self.directory_index.refresh(path)
+        if on_disk is None:
+            raise FileNotFoundError(path)
+        with self._lock:
+            self.cache_data["files"][file_key] = {"path": str(path), "size": on_disk.st_size, "etag": etag,
+                                                  "completed_at": datetime.now().isoformat()}
+            self._save_record(file_key, "files")
 
     def _sync_counts(self):
         summary = self.get_download_summary()
@@ -116,30 +350,57 @@ class DownloadCache:
 
     def get_download_summary(self):
         with self._lock:
-            records = list(self.cache_data["downloads"].values())
-        completed = sum(record.get("status") == "completed" for record in records)
-        failed = sum(record.get("status") == "failed" for record in records)
-        total = len(records)
+            total = len(self.cache_data["downloads"])
+            completed = len(self._status_index.get("completed", ()))
+            failed = len(self._status_index.get("failed", ()))
         return {"total": total, "completed": completed, "failed": failed,
                 "in_progress": total - completed - failed,
                 "completion_rate": (completed / total * 100) if total else 0}
 
+    def failures_by_type(self):
+        """Failed lectures counted by asset type."""
+        with self._lock:
+            counts = {}
+            for key in self._status_index.get("failed", ()):
+                asset_type = self.cache_data["downloads"][key].get("asset_type") or "unknown"
+                counts[asset_type] = counts.get(asset_type, 0) + 1
+        return counts
+
+    def check_consistency(self):
+        """Recount every record from scratch and describe any drift from the incremental index."""
+        with self._lock:
+            expected = {}
+            for key, record in self.cache_data["downloads"].items():
+                expected.setdefault(record.get("status"), set()).add(key)
+            problems = [f"status {status!r}: index has {len(self._status_index.get(status, ()))}, records have {len(keys)}"
+                        for status, keys in expected.items() if self._status_index.get(status, set()) != keys]
+            problems += [f"status {status!r}: index has {len(keys)}, records have 0"
+                         for status, keys in self._status_index.items() if keys and status not in expected]
+            for field, status in (("completed_downloads", "completed"), ("failed_downloads", "failed")):
+                if self.cache_data.get(field) != len(expected.get(status, ())):
+                    problems.append(f"{field} is {self.cache_data.get(field)}, records have {len(expected.get(status, ()))}")
+        return problems
+
     def get_failed_downloads(self):
         with self._lock:
-            return [(key, data.copy()) for key, data in self.cache_data["downloads"].items() if data.get("status") == "failed"]
+            downloads = self.cache_data["downloads"]
+            failed = [(key, downloads[key].copy()) for key in self._status_index.get("failed", ())]
+        return sorted(failed, key=lambda item: (str(item[1].get("chapter_index")), str(item[1].get("lecture_index"))))
 
     def reset_failed_downloads(self):
         with self._lock:
-            for record in self.cache_data["downloads"].values():
-                if record.get("status") == "failed":
-                    record.update({"status": "pending"})
-                    record.pop("failed_at", None)
-                    record.pop("error", None)
-            self._sync_counts()
-            self.save_cache()
+            for key in list(self._status_index.get("failed", ())):
+                record = self.cache_data["downloads"][key]
+                self._set_status(key, record, "pending")
+                record.pop("failed_at", None)
+                record.pop("error", None)
+                self._sync_counts()
+                self._save_record(key)
 
     def save_curriculum(self, curriculum):
         with self._lock:
+            if self.cache_data.get("curriculum") == curriculum:
+                return
             self.cache_data["curriculum"] = curriculum
             self.cache_data["total_downloads"] = sum(len(chapter.get("children", [])) for chapter in curriculum)
             self.save_cache()
@@ -159,8 +420,13 @@ class DownloadCache:
             print("Failed items will be retried on the next run.")
         print("=" * 60)
 
+    def close(self):
+        """Fold any journaled changes into the snapshot."""
+        with self._lock:
+            self.storage.close(self.cache_data)
+
     def clear_cache(self):
         with self._lock:
-            if self.cache_file.exists():
-                self.cache_file.unlink()
+            self.storage.clear()
             self.cache_data = self.create_new_cache()
+            self._status_index = {}
@@ -1,3 +1,4 @@
+import asyncio
 import json
 import os
 import sys
@@ -17,17 +18,23 @@ import http.cookiejar as cookielib
 from concurrent.futures import ThreadPoolExecutor, as_completed
 
 from constants import (
-    logger, LoadAction, COURSE_URL, CURRICULUM_URL, LECTURE_URL, HOME_DIR, format_time, remove_emojis_and_binary, Loader, is_valid_chapter,
+    logger, LoadAction, COURSE_URL, CURRICULUM_URL, CURRICULUM_PAGE_SIZE, LECTURE_URL, HOME_DIR, format_time, remove_emojis_and_binary, Loader, is_valid_chapter,
     is_valid_lecture, ElapsedTimeColumn, time
 )
 from utils.process_m3u8 import download_and_merge_m3u8
 from utils.process_mpd import download_and_merge_mpd
-from utils.process_captions import download_captions
-from utils.process_assets import download_supplementary_assets
+from utils.process_captions import ERROR_PREFIX as CAPTIONS_ERROR, start_captions
+from utils.process_assets import ERROR_PREFIX as ASSETS_ERROR, asset_jobs, start_supplementary_assets
 from utils.process_articles import download_article
 from utils.process_mp4 import download_mp4
 from download_cache import DownloadCache
+from metadata_cache import MetadataCache
 from utils.download_result import DownloadResult
+from utils import bandwidth, http_session, io_pool, limits, metrics, postprocess, remux, retry, schedule, signed_url, trace
+from utils.prefetch import prefetch
+from utils.dispatcher import Dispatcher
+from utils.adaptive import AdaptiveConcurrency
+from utils.async_engine import DEFAULT_TRANSFER_LIMIT, AsyncEngine
 from dotenv import load_dotenv
 
 console = Console()
@@ -39,7 +46,7 @@ COOKIES_PATH = os.getenv('COOKIES_PATH', 'cookies.txt')
 COOKIES_JSON_PATH = os.getenv('COOKIES_JSON_PATH', 'cookies.json')
 WIDEVINE_KEY = os.getenv('WIDEVINE_KEY', '')
 OUTPUT_DIR = os.getenv('OUTPUT_DIR', 'courses')
-CONCURRENT_DOWNLOADS = int(os.getenv('CONCURRENT_DOWNLOADS', '2'))
+CONCURRENT_DOWNLOADS = int(os.getenv('CONCURRENT_DOWNLOADS', '4'))
 SUBTITLE_LANG = os.getenv('SUBTITLE_LANG', 'en')
 N_M3U8DL_RE_PATH = os.getenv('N_M3U8DL_RE_PATH', 'n_m3u8dl-re.exe')
 SHAKA_PACKAGER_PATH = os.getenv('SHAKA_PACKAGER_PATH', 'shaka-packager.exe')
@@ -73,6 +80,22 @@ def ensure_cookie_file(cookie_path):
         raise RuntimeError(f"Failed to prepare the cookie file: {error}") from error
 
 
+def collect_side_tasks(side_tasks):
+    """Wait for a lecture's caption and asset sub-tasks and return the first failure, if any."""
+    results = [io_pool.wait_all(futures, error_prefix) for error_prefix, futures in side_tasks]
+    return next((result for result in results if not result.success), DownloadResult.ok())
+
+
+async def collect_side_tasks_async(side_tasks):
+    """``collect_side_tasks`` for the asyncio tasks of ``--engine async``."""
+    failure = DownloadResult.ok()
+    for error_prefix, tasks in side_tasks:
+        for outcome in await asyncio.gather(*tasks, return_exceptions=True):
+            if isinstance(outcome, Exception) and failure.success:
+                failure = DownloadResult.failed(f"{error_prefix}: {outcome}")
+    return failure
+
+
 def parse_chapter_filter(chapter_str):
     """
     Given a string like "1,3-5,7,9-11", return a set of chapter numbers.
@@ -107,15 +130,46 @@ class Udemy:
                 "The provided cookie file could not be read or is incorrectly formatted. Please ensure the file is in the correct format and contains valid authentication cookies."
             )
             sys.exit(1)
+        http_session.configure(cookie_jar, http_session.pool_size_for(
+            limits.limit("stream"), mp4_connections, limits.limit("file"), limits.limit("api")
+        ))
+        io_pool.configure(limits.limit("file"))
+        self.metadata_cache = None
 
-    def request(self, url):
+    def request(self, url, headers=None):
         try:
-            response = requests.get(url, cookies=cookie_jar, stream=True, timeout=(15, 120))
-            response.raise_for_status()
-            return response
+            return retry.get_policy().call(self._get, url, headers, description=f"Udemy request for {url}")
         except requests.RequestException as e:
             raise RuntimeError(f"Udemy request failed for {url}: {e}") from e
 
+    def _get(self, url, headers=None):
+        with limits.slot("api"):
+            response = http_session.get_session().get(url, headers=headers, stream=True, timeout=(15, 120))
+            response.raise_for_status()
+            # Read the body while holding the slot; API responses are small.
+            response.content
+        return response
+
+    def fetch_cached_json(self, name, url, has_media=False, refresh=False):
+        """Serve an API response from the metadata cache when fresh and revalidate it when stale.
+
+        ``refresh`` skips the cache entirely, for when its signed URLs were rejected.
+        """
+        cache = self.metadata_cache
+        if cache is None:
+            return self.request(url).json()
+        entry = None if refresh else cache.get(name)
+        if entry and cache.is_fresh(entry):
+            return entry["body"]
+        response = self.request(url, cache.validators(entry))
+        if response.status_code == 304 and entry:
+            cache.touch(name, entry)
+            return entry["body"]
+        body = response.json()
+        if isinstance(body, dict) and not body.get('detail'):
+            cache.put(name, url, body, response.headers, has_media)
+        return body
+
     def extract_course_id(self, course_url):
 
         with Loader("Fetching course ID"):
@@ -140,7 +194,7 @@ class Udemy:
 
     def fetch_course(self, course_id):
         try:
-            response = self.request(COURSE_URL.format(course_id=course_id)).json()
+            response = self.fetch_cached_json("course", COURSE_URL.format(course_id=course_id))
 
             if response.get('detail') == 'Not found.':
                 logger.critical(
@@ -154,9 +208,12 @@ class Udemy:
             sys.exit(1)
 
     def fetch_course_curriculum(self, course_id):
-        all_results = []
-        url = CURRICULUM_URL.format(course_id=course_id)
-        total_count = 0
+        url = CURRICULUM_URL.format(course_id=course_id, page_size=CURRICULUM_PAGE_SIZE)
+        cache = self.metadata_cache
+        cached = cache.get("curriculum") if cache else None
+        if cached and cache.is_fresh(cached):
+            logger.info("Loaded the course curriculum from the metadata cache")
+            return self.organize_curriculum(cached["body"])
 
         logger.info("Fetching course curriculum. This may take a while")
 
@@ -167,36 +224,73 @@ class Udemy:
             TextColumn("[progress.percentage]{task.percentage:>3}%"),
             transient=True
         ) as progress:
-            task = progress.add_task(description="Fetching Course Curriculum", total=total_count)
-
-            while url:
-                response = self.request(url).json()
-
-                if response.get('detail') == 'You do not have permission to perform this action.':
-                    progress.console.log(
-                        "[red]The course was found, but the curriculum (lectures and materials) could not be retrieved. This could be due to API issues, restrictions on the course, or a malformed course structure.[/red]"
-                    )
-                    sys.exit(1)
-
-                if response.get('detail') == 'Not found.':
-                    progress.console.log(
-                        "[red]The course was found, but the curriculum (lectures and materials) could not be retrieved. This could be due to API issues, restrictions on the course, or a malformed course structure.[/red]"
-                    )
-                    sys.exit(1)
-
-                if total_count == 0:
-                    total_count = response.get('count', 0)
-                    progress.update(task, total=total_count)
-
-                results = response.get('results', [])
-                all_results.extend(results)
-                progress.update(task, completed=len(all_results))
-
-                url = response.get('next')
+            task = progress.add_task(description="Fetching Course Curriculum", total=0)
+
+            response = self.request(url, cache.validators(cached) if cache else None)
+            if response.status_code == 304 and cached:
+                cache.touch("curriculum", cached)
+                logger.info("The cached course curriculum is still current")
+                return self.organize_curriculum(cached["body"])
+            first_page = self.check_curriculum_page(response.json(), progress)
+            total_count = first_page.get('count', 0)
+            all_results = list(first_page.get('results', []))
+            progress.update(task, total=total_count, completed=len(all_results))
+
+            if first_page.get('next'):
+                try:
+                    all_results.extend(self.fetch_remaining_curriculum_pages(url, total_count, progress, task, len(all_results)))
+                except (RuntimeError, ValueError) as error:
+                    # Some courses reject page-number paging; walk the "next" links instead.
+                    logger.warning("Concurrent curriculum paging failed (%s); fetching pages one by one.", error)
+                    all_results = list(first_page.get('results', []))
+                    next_url = first_page.get('next')
+                    while next_url:
+                        page = self.fetch_curriculum_page(next_url, progress)
+                        all_results.extend(page.get('results', []))
+                        progress.update(task, completed=len(all_results))
+                        next_url = page.get('next')
 
             progress.update(task_id=task, description="Fetched Course Curriculum", total=total_count)
+        if cache:
+            # Page 1's ETag says nothing about later pages, so only a one-page curriculum can be revalidated.
+            cache.put("curriculum", url, all_results, None if first_page.get('next') else response.headers)
         return self.organize_curriculum(all_results)
 
+    def fetch_curriculum_page(self, url, progress):
+        return self.check_curriculum_page(self.request(url).json(), progress)
+
+    def check_curriculum_page(self, response, progress):
+        if response.get('detail') in ('You do not have permission to perform this action.', 'Not found.'):
+            progress.console.log(
+                "[red]The course was found, but the curriculum (lectures and materials) could not be retrieved. This could be due to API issues, restrictions on the course, or a malformed course structure.[/red]"
+            )
+            sys.exit(1)
+        return response
+
+    def fetch_remaining_curriculum_pages(self, url, total_count, progress, task, fetched):
+        """Fetch pages 2..N by number in parallel and return their results in curriculum order."""
+        page_count = -(-total_count // CURRICULUM_PAGE_SIZE)
+        if page_count < 2:
+            raise ValueError(f"the first page reported only {total_count} item(s) but has a next page")
+
+        def fetch_page(page):
+            response = self.request(f"{url}&page={page}").json()
+            if 'results' not in response:
+                raise ValueError(f"page {page} returned no results: {response.get('detail', 'unknown error')}")
+            return response['results']
+
+        pages = {}
+        with ThreadPoolExecutor(max_workers=min(8, page_count - 1)) as executor:
+            futures = {executor.submit(fetch_page, page): page for page in range(2, page_count + 1)}
+            for future in as_completed(futures):
+                pages[futures[future]] = future.result()
+                fetched += len(pages[futures[future]])
+                progress.update(task, completed=fetched)
+
+        if fetched != total_count:
+            raise ValueError(f"expected {total_count} curriculum items but received {fetched}")
+        return [item for page in sorted(pages) for item in pages[page]]
+
     def organize_curriculum(self, results):
         curriculum = []
         current_chapter = None
@@ -240,12 +334,22 @@ class Udemy:
                 if 'children' in item:
                     self.build_curriculum_tree(item['children'], node, index=1)
 
-    def fetch_lecture_info(self, course_id, lecture_id):
+    def fetch_lecture_info(self, course_id, lecture_id, refresh=False):
         try:
-            return self.request(LECTURE_URL.format(course_id=course_id, lecture_id=lecture_id)).json()
-        except Exception as e:
-            logger.critical(f"Failed to fetch lecture info: {e}")
-            sys.exit(1)
+            return self.fetch_cached_json(
+                f"lecture_{lecture_id}", LECTURE_URL.format(course_id=course_id, lecture_id=lecture_id), has_media=True, refresh=refresh
+            )
+        except (RuntimeError, ValueError) as e:
+            raise RuntimeError(f"Failed to fetch lecture info: {e}") from e
+
+    def refresh_lecture_info(self, course_id, lecture, lect_info, progress, reason):
+        """Fetch new signed media URLs for a lecture; keep the old ones if the API call fails."""
+        progress.console.log(f"[cyan]Refreshing media URLs for {lecture['title']}: {reason}[/cyan]")
+        try:
+            return self.fetch_lecture_info(course_id, lecture['id'], refresh=True)
+        except RuntimeError as e:
+            logger.warning("Could not refresh media URLs for %s: %s", lecture['title'], e)
+            return lect_info
 
     def create_directory(self, path):
         try:
@@ -256,93 +360,366 @@ class Udemy:
             logger.error(f"Failed to create directory \"{path}\": {e}")
             sys.exit(1)
 
+    def run_lecture(self, job):
+        """Dispatcher handler: show a progress row and download one lecture, inside an adaptive slot when enabled.
+
+        A lecture still being post-processed keeps its progress row until the post-processing stage finishes it.
+        """
+        course_id, lecture, lect_info, temp_folder_path, lindex, folder_path, description, progress, download_cache, chapter_index, lecture_trace = job
+        if concurrency is not None:
+            concurrency.acquire()
+        lecture_trace.dequeue()
+        task_id = progress.add_task(description, total=100)
+        download_key = download_cache.get_download_key(chapter_index, lindex, sanitize_filename(lecture['title']))
+        pending = None
+        try:
+            with retry.on_retry(lambda description, error: download_cache.record_retry(download_key)), trace.active(lecture_trace):
+                pending = self.download_lecture(
+                    course_id, lecture, lect_info, temp_folder_path, lindex, folder_path, task_id, progress, download_cache, chapter_index
+                )
+        finally:
+            if pending is None:
+                try:
+                    progress.remove_task(task_id)
+                except KeyError:
+                    pass
+                trace.finish(lecture_trace, download_cache.get_record(download_key))
+            if concurrency is not None:
+                concurrency.release()
+
+    def skip_completed(self, download_cache, chapter_index, lindex, lecture_title, expected_file_path, progress):
+        """Return True (and log the skip) when the cache and the disk show the lecture as downloaded."""
+        is_completed, cached_record = download_cache.is_download_completed(chapter_index, lindex, lecture_title, expected_file_path)
+        if is_completed:
+            progress.console.log(f"[yellow]⏭️  Skipping {lecture_title} (already downloaded)[/yellow]")
+        return is_completed
+
+    def main_asset_type(self, asset, lecture_title, progress, download_key, download_cache):
+        """Return "Video" or "Article" when the lecture's own file is wanted; otherwise log the skip or record the unsupported type."""
+        asset_type = asset.get('asset_type')
+        if asset_type == "Video" and skip_lectures:
+            progress.console.log(f"[yellow]Skipped video {lecture_title}; it was not added to the cache.[/yellow]")
+        elif asset_type == "Article" and skip_articles:
+            progress.console.log(f"[yellow]Skipped article {lecture_title}; it was not added to the cache.[/yellow]")
+        elif asset_type in ("Video", "Article"):
+            return asset_type
+        else:
+            download_cache.mark_download_failed(download_key, f"Unsupported asset type: {asset.get('asset_type', 'missing')}")
+        return None
+
+    def record_video_failure(self, result, lecture_title, download_key, download_cache):
+        if concurrency:
+            concurrency.record_failure("stream download failed")
+        download_cache.mark_download_failed(download_key, result.error)
+        logger.error("%s failed: %s. Check the DEBUG lines above and verify the source URL, login cookies, and installed tools.", lecture_title, result.error)
+
+    def record_output(self, expected_file_path, download_key, download_cache):
+        """Mark the lecture completed when its output file exists."""
+        with trace.span("cache"):
+            if os.path.isfile(expected_file_path):
+                download_cache.mark_download_completed(download_key, expected_file_path)
+            else:
+                download_cache.mark_download_failed(download_key, f"Expected output missing: {expected_file_path}")
+
     def download_lecture(
         self, course_id, lecture, lect_info, temp_folder_path, lindex, folder_path, task_id, progress, download_cache, chapter_index
     ):
         lecture_title = sanitize_filename(lecture['title'])
         expected_file_path = os.path.join(folder_path, f"{lindex}. {lecture_title}.mp4")
 
-        # Check if download is already completed
-        is_completed, cached_record = download_cache.is_download_completed(chapter_index, lindex, lecture_title, expected_file_path)
-
-        if is_completed:
-            progress.console.log(f"[yellow]⏭️  Skipping {lecture_title} (already downloaded)[/yellow]")
+        if self.skip_completed(download_cache, chapter_index, lindex, lecture_title, expected_file_path, progress):
             progress.remove_task(task_id)
             return
 
         # Mark download as started
         download_key = download_cache.mark_download_started(chapter_index, lindex, lecture_title, lecture['id'], lect_info['asset']['asset_type'])
 
+        # Captions and attachments run on the shared I/O pool while this worker fetches the video.
+        side_tasks = []
+        pending = None
         try:
+            # The lecture may have waited in the queue long enough for its signatures to run out.
+            if signed_url.expires_soon(lect_info):
+                lect_info = self.refresh_lecture_info(course_id, lecture, lect_info, progress, "signed URLs are about to expire")
             asset = lect_info.get("asset") or {}
             if not skip_captions and asset.get("captions"):
-                caption_result = download_captions(asset["captions"], folder_path, f"{lindex}. {lecture_title}", captions, convert_to_srt)
-                if not caption_result.success:
-                    raise RuntimeError(caption_result.error)
+                side_tasks.append((CAPTIONS_ERROR, start_captions(
+                    asset["captions"], folder_path, f"{lindex}. {lecture_title}", captions, convert_to_srt, download_cache, keep_vtt
+                )))
 
             if not skip_assets and lecture.get("supplementary_assets"):
                 assets_dir = os.path.join(folder_path, f"{lindex}. {lecture_title}.assets")
-                assets_result = download_supplementary_assets(self, lecture["supplementary_assets"], assets_dir, course_id, lect_info["id"])
-                if not assets_result.success:
-                    raise RuntimeError(assets_result.error)
-
-            if asset.get('asset_type') == "Video":
-                if skip_lectures:
-                    progress.console.log(f"[yellow]Skipped video {lecture_title}; it was not added to the cache.[/yellow]")
-                    return
-                sources = asset.get("media_sources") or []
-                mpd_url = next((item.get('src') for item in sources if item.get('type') == "application/dash+xml"), None)
-                mp4_url = next((item.get('src') for item in sources if item.get('type') == "video/mp4"), None)
-                m3u8_url = next((item.get('src') for item in sources if item.get('type') == "application/x-mpegURL"), None)
-
-                if mpd_url is None:
-                    if m3u8_url is None:
-                        if mp4_url is None:
-                            result = DownloadResult.failed("No supported media source was supplied by the course API.")
-                        else:
-                            result = download_mp4(mp4_url, temp_folder_path, f"{lindex}. {lecture_title}", task_id, progress)
-                    else:
-                        result = download_and_merge_m3u8(m3u8_url, temp_folder_path, f"{lindex}. {lecture_title}", task_id, progress, key)
-                else:
-                    result = download_and_merge_mpd(
-                        mpd_url, temp_folder_path, f"{lindex}. {lecture_title}", lecture['asset']['time_estimation'], key, task_id, progress
-                    )
+                side_tasks.append((ASSETS_ERROR, start_supplementary_assets(
+                    self, lecture["supplementary_assets"], assets_dir, course_id, lect_info["id"], download_cache
+                )))
+
+            asset_type = self.main_asset_type(asset, lecture_title, progress, download_key, download_cache)
+            if asset_type == "Video":
+                with trace.span("stream"):
+                    result = self.download_video(lecture, asset, temp_folder_path, f"{lindex}. {lecture_title}", task_id, progress)
+                if result.http_status == 403:
+                    lect_info = self.refresh_lecture_info(course_id, lecture, lect_info, progress, "the media server returned 403")
+                    asset = lect_info.get("asset") or {}
+                    with trace.span("stream"):
+                        result = self.download_video(lecture, asset, temp_folder_path, f"{lindex}. {lecture_title}", task_id, progress)
                 if not result.success:
-                    download_cache.mark_download_failed(download_key, result.error)
-                    logger.error("%s failed: %s. Check the DEBUG lines above and verify the source URL, login cookies, and installed tools.", lecture_title, result.error)
-                    return
-            elif asset.get('asset_type') == "Article":
-                if skip_articles:
-                    progress.console.log(f"[yellow]Skipped article {lecture_title}; it was not added to the cache.[/yellow]")
+                    self.record_video_failure(result, lecture_title, download_key, download_cache)
                     return
+                pending = result.pending
+            elif asset_type == "Article":
                 article_result = download_article(self, asset, temp_folder_path, f"{lindex}. {lecture_title}", task_id, progress)
                 if not article_result.success:
                     download_cache.mark_download_failed(download_key, article_result.error)
                     return
                 expected_file_path = os.path.join(folder_path, f"{lindex}. {lecture_title}.html")
             else:
-                download_cache.mark_download_failed(download_key, f"Unsupported asset type: {asset.get('asset_type', 'missing')}")
                 return
 
-            # Mark download as completed if file exists
-            if os.path.isfile(expected_file_path):
-                download_cache.mark_download_completed(download_key, expected_file_path)
-            else:
-                download_cache.mark_download_failed(download_key, f"Expected output missing: {expected_file_path}")
+            side_result, side_tasks = collect_side_tasks(side_tasks), []
+            if not side_result.success:
+                raise RuntimeError(side_result.error)
+
+            if pending is not None:
+                # Completion is recorded once the remux finishes; this worker moves on to the next lecture.
+                lecture_trace = trace.current()
+                pending.add_done_callback(
+                    lambda future: self.finish_postprocessing(
+                        future, lecture_title, expected_file_path, download_key, download_cache, task_id, progress, lecture_trace
+                    )
+                )
+                return pending
+
+            self.record_output(expected_file_path, download_key, download_cache)
 
         except Exception as e:
             logger.error(f"Failed to download {lecture_title}: {e}")
             download_cache.mark_download_failed(download_key, str(e))
+        finally:
+            # Never leave sub-tasks writing into the lecture folder after an early return.
+            collect_side_tasks(side_tasks)
+
+        try:
+            progress.remove_task(task_id)
+        except KeyError:
+            pass
 
+    def finish_postprocessing(self, future, lecture_title, expected_file_path, download_key, download_cache, task_id, progress, lecture_trace=None):
+        """Record the outcome of a lecture whose remux ran on the post-processing stage."""
+        try:
+            result = future.result()
+        except Exception as e:
+            result = DownloadResult.failed(f"Post-processing failed: {e}")
+        with trace.active(lecture_trace):
+            if result.success:
+                self.record_output(expected_file_path, download_key, download_cache)
+            else:
+                with trace.span("cache"):
+                    download_cache.mark_download_failed(download_key, result.error)
+                logger.error("%s failed during post-processing: %s", lecture_title, result.error)
         try:
             progress.remove_task(task_id)
         except KeyError:
             pass
+        trace.finish(lecture_trace, download_cache.get_record(download_key))
+
+    def media_sources(self, asset):
+        """Return the ``(mpd, mp4, m3u8)`` URLs of a video asset; missing kinds are None."""
+        sources = asset.get("media_sources") or []
+        return tuple(next((item.get('src') for item in sources if item.get('type') == kind), None)
+                     for kind in ("application/dash+xml", "video/mp4", "application/x-mpegURL"))
+
+    def download_video(self, lecture, asset, temp_folder_path, title, task_id, progress):
+        mpd_url, mp4_url, m3u8_url = self.media_sources(asset)
+
+        if mpd_url is None:
+            if m3u8_url is None:
+                if mp4_url is None:
+                    return DownloadResult.failed("No supported media source was supplied by the course API.")
+                return download_mp4(mp4_url, temp_folder_path, title, task_id, progress, mp4_connections)
+            return download_and_merge_m3u8(m3u8_url, temp_folder_path, title, task_id, progress, key)
+        return download_and_merge_mpd(mpd_url, temp_folder_path, title, lecture['asset']['time_estimation'], key, task_id, progress)
+
+    async def download_video_async(self, engine, lecture, asset, temp_folder_path, title, task_id, progress):
+        mpd_url, mp4_url, m3u8_url = self.media_sources(asset)
+
+        if mpd_url is None:
+            if m3u8_url is None:
+                if mp4_url is None:
+                    return DownloadResult.failed("No supported media source was supplied by the course API.")
+                # The ranged MP4 downloader already spreads one file over several connections.
+                async with engine.streams:
+                    return await asyncio.to_thread(download_mp4, mp4_url, temp_folder_path, title, task_id, progress, mp4_connections)
+            return await engine.hls(m3u8_url, temp_folder_path, title, task_id, progress, key)
+        return await engine.dash(mpd_url, temp_folder_path, title, key, task_id, progress)
+
+    def chapter_folder(self, mindex, chapter):
+        return os.path.join(COURSE_DIR, f"{mindex}. {remove_emojis_and_binary(sanitize_filename(chapter['title']))}")
+
+    def lecture_folders(self, mindex, chapter, lecture):
+        folder_path = self.chapter_folder(mindex, chapter)
+        temp_folder_path = os.path.join(folder_path, str(lecture['id']))
+        self.create_directory(temp_folder_path)
+        return folder_path, temp_folder_path
+
+    def record_unavailable_lecture(self, lecture, lindex, chapter_index, error, progress, download_cache, lecture_trace=None):
+        # One lecture whose details cannot be fetched must not stop the rest of the course.
+        progress.console.log(f"[red]{lecture['title']}: {error}[/red]")
+        title = sanitize_filename(lecture['title'])
+        key = download_cache.mark_download_started(chapter_index, lindex, title, lecture['id'], (lecture.get('asset') or {}).get('asset_type'))
+        download_cache.mark_download_failed(key, str(error))
+        trace.finish(lecture_trace, download_cache.get_record(key))
+
+    async def download_lecture_async(self, engine, course_id, entry, progress, download_cache):
+        """``--engine async`` version of run_lecture and download_lecture for one curriculum entry.
+
+        The DASH remux runs inline on the engine's remux limit; the stream slot is already free by
+        then, so it does not hold up the next download, which is what deferring it does for threads.
+        """
+        mindex, chapter, lindex, lecture, chapter_index = entry
+        folder_path, temp_folder_path = self.lecture_folders(mindex, chapter, lecture)
+        lecture_title = sanitize_filename(lecture['title'])
+        expected_file_path = os.path.join(folder_path, f"{lindex}. {lecture_title}.mp4")
+
+        if self.skip_completed(download_cache, chapter_index, lindex, lecture_title, expected_file_path, progress):
+            return
+        try:
+            with trace.span("metadata"):
+                lect_info = await asyncio.to_thread(self.fetch_lecture_info, course_id, lecture['id'])
+        except RuntimeError as error:
+            self.record_unavailable_lecture(lecture, lindex, chapter_index, error, progress, download_cache)
+            return
+
+        download_key = download_cache.mark_download_started(chapter_index, lindex, lecture_title, lecture['id'], lect_info['asset']['asset_type'])
+        task_id = progress.add_task(f"Downloading Lecture: {lecture['title']} ({lindex}/{len(chapter['children'])})", total=100)
+        side_tasks = []
+        try:
+            with retry.on_retry(lambda description, error: download_cache.record_retry(download_key)):
+                # The lecture may have waited in the window long enough for its signatures to run out.
+                if signed_url.expires_soon(lect_info):
+                    lect_info = await asyncio.to_thread(
+                        self.refresh_lecture_info, course_id, lecture, lect_info, progress, "signed URLs are about to expire"
+                    )
+                asset = lect_info.get("asset") or {}
+                if not skip_captions and asset.get("captions"):
+                    side_tasks.append((CAPTIONS_ERROR, [
+                        asyncio.create_task(engine.caption(caption, folder_path, f"{lindex}. {lecture_title}", convert_to_srt, download_cache, keep_vtt))
+                        for caption in asset["captions"] if caption.get("locale_id") in captions
+                    ]))
+
+                if not skip_assets and lecture.get("supplementary_assets"):
+                    assets_dir = os.path.join(folder_path, f"{lindex}. {lecture_title}.assets")
+                    jobs = asset_jobs(self, lecture["supplementary_assets"], assets_dir, course_id, lect_info["id"], download_cache)
+                    side_tasks.append((ASSETS_ERROR, [asyncio.create_task(engine.transfer(*job)) for job in jobs]))
+
+                asset_type = self.main_asset_type(asset, lecture_title, progress, download_key, download_cache)
+                if asset_type == "Video":
+                    title = f"{lindex}. {lecture_title}"
+                    with trace.span("stream"):
+                        result = await self.download_video_async(engine, lecture, asset, temp_folder_path, title, task_id, progress)
+                    if result.http_status == 403:
+                        lect_info = await asyncio.to_thread(
+                            self.refresh_lecture_info, course_id, lecture, lect_info, progress, "the media server returned 403"
+                        )
+                        with trace.span("stream"):
+                            result = await self.download_video_async(engine, lecture, lect_info.get("asset") or {}, temp_folder_path, title, task_id, progress)
+                    if not result.success:
+                        self.record_video_failure(result, lecture_title, download_key, download_cache)
+                        return
+                elif asset_type == "Article":
+                    article_result = await asyncio.to_thread(download_article, self, asset, temp_folder_path, f"{lindex}. {lecture_title}", task_id, progress)
+                    if not article_result.success:
+                        download_cache.mark_download_failed(download_key, article_result.error)
+                        return
+                    expected_file_path = os.path.join(folder_path, f"{lindex}. {lecture_title}.html")
+                else:
+                    return
+
+                side_result, side_tasks = await collect_side_tasks_async(side_tasks), []
+                if not side_result.success:
+                    raise RuntimeError(side_result.error)
+
+            self.record_output(expected_file_path, download_key, download_cache)
+
+        except Exception as e:
+            logger.error(f"Failed to download {lecture_title}: {e}")
+            download_cache.mark_download_failed(download_key, str(e))
+        finally:
+            # Never leave sub-tasks writing into the lecture folder after an early return.
+            await collect_side_tasks_async(side_tasks)
+            try:
+                progress.remove_task(task_id)
+            except KeyError:
+                pass
+
+    async def download_course_async(self, course_id, entries, progress, download_cache):
+        """Run every lecture as a coroutine; at most ``prefetch_depth`` lectures run ahead of the stream slots."""
+        window = asyncio.Semaphore(prefetch_depth + max_concurrent_lectures)
+
+        async def run(entry, lecture_trace):
+            mindex, chapter, lindex, lecture, chapter_index = entry
+            try:
+                lecture_trace.dequeue()
+                with trace.active(lecture_trace):
+                    await self.download_lecture_async(engine, course_id, entry, progress, download_cache)
+            finally:
+                window.release()
+                key = download_cache.get_download_key(chapter_index, lindex, sanitize_filename(lecture['title']))
+                trace.finish(lecture_trace, download_cache.get_record(key))
+
+        async with AsyncEngine() as engine:
+            tasks = []
+            for entry in entries:
+                lecture_trace = trace.start(entry[4], entry[2], entry[3])
+                lecture_trace.enqueue()
+                await window.acquire()
+                tasks.append(asyncio.create_task(run(entry, lecture_trace)))
+            await asyncio.gather(*tasks)
+
+    def dispatch_lectures(self, course_id, entries, progress, download_cache):
+        """Thread engine: prefetch lecture details and feed them to a fixed pool of lecture workers."""
+        with Dispatcher(self.run_lecture, max_concurrent_lectures) as dispatcher:
+            metrics.watch_queue("lectures", dispatcher.pending)
+            # Lecture metadata is resolved ahead of the download workers so they never wait on the API.
+            lectures = prefetch(
+                entries, lambda entry: trace.timed(self.fetch_lecture_info, course_id, entry[3]['id']), prefetch_depth,
+                workers=min(prefetch_depth, max_concurrent_lectures)
+            )
+
+            for (mindex, chapter, lindex, lecture, chapter_index), lect_info_future in lectures:
+                folder_path, temp_folder_path = self.lecture_folders(mindex, chapter, lecture)
+                lecture_trace = trace.start(chapter_index, lindex, lecture)
+                try:
+                    lect_info, fetch_start, fetch_seconds = lect_info_future.result()
+                except RuntimeError as error:
+                    self.record_unavailable_lecture(lecture, lindex, chapter_index, error, progress, download_cache, lecture_trace)
+                    continue
+                lecture_trace.add("metadata", fetch_start, fetch_seconds)
+                description = f"Downloading Lecture: {lecture['title']} ({lindex}/{len(chapter['children'])})"
+                lecture_trace.enqueue()
+                # Blocks while every worker is busy and the queue is full.
+                dispatcher.submit(
+                    (course_id, lecture, lect_info, temp_folder_path, lindex, folder_path, description, progress, download_cache, chapter_index,
+                     lecture_trace)
+                )
+
+    def plan_lectures(self, entries, download_cache):
+        """Drop lectures the cache and the disk already show as complete, before any lecture details are fetched."""
+        entries = list(entries)
+        plan = []
+        for mindex, chapter, lindex, lecture, chapter_index in entries:
+            title = sanitize_filename(lecture['title'])
+            extension = "html" if (lecture.get('asset') or {}).get('asset_type') == "Article" else "mp4"
+            expected_path = os.path.join(self.chapter_folder(mindex, chapter), f"{lindex}. {title}.{extension}")
+            if not download_cache.is_download_completed(chapter_index, lindex, title, expected_path)[0]:
+                plan.append((mindex, chapter, lindex, lecture, chapter_index))
+        logger.info("Download plan: %d of %d selected lectures to fetch, %d already complete", len(plan), len(entries), len(entries) - len(plan))
+        return plan
 
     def download_course(self, course_id, curriculum):
         # Initialize download cache
         download_cache = DownloadCache(course_id)
         download_cache.save_curriculum(curriculum)
+        metrics.watch_cache(download_cache)
 
         # Show progress summary if cache exists
         if len(download_cache.cache_data["downloads"]) > 0:
@@ -353,10 +730,7 @@ class Udemy:
             TextColumn("[progress.percentage]{task.percentage:>3.0f}%"), ElapsedTimeColumn(),
         )
 
-        tasks = {}
-        futures = []
-
-        with ThreadPoolExecutor(max_workers=max_concurrent_lectures) as executor, Live(progress, refresh_per_second=10):
+        with Live(progress, refresh_per_second=10):
             task_generator = (
                 (
                     f"{mindex:02}" if mindex < 10 else f"{mindex}",
@@ -369,56 +743,16 @@ class Udemy:
                 for lindex, lecture in enumerate(chapter['children'], start=1)
                 if is_valid_lecture(mindex, lindex, start_chapter, start_lecture, end_chapter, end_lecture)
             )
+            plan = schedule.order(self.plan_lectures(task_generator, download_cache), schedule_policy)
+            if engine == "async":
+                asyncio.run(self.download_course_async(course_id, iter(plan), progress, download_cache))
+            else:
+                self.dispatch_lectures(course_id, iter(plan), progress, download_cache)
+            # Remuxes handed off by the last lectures still have to finish and record their results.
+            postprocess.shutdown()
 
-            for _ in range(max_concurrent_lectures):
-                try:
-                    mindex, chapter, lindex, lecture, chapter_index = next(task_generator)
-                    folder_path = os.path.join(COURSE_DIR, f"{mindex}. {remove_emojis_and_binary(sanitize_filename(chapter['title']))}")
-                    temp_folder_path = os.path.join(folder_path, str(lecture['id']))
-                    self.create_directory(temp_folder_path)
-                    lect_info = self.fetch_lecture_info(course_id, lecture['id'])
-
-                    task_id = progress.add_task(f"Downloading Lecture: {lecture['title']} ({lindex}/{len(chapter['children'])})", total=100)
-                    tasks[task_id] = (lecture, lect_info, temp_folder_path, lindex, folder_path, chapter_index)
-
-                    future = executor.submit(
-                        self.download_lecture, course_id, lecture, lect_info, temp_folder_path, lindex, folder_path, task_id, progress,
-                        download_cache, chapter_index
-                    )
-
-                    futures.append((task_id, future))
-                except StopIteration:
-                    break
-
-            while futures:
-                for future in as_completed(f[1] for f in futures):
-                    task_id = next(task_id for task_id, f in futures if f == future)
-                    future.result()
-                    try:
-                        progress.remove_task(task_id)
-                    except (Exception):
-                        pass
-                    futures = [f for f in futures if f[1] != future]
-
-                    try:
-                        mindex, chapter, lindex, lecture, chapter_index = next(task_generator)
-                        folder_path = os.path.join(COURSE_DIR, f"{mindex}. {remove_emojis_and_binary(sanitize_filename(chapter['title']))}")
-                        temp_folder_path = os.path.join(folder_path, str(lecture['id']))
-                        self.create_directory(temp_folder_path)
-                        lect_info = self.fetch_lecture_info(course_id, lecture['id'])
-
-                        task_id = progress.add_task(f"Downloading Lecture: {lecture['title']} ({lindex}/{len(chapter['children'])})", total=100)
-                        tasks[task_id] = (lecture, lect_info, temp_folder_path, lindex, folder_path, chapter_index)
-
-                        future = executor.submit(
-                            self.download_lecture, course_id, lecture, lect_info, temp_folder_path, lindex, folder_path, task_id, progress,
-                            download_cache, chapter_index
-                        )
-
-                        futures.append((task_id, future))
-                    except StopIteration:
-                        break
-
+        io_pool.shutdown()
+        download_cache.close()
         return download_cache.get_download_summary()
 
 
@@ -456,7 +790,7 @@ def check_prerequisites():
 def main():
 
     try:
-        global course_url, key, COOKIES_PATH, COURSE_DIR, captions, max_concurrent_lectures, skip_captions, skip_assets, skip_lectures, skip_articles, skip_assignments, convert_to_srt, start_chapter, end_chapter, start_lecture, end_lecture, chapter_filter
+        global course_url, key, COOKIES_PATH, COURSE_DIR, captions, max_concurrent_lectures, concurrency, engine, schedule_policy, keep_vtt, prefetch_depth, mp4_connections, skip_captions, skip_assets, skip_lectures, skip_articles, skip_assignments, convert_to_srt, start_chapter, end_chapter, start_lecture, end_lecture, chapter_filter
 
         parser = argparse.ArgumentParser(description="Udemy Downloader By Joe - A powerful tool for downloading Udemy courses")
         parser.add_argument("--id", "-i", type=int, required=False, help="The ID of the Udemy course to download")
@@ -465,7 +799,22 @@ def main():
         parser.add_argument("--cookies", "-c", type=str, default="cookies.txt", help="Path to cookies.txt file")
         parser.add_argument("--load", "-l", help="Load course curriculum from file", action=LoadAction, const=True, nargs='?')
         parser.add_argument("--save", "-s", help="Save course curriculum to a file", action=LoadAction, const=True, nargs='?')
-        parser.add_argument("--concurrent", "-cn", type=int, default=4, help="Maximum number of concurrent downloads")
+        parser.add_argument("--concurrent", "-cn", type=int, default=CONCURRENT_DOWNLOADS, help="Maximum number of concurrent downloads (default: CONCURRENT_DOWNLOADS from .env, else 4)")
+        parser.add_argument("--engine", choices=["thread", "async"], default="thread", help="Run lectures on worker threads (default) or as asyncio tasks, which keeps many small transfers in flight cheaply")
+        parser.add_argument("--schedule", choices=schedule.POLICIES, default="curriculum", help="Start lectures in course order (default) or the longest videos first, which usually finishes the whole course sooner")
+        parser.add_argument("--adaptive", action="store_true", help="Start with few parallel lectures and add more while the total speed keeps rising, up to --concurrent")
+        parser.add_argument("--max-rate", type=bandwidth.parse_rate, help="Total download speed limit in bytes per second across all downloads, e.g. 50M or 800K")
+        parser.add_argument("--retries", type=int, default=retry.DEFAULT_ATTEMPTS - 1, help="How many times a failed request or stream download is retried with backoff")
+        parser.add_argument("--api-concurrency", type=int, help="Maximum Udemy API calls at once (default: --concurrent)")
+        parser.add_argument("--file-concurrency", type=int, help="Maximum caption and attachment downloads at once (default: twice --concurrent, 64 with --engine async)")
+        parser.add_argument("--stream-concurrency", type=int, help="Maximum video downloads at once (default: --concurrent)")
+        parser.add_argument("--remux-concurrency", type=int, help="Maximum FFmpeg conversions at once (default: half the CPU cores)")
+        parser.add_argument("--trace", metavar="FILE", help="Write per-lecture timings (API, queue, captions, assets, stream, remux, cache) to FILE as JSON lines and log a summary at the end")
+        parser.add_argument("--metrics-file", metavar="FILE", help="Keep FILE updated with Prometheus metrics (for the node exporter's textfile collector)")
+        parser.add_argument("--metrics-port", type=int, help="Serve Prometheus metrics at http://127.0.0.1:PORT/metrics while downloading")
+        parser.add_argument("--faststart", action="store_true", help="Move the MP4 index to the front when converting DASH downloads so the files play while streaming")
+        parser.add_argument("--connections", type=int, default=4, help="Number of connections used for each MP4 video download")
+        parser.add_argument("--prefetch", type=int, help="Number of upcoming lectures whose details are fetched ahead of the downloads (default: twice --concurrent)")
 
         # parser.add_argument("--quality", "-q", type=str, help="Specify the quality of the videos to download.")
         parser.add_argument("--start-chapter", type=int, help="Start the download from the specified chapter")
@@ -474,6 +823,7 @@ def main():
         parser.add_argument("--end-lecture", type=int, help="End the download at the specified lecture")
         parser.add_argument("--captions", type=str, help="Specify what captions to download. Separate multiple captions with commas")
         parser.add_argument("--srt", help="Convert the captions to srt format", action=LoadAction, const=True, nargs='?')
+        parser.add_argument("--keep-vtt", action="store_true", help="With --srt, also keep the original .vtt caption files")
 
         parser.add_argument("--tree", help="Create a tree view of the course curriculum", action=LoadAction, nargs='?')
 
@@ -488,6 +838,7 @@ def main():
         # Cache management options
         parser.add_argument("--clear-cache", action="store_true", help="Clear download cache and restart from beginning")
         parser.add_argument("--show-cache", action="store_true", help="Show download cache status and exit")
+        parser.add_argument("--refresh-metadata", action="store_true", help="Ignore cached course details and fetch them again")
 
         args = parser.parse_args()
 
@@ -509,6 +860,29 @@ def main():
         else:
             max_concurrent_lectures = args.concurrent
 
+        prefetch_depth = max(1, args.prefetch) if args.prefetch else max_concurrent_lectures * 2
+        mp4_connections = max(1, args.connections)
+        retry.configure(max(0, args.retries) + 1)
+        remux.configure(args.faststart)
+        engine = args.engine
+        schedule_policy = args.schedule
+        trace.configure(args.trace)
+        metrics.configure(args.metrics_file, args.metrics_port)
+        limits.configure(
+            api=args.api_concurrency or max_concurrent_lectures,
+            file=args.file_concurrency or (DEFAULT_TRANSFER_LIMIT if engine == "async" else max_concurrent_lectures * 2),
+            stream=args.stream_concurrency or max_concurrent_lectures,
+            remux=args.remux_concurrency,
+        )
+        # Each downloader process gets an equal share of --max-rate; the stream limit caps how many run at once.
+        bandwidth.configure(args.max_rate, limits.limit("stream"))
+        postprocess.configure(remux_workers=limits.limit("remux"))
+        if args.adaptive and engine == "async":
+            logger.warning("--adaptive only applies to the thread engine; the async engine keeps --concurrent stream jobs.")
+        concurrency = AdaptiveConcurrency(max_concurrent_lectures) if args.adaptive and engine == "thread" else None
+        if concurrency:
+            http_session.add_response_hook(concurrency.record_response)
+
         if not course_url and not args.id:
             logger.error("You must provide either the course ID with '--id' or the course URL with '--url' (or set COURSE_LINK in .env) to proceed.")
             return
@@ -575,6 +949,10 @@ def main():
         skip_articles = args.skip_articles
         skip_assignments = args.skip_assignments
 
+        udemy.metadata_cache = MetadataCache(course_id)
+        if args.refresh_metadata:
+            udemy.metadata_cache.clear()
+
         course_info = udemy.fetch_course(course_id)
         COURSE_DIR = os.path.join(OUTPUT_DIR, remove_emojis_and_binary(sanitize_filename(course_info['title'])))
 
@@ -641,6 +1019,7 @@ def main():
                     rprint(root_tree, file=f)
                     logger.info(f"The course curriculum tree has been successfully saved to {args.tree}")
 
+        keep_vtt = args.keep_vtt
         if args.srt:
             convert_to_srt = True
         else:
@@ -688,6 +1067,11 @@ def main():
         elapsed_time = end_time - start_time
 
         logger.info(f"Download finished in {format_time(elapsed_time)}")
+        for line in trace.report():
+            logger.info(line)
+        metrics.close()
+        connections = http_session.connection_stats()
+        logger.info("HTTP requests: %d (%d new connections, %d reused)", connections["requests"], connections["new"], connections["reused"])
 
         if download_summary["failed"]:
             logger.error(f"Download completed with {download_summary['failed']} failed item(s).")
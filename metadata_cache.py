@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""On-disk cache for course API responses with TTL and ETag revalidation."""
+
+import json
+import os
+import tempfile
+import time
+from pathlib import Path
+
+from utils import signed_url
+
+# Course structure changes rarely; a stale entry is revalidated, not thrown away.
+METADATA_TTL = 6 * 3600
+# Signed media and caption URLs stop working long before the metadata around them changes.
+# Used only when none of the URLs says when it expires.
+MEDIA_URL_TTL = 15 * 60
+
+
+class MetadataCache:
+    def __init__(self, course_id, cache_dir="cache", ttl=METADATA_TTL, media_ttl=MEDIA_URL_TTL):
+        self.course_id = str(course_id)
+        self.cache_dir = Path(cache_dir) / f"metadata_{self.course_id}"
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.ttl = ttl
+        self.media_ttl = media_ttl
+
+    def _path(self, name):
+        return self.cache_dir / f"{name}.json"
+
+    def get(self, name):
+        try:
+            with self._path(name).open("r", encoding="utf-8") as file:
+                entry = json.load(file)
+        except (OSError, json.JSONDecodeError):
+            return None
+        return entry if isinstance(entry, dict) and "body" in entry else None
+
+    def is_fresh(self, entry):
+        now = time.time()
+        if self.is_media_expired(entry, now):
+            return False
+        return now - entry.get("fetched_at", 0) < self.ttl
+
+    def is_media_expired(self, entry, now=None):
+        expires_at = entry.get("media_expires_at")
+        return expires_at is not None and (now or time.time()) >= expires_at
+
+    def validators(self, entry):
+        """Return conditional request headers for a stale entry whose media URLs are still usable."""
+        if not entry or self.is_media_expired(entry):
+            return {}
+        headers = {}
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def put(self, name, url, body, headers=None, has_media=False):
+        now = time.time()
+        headers = headers or {}
+        media_expires_at = None
+        if has_media:
+            expiry = signed_url.earliest_expiry(body)
+            media_expires_at = expiry - signed_url.REFRESH_MARGIN if expiry else now + self.media_ttl
+        entry = {"url": url, "fetched_at": now, "etag": headers.get("ETag"), "last_modified": headers.get("Last-Modified"),
+                 "media_expires_at": media_expires_at, "body": body}
+        self._write(name, entry)
+        return entry
+
+    def touch(self, name, entry):
+        """Mark a revalidated (304) entry as fresh again."""
+        entry["fetched_at"] = time.time()
+        self._write(name, entry)
+
+    def _write(self, name, entry):
+        temp_name = None
+        try:
+            with tempfile.NamedTemporaryFile("w", encoding="utf-8", delete=False, dir=self.cache_dir, suffix=".tmp") as file:
+                json.dump(entry, file, ensure_ascii=False)
+                temp_name = file.name
+            os.replace(temp_name, self._path(name))
+        except OSError as error:
+            if temp_name and os.path.exists(temp_name):
+                os.unlink(temp_name)
+            print(f"Failed to save metadata cache entry {name}: {error}")
+
+    def clear(self):
+        for path in self.cache_dir.glob("*.json"):
+            path.unlink(missing_ok=True)
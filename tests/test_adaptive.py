@@ -0,0 +1,74 @@
+import unittest
+
+from utils.adaptive import AdaptiveConcurrency
+from utils.downloader_output import OutputFollower
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class _NoProgress:
+    def update(self, task_id, **fields):
+        pass
+
+
+class AdaptiveConcurrencyTests(unittest.TestCase):
+    def setUp(self):
+        self.clock = _Clock()
+        self.bytes = 0
+        self.controller = AdaptiveConcurrency(8, start=2, window=10, clock=self.clock, bytes_counter=lambda: self.bytes)
+
+    def run_window(self, transferred):
+        for _ in range(self.controller.limit):
+            self.controller.acquire()
+        self.clock.now += 10
+        self.bytes += transferred
+        self.controller.release()
+        for _ in range(self.controller._active):
+            self.controller.release()
+
+    def test_limit_grows_while_throughput_rises_and_holds_when_flat(self):
+        self.run_window(100)
+        self.assertEqual(self.controller.limit, 3)
+        self.run_window(200)
+        self.assertEqual(self.controller.limit, 4)
+        self.run_window(200)
+        self.assertEqual(self.controller.limit, 4)
+
+    def test_stream_progress_counts_before_the_files_finish(self):
+        # One long HLS download per window: no file completes, but its progress lines carry the bytes.
+        follower = OutputFollower(_NoProgress(), 1, record=self.add_bytes)
+        done = 0
+        for step in (10, 30, 60):
+            done += step
+            for _ in range(self.controller.limit):
+                self.controller.acquire()
+            self.clock.now += 10
+            follower.feed(f"Vid 1920x1080 ━━ {done}% {done}.00% {done}.00MB/500.00MB 3.0MBps")
+            self.controller.release()
+            for _ in range(self.controller._active):
+                self.controller.release()
+        self.assertEqual(self.controller.limit, 5)
+
+    def add_bytes(self, amount):
+        self.bytes += amount
+
+    def test_errors_halve_the_limit(self):
+        self.controller.limit = 6
+        self.controller.acquire()
+
+        class Response:
+            status_code = 429
+
+        self.controller.record_response(Response())
+        self.controller.release()
+        self.assertEqual(self.controller.limit, 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,153 @@
+import asyncio
+import sys
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from utils import retry
+from utils.async_engine import AsyncEngine, OutputLines, aiohttp
+from utils.download_result import DownloadResult
+from utils.process_m3u8 import downloader_failed
+
+
+class _Progress:
+    def __init__(self):
+        self.updates = []
+
+    def update(self, task_id, **fields):
+        self.updates.append(fields)
+
+
+def _python(code):
+    return [sys.executable, "-c", code]
+
+
+class AsyncEngineTests(unittest.TestCase):
+    def setUp(self):
+        retry.configure(attempts=1)
+        self.addCleanup(retry.configure)
+
+    def run_engine(self, coroutine_fn, **limits):
+        async def main():
+            async with AsyncEngine(**limits) as engine:
+                return await coroutine_fn(engine)
+        return asyncio.run(main())
+
+    def test_subprocess_output_is_streamed_line_by_line(self):
+        seen = []
+        code, output = self.run_engine(lambda engine: engine.run_process(_python("print('a'); print('b')"), seen.append), stream_limit=1)
+        self.assertEqual(code, 0)
+        self.assertEqual([line.strip() for line in seen], ["a", "b"])
+        self.assertEqual(output.split(), ["a", "b"])
+
+    def test_carriage_return_progress_reaches_the_follower(self):
+        progress = _Progress()
+        # Well over 64 KiB of progress redrawn with \r and never a \n.
+        command = _python("import sys\nfor i in range(20000): sys.stdout.write(f'Vid 1080p {i / 200:.2f}% 3MB/s\\r')")
+        result = self.run_engine(lambda engine: engine._run_downloader(command, 1, progress, downloader_failed), stream_limit=1)
+        self.assertTrue(result.success)
+        self.assertTrue(progress.updates)
+        self.assertEqual(progress.updates[-1], {"completed": 99})
+
+    def test_output_lines_split_on_every_line_ending_across_chunks(self):
+        lines = OutputLines()
+        seen = lines.feed(b"a 1%\rb 2%\r") + lines.feed(b"\nc\r\nd 3") + lines.feed(b"%\xe2\x82") + lines.feed(b"\xac") + lines.close()
+        self.assertEqual(seen, ["a 1%\n", "b 2%\n", "c\n", "d 3%\u20ac"])
+
+    def test_downloader_progress_and_forbidden_failure(self):
+        progress = _Progress()
+        command = _python("import sys; print('Vid 1080p 42.5% 3MB/s'); print('403 (Forbidden)'); sys.exit(2)")
+        result = self.run_engine(lambda engine: engine._run_downloader(command, 1, progress, downloader_failed), stream_limit=1)
+        self.assertFalse(result.success)
+        self.assertEqual(result.http_status, 403)
+        self.assertEqual(progress.updates, [{"completed": 42.5}])
+
+    def test_blocking_transfers_share_the_transfer_limit(self):
+        active, peak, lock = [0], [0], threading.Lock()
+
+        def work():
+            with lock:
+                active[0] += 1
+                peak[0] = max(peak[0], active[0])
+            time.sleep(0.02)
+            with lock:
+                active[0] -= 1
+
+        async def run(engine):
+            await asyncio.gather(*(engine.transfer(work) for _ in range(12)))
+
+        self.run_engine(run, stream_limit=1, transfer_limit=3)
+        self.assertEqual(peak[0], 3)
+
+    def test_transfers_reach_a_file_limit_above_the_default_executor_size(self):
+        # Every transfer waits for all the others, so this only finishes if all 48 run at once.
+        barrier = threading.Barrier(48, timeout=5)
+
+        async def run(engine):
+            await asyncio.gather(*(engine.transfer(barrier.wait) for _ in range(48)))
+
+        self.run_engine(run, stream_limit=1, transfer_limit=48)
+        self.assertFalse(barrier.broken)
+
+
+class CallResultAsyncTests(unittest.TestCase):
+    def test_failed_results_are_retried(self):
+        retry._policy = retry.RetryPolicy(attempts=3, base_delay=0)
+        self.addCleanup(retry.configure)
+        results = [DownloadResult.failed("first", transient=True), DownloadResult.ok()]
+
+        async def attempt():
+            return results.pop(0)
+
+        self.assertTrue(asyncio.run(retry.call_result_async(attempt)).success)
+        self.assertEqual(results, [])
+
+
+class _CaptionHandler(BaseHTTPRequestHandler):
+    statuses = []
+
+    def do_GET(self):
+        status = type(self).statuses.pop(0) if type(self).statuses else 200
+        body = b"WEBVTT\n" if status == 200 else b""
+        self.send_response(status)
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("ETag", '"caption"')
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@unittest.skipIf(aiohttp is None, "aiohttp is not installed")
+class AiohttpFetchTests(unittest.TestCase):
+    def setUp(self):
+        server = ThreadingHTTPServer(("127.0.0.1", 0), _CaptionHandler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        self.url = f"http://127.0.0.1:{server.server_address[1]}/en.vtt"
+        retry._policy = retry.RetryPolicy(attempts=2, base_delay=0)
+        self.addCleanup(retry.configure)
+
+    def fetch(self):
+        async def main():
+            async with AsyncEngine(stream_limit=1) as engine:
+                return await engine.fetch(self.url, "caption en.vtt")
+        return asyncio.run(main())
+
+    def test_transient_status_is_retried(self):
+        _CaptionHandler.statuses = [503]
+        self.assertEqual(self.fetch(), (b"WEBVTT\n", '"caption"'))
+        self.assertEqual(_CaptionHandler.statuses, [])
+
+    def test_permanent_status_is_raised_without_retry(self):
+        _CaptionHandler.statuses = [404, 200]
+        with self.assertRaises(aiohttp.ClientResponseError):
+            self.fetch()
+        self.assertEqual(_CaptionHandler.statuses, [200])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,36 @@
+import time
+import unittest
+
+from utils import bandwidth
+
+
+class BandwidthTests(unittest.TestCase):
+    def tearDown(self):
+        bandwidth.configure(None)
+
+    def test_parse_rate_accepts_suffixes(self):
+        self.assertEqual(bandwidth.parse_rate("50M"), 50 * 1024 ** 2)
+        self.assertEqual(bandwidth.parse_rate("800k"), 800 * 1024)
+        self.assertEqual(bandwidth.parse_rate("1.5MB/s"), int(1.5 * 1024 ** 2))
+        self.assertEqual(bandwidth.parse_rate("4096"), 4096)
+        with self.assertRaises(ValueError):
+            bandwidth.parse_rate("fast")
+
+    def test_bucket_holds_throughput_at_the_rate(self):
+        bucket = bandwidth.TokenBucket(100000)
+        started = time.monotonic()
+        for _ in range(15):
+            bucket.consume(10000)
+        # The first second is the burst allowance; the remaining 50 KB must take ~0.5 s.
+        self.assertGreaterEqual(time.monotonic() - started, 0.4)
+
+    def test_subprocess_share_is_carved_out_of_the_python_budget(self):
+        bandwidth.configure(4 * 1024 ** 2, stream_slots=4)
+        with bandwidth.subprocess_share() as max_speed:
+            self.assertEqual(max_speed, "1024K")
+            self.assertEqual(bandwidth._bucket.rate, 3 * 1024 ** 2)
+        self.assertEqual(bandwidth._bucket.rate, 4 * 1024 ** 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,34 @@
+import threading
+import unittest
+
+from utils.dispatcher import Dispatcher
+
+
+class DispatcherTests(unittest.TestCase):
+    def test_every_job_runs_once(self):
+        seen = []
+        lock = threading.Lock()
+
+        def handler(job):
+            with lock:
+                seen.append(job)
+
+        with Dispatcher(handler, workers=4) as dispatcher:
+            for job in range(2000):
+                dispatcher.submit(job)
+        self.assertEqual(sorted(seen), list(range(2000)))
+
+    def test_handler_errors_surface_on_close(self):
+        def handler(job):
+            if job == 3:
+                raise ValueError("boom")
+
+        dispatcher = Dispatcher(handler, workers=2)
+        for job in range(6):
+            dispatcher.submit(job)
+        with self.assertRaises(ValueError):
+            dispatcher.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
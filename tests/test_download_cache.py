@@ -1,8 +1,9 @@
+import json
 import os
 import tempfile
 import unittest
 
-from download_cache import DownloadCache
+from download_cache import DirectoryIndex, DownloadCache
 
 
 class DownloadCacheTests(unittest.TestCase):
@@ -29,6 +30,93 @@ class DownloadCacheTests(unittest.TestCase):
                 file.write(b"x")
             self.assertFalse(cache.is_download_completed(1, 1, "Lecture", output)[0])
 
+    def test_journaled_changes_survive_without_close(self):
+        with tempfile.TemporaryDirectory() as directory:
+            cache = DownloadCache("course", directory)
+            key = cache.mark_download_started(1, 1, "Lecture", 42, "Video")
+            cache.mark_download_failed(key, "network failure")
+            reloaded = DownloadCache("course", directory)
+            self.assertEqual(reloaded.cache_data["downloads"][key]["status"], "failed")
+            self.assertEqual(reloaded.get_download_summary()["failed"], 1)
+
+    def test_journal_is_compacted_into_the_snapshot(self):
+        with tempfile.TemporaryDirectory() as directory:
+            cache = DownloadCache("course", directory)
+            cache.storage.compact_every = 3
+            for index in range(4):
+                cache.mark_download_started(1, index, "Lecture", index, "Video")
+            with open(cache.cache_file, encoding="utf-8") as file:
+                self.assertEqual(len(json.load(file)["downloads"]), 3)
+            cache.close()
+            self.assertFalse(cache.storage.journal_file.exists())
+            self.assertEqual(len(DownloadCache("course", directory).cache_data["downloads"]), 4)
+
+    def test_legacy_json_cache_is_migrated(self):
+        with tempfile.TemporaryDirectory() as directory:
+            legacy = DownloadCache("course", directory, backend="json")
+            key = legacy.mark_download_started(1, 1, "Lecture", 42, "Video")
+            cache = DownloadCache("course", directory)
+            self.assertIn(key, cache.cache_data["downloads"])
+            cache.mark_download_failed(key, "network failure")
+            cache.close()
+            self.assertEqual(DownloadCache("course", directory, backend="json").cache_data["downloads"][key]["status"], "failed")
+
+    def test_counters_follow_status_changes(self):
+        with tempfile.TemporaryDirectory() as directory:
+            cache = DownloadCache("course", directory)
+            output = os.path.join(directory, "lecture.mp4")
+            with open(output, "wb") as file:
+                file.write(b"complete")
+            keys = [cache.mark_download_started(1, index, "Lecture", index, "Video") for index in range(3)]
+            cache.mark_download_completed(keys[0], output)
+            cache.mark_download_failed(keys[1], "network failure")
+            self.assertEqual(cache.get_download_summary()["completed"], 1)
+            self.assertEqual([key for key, _ in cache.get_failed_downloads()], [keys[1]])
+            cache.reset_failed_downloads()
+            cache.mark_download_started(1, 0, "Lecture", 0, "Video")
+            summary = cache.get_download_summary()
+            self.assertEqual((summary["completed"], summary["failed"], summary["in_progress"]), (0, 0, 3))
+            self.assertEqual(cache.check_consistency(), [])
+            self.assertEqual(DownloadCache("course", directory).check_consistency(), [])
+
+    def test_completed_file_is_skipped_until_it_changes(self):
+        with tempfile.TemporaryDirectory() as directory:
+            cache = DownloadCache("course", directory)
+            output = os.path.join(directory, "slides.pdf")
+            with open(output, "wb") as file:
+                file.write(b"slides")
+            self.assertFalse(cache.is_file_completed("asset_1_2", output))
+            cache.mark_file_completed("asset_1_2", output, '"v1"')
+            self.assertTrue(cache.is_file_completed("asset_1_2", output))
+            with open(output, "ab") as file:
+                file.write(b"x")
+            self.assertFalse(cache.is_file_completed("asset_1_2", output))
+            self.assertFalse(DownloadCache("course", directory).is_file_completed("asset_1_2", output))
+
+    def test_each_folder_is_listed_once_per_run(self):
+        listed = []
+
+        def scandir(folder):
+            listed.append(folder)
+            return os.scandir(folder)
+
+        with tempfile.TemporaryDirectory() as directory:
+            cache = DownloadCache("course", directory)
+            paths = [os.path.join(directory, f"{index} Lecture.mp4") for index in range(5)]
+            for index, path in enumerate(paths):
+                with open(path, "wb") as file:
+                    file.write(b"video")
+                cache.mark_download_completed(cache.mark_download_started(1, index, "Lecture", index, "Video"), path)
+            cache = DownloadCache("course", directory, directory_index=DirectoryIndex(scandir=scandir))
+            for index, path in enumerate(paths):
+                self.assertTrue(cache.is_download_completed(1, index, "Lecture", path)[0])
+            self.assertEqual(listed, [os.path.abspath(directory)])
+            with open(paths[0], "ab") as file:
+                file.write(b" re-downloaded")
+            cache.mark_download_completed(cache.mark_download_started(1, 0, "Lecture", 0, "Video"), paths[0])
+            self.assertTrue(cache.is_download_completed(1, 0, "Lecture", paths[0])[0])
+            self.assertEqual(len(listed), 1)
+
 
 if __name__ == "__main__":
     unittest.main()
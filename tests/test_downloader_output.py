@@ -0,0 +1,83 @@
+import unittest
+
+from utils.downloader_output import TAIL_LINES, OutputFollower, ProgressUpdater, follow, parse_percent, transient_failure
+
+
+class _Progress:
+    def __init__(self):
+        self.updates = []
+
+    def update(self, task_id, **fields):
+        self.updates.append(fields["completed"])
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class ParsePercentTests(unittest.TestCase):
+    def test_first_decimal_percentage_is_returned(self):
+        self.assertEqual(parse_percent("Vid 1920x1080 ━━━━ 120/458 26.20% 12.3MB/47.1MB 3.1MBps 00:00:11"), 26.2)
+        self.assertEqual(parse_percent("Aud 100% done, Vid 5.50% left"), 5.5)
+
+    def test_lines_without_a_decimal_percentage(self):
+        for line in ("", "Downloading segments", "100% complete", "%.5% odd", "5.% odd"):
+            self.assertIsNone(parse_percent(line))
+
+
+class ProgressUpdaterTests(unittest.TestCase):
+    def test_updates_are_coalesced_to_the_refresh_interval(self):
+        progress, clock = _Progress(), _Clock()
+        updater = ProgressUpdater(progress, 1, interval=0.1, clock=clock)
+        for step in range(10):
+            clock.now = step * 0.02
+            updater(float(step))
+        updater.flush()
+        self.assertEqual(progress.updates, [0.0, 5.0, 9.0])
+
+    def test_values_are_capped_below_completion(self):
+        progress = _Progress()
+        ProgressUpdater(progress, 1)(100.0)
+        self.assertEqual(progress.updates, [99])
+
+
+class OutputFollowerTests(unittest.TestCase):
+    def test_bytes_are_counted_per_track_as_they_arrive(self):
+        recorded = []
+        follower = OutputFollower(_Progress(), 1, record=recorded.append)
+        for line in ("Vid 1920x1080 ━━ 10/40 25.00% 1.00MB/4.00MB 1.0MBps", "Aud 128Kbps ━━ 10/40 25.00% 256.00KB/1.00MB",
+                     "Vid 1920x1080 ━━ 20/40 50.00% 2.00MB/4.00MB 1.0MBps", "Vid 1920x1080 ━━ 20/40 50.00% 2.00MB/4.00MB 0.0MBps"):
+            follower.feed(line)
+        self.assertEqual(recorded, [1024 ** 2, 256 * 1024, 1024 ** 2])
+
+    def test_changing_totals_are_not_counted_twice_and_tracks_stay_apart(self):
+        recorded = []
+        follower = OutputFollower(_Progress(), 1, record=recorded.append)
+        for done, total in ((1, "4.10"), (2, "3.95"), (3, "4.02"), (4, "4.00")):
+            follower.feed(f"Vid 1920x1080 | 4000 Kbps ━━━━ {done * 10}/40 {done * 25}.00% {done}.00MB/{total}MB 1.0MBps")
+            for language in ("en", "es"):
+                follower.feed(f"Aud {language} 128Kbps ━━━━ {done * 10}/40 {done * 25}.00% {done * 256}.00KB/1.00MB")
+        self.assertEqual(sum(recorded), 4 * 1024 ** 2 + 2 * 1024 ** 2)
+
+    def test_transient_failures_are_told_apart_from_deterministic_ones(self):
+        self.assertTrue(transient_failure("HttpRequestException: Connection reset by peer"))
+        self.assertTrue(transient_failure("Response status code does not indicate success: 503 (Service Unavailable)."))
+        self.assertFalse(transient_failure("Decryption failed: bad key"))
+        self.assertFalse(transient_failure("No space left on device"))
+
+
+class FollowTests(unittest.TestCase):
+    def test_only_the_tail_is_kept(self):
+        progress = _Progress()
+        lines = [f"line {index} {index}.00%\n" for index in range(TAIL_LINES * 3)]
+        tail = follow(lines, progress, 1)
+        self.assertEqual(tail.splitlines(), [line.strip() for line in lines[-TAIL_LINES:]])
+        self.assertEqual(progress.updates[-1], 99)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,46 @@
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from utils import http_session
+
+
+class _KeepAliveHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        body = b"ok"
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class HttpSessionTests(unittest.TestCase):
+    def test_repeated_requests_reuse_one_connection(self):
+        server = ThreadingHTTPServer(("127.0.0.1", 0), _KeepAliveHandler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        try:
+            http_session.configure(pool_size=2)
+            before = http_session.connection_stats()
+            url = f"http://127.0.0.1:{server.server_address[1]}/"
+            for _ in range(3):
+                self.assertEqual(http_session.get_session().get(url, timeout=5).text, "ok")
+            after = http_session.connection_stats()
+            self.assertEqual(after["requests"] - before["requests"], 3)
+            self.assertEqual(after["new"] - before["new"], 1)
+        finally:
+            http_session.close()
+            server.shutdown()
+            server.server_close()
+
+    def test_pool_covers_every_ranged_connection_and_small_file(self):
+        self.assertEqual(http_session.pool_size_for(stream_slots=4, connections=4, file_slots=8, api_slots=4), 24)
+        self.assertEqual(http_session.pool_size_for(stream_slots=1, connections=1, file_slots=1, api_slots=6), 6)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,43 @@
+import threading
+import time
+import unittest
+
+from utils import limits
+
+
+class LimitsTests(unittest.TestCase):
+    def setUp(self):
+        self.addCleanup(limits.configure, **limits.DEFAULTS)
+
+    def test_configure_sets_only_the_given_kinds(self):
+        limits.configure(api=2, remux=None)
+        self.assertEqual(limits.limit("api"), 2)
+        self.assertEqual(limits.limit("remux"), limits.DEFAULTS["remux"])
+        with self.assertRaises(ValueError):
+            limits.configure(video=1)
+
+    def test_each_kind_is_bounded_independently(self):
+        limits.configure(stream=1, remux=2)
+        active = {"stream": 0, "remux": 0}
+        peak = dict(active)
+        lock = threading.Lock()
+
+        def work(kind):
+            with limits.slot(kind):
+                with lock:
+                    active[kind] += 1
+                    peak[kind] = max(peak[kind], active[kind])
+                time.sleep(0.02)
+                with lock:
+                    active[kind] -= 1
+
+        threads = [threading.Thread(target=work, args=(kind,)) for kind in ("stream", "remux") * 4]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(peak, {"stream": 1, "remux": 2})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,180 @@
+import os
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+from urllib.parse import parse_qs, urlsplit
+
+import main
+from download_cache import DownloadCache
+from metadata_cache import MetadataCache
+from utils import io_pool, process_assets, process_captions
+
+CHAPTER = {"_class": "chapter", "id": 1, "title": "Basics", "is_published": True}
+
+
+def lectures(count):
+    return [{"_class": "lecture", "id": number, "title": f"Lecture {number}"} for number in range(1, count + 1)]
+
+
+class _Response:
+    def __init__(self, body, status_code=200, headers=None):
+        self.body = body
+        self.status_code = status_code
+        self.headers = headers or {}
+
+    def json(self):
+        return self.body
+
+
+class _Progress:
+    def update(self, *args, **fields):
+        pass
+
+
+class CurriculumPagingTests(unittest.TestCase):
+    """Pages of two items: the chapter and lectures 1-6 make four pages."""
+
+    def setUp(self):
+        patcher = mock.patch.object(main, "CURRICULUM_PAGE_SIZE", 2)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.items = [CHAPTER] + lectures(6)
+        self.udemy = main.Udemy.__new__(main.Udemy)
+        self.udemy.metadata_cache = None
+        self.udemy.request = self.request
+        self.broken_pages = {}
+        self.requested = []
+        self.not_modified = 0
+
+    def page_body(self, page):
+        results = self.items[(page - 1) * 2:page * 2]
+        next_url = f"https://udemy.test/curriculum?cursor={page + 1}" if page * 2 < len(self.items) else None
+        return {"count": len(self.items), "next": next_url, "results": results}
+
+    def request(self, url, headers=None):
+        self.requested.append(url)
+        query = parse_qs(urlsplit(url).query)
+        if "cursor" in query:
+            return _Response(self.page_body(int(query["cursor"][0])))
+        page = int(query.get("page", ["1"])[0])
+        if page == 1:
+            # Page 1 keeps its ETag while only later pages change.
+            if (headers or {}).get("If-None-Match") == '"page-1"':
+                self.not_modified += 1
+                return _Response(None, 304)
+            return _Response(self.page_body(1), headers={"ETag": '"page-1"'})
+        # Later pages answer first, so completion order differs from curriculum order.
+        time.sleep(0.01 * (5 - page))
+        return _Response(self.broken_pages.get(page) or self.page_body(page))
+
+    def test_pages_are_reassembled_in_curriculum_order(self):
+        results = self.udemy.fetch_remaining_curriculum_pages("https://udemy.test/curriculum?page_size=2", 7, _Progress(), 1, 2)
+        self.assertEqual(results, self.items[2:])
+
+    def test_page_without_results_falls_back_to_next_links(self):
+        self.broken_pages[3] = {"detail": "Page not available."}
+        with self.assertRaises(ValueError):
+            self.udemy.fetch_remaining_curriculum_pages("https://udemy.test/curriculum?page_size=2", 7, _Progress(), 1, 2)
+        curriculum = self.udemy.fetch_course_curriculum(1)
+        self.assertEqual(curriculum[0]["children"], lectures(6))
+        self.assertEqual(sum("cursor=" in url for url in self.requested), 3)
+
+    def test_count_mismatch_falls_back_to_next_links(self):
+        self.broken_pages[4] = {"count": 7, "next": None, "results": []}
+        with self.assertRaises(ValueError):
+            self.udemy.fetch_remaining_curriculum_pages("https://udemy.test/curriculum?page_size=2", 7, _Progress(), 1, 2)
+        curriculum = self.udemy.fetch_course_curriculum(1)
+        self.assertEqual(curriculum[0]["children"], lectures(6))
+
+    def test_cached_multi_page_curriculum_is_not_revalidated_by_page_one(self):
+        with tempfile.TemporaryDirectory() as directory:
+            self.udemy.metadata_cache = MetadataCache("course", directory, ttl=0)
+            self.udemy.fetch_course_curriculum(1)
+            self.items[5] = {"_class": "lecture", "id": 5, "title": "Lecture 5 (re-recorded)"}
+            curriculum = self.udemy.fetch_course_curriculum(1)
+        self.assertEqual(self.not_modified, 0)
+        self.assertEqual(curriculum[0]["children"][4]["title"], "Lecture 5 (re-recorded)")
+
+    def test_single_page_curriculum_is_revalidated_with_its_etag(self):
+        self.items = [CHAPTER] + lectures(1)
+        with tempfile.TemporaryDirectory() as directory:
+            self.udemy.metadata_cache = MetadataCache("course", directory, ttl=0)
+            self.udemy.fetch_course_curriculum(1)
+            curriculum = self.udemy.fetch_course_curriculum(1)
+        self.assertEqual(self.not_modified, 1)
+        self.assertEqual(curriculum[0]["children"], lectures(1))
+
+
+class PlanLecturesTests(unittest.TestCase):
+    def test_completed_lectures_are_dropped_before_lecture_details_are_fetched(self):
+        chapter = {"title": "Basics", "children": []}
+        video = {"id": 1, "title": "Intro", "asset": {"asset_type": "Video"}}
+        article = {"id": 2, "title": "Notes", "asset": {"asset_type": "Article"}}
+        changed = {"id": 3, "title": "Setup", "asset": {"asset_type": "Video"}}
+        fresh = {"id": 4, "title": "Next", "asset": {"asset_type": "Video"}}
+        entries = [("01", chapter, f"{number:02}", lecture, 1) for number, lecture in enumerate((video, article, changed, fresh), start=1)]
+        with tempfile.TemporaryDirectory() as directory, mock.patch.object(main, "COURSE_DIR", directory, create=True):
+            udemy = main.Udemy.__new__(main.Udemy)
+            folder = udemy.chapter_folder("01", chapter)
+            os.makedirs(folder)
+            cache = DownloadCache("course", directory)
+            for (_, _, lindex, lecture, _), name in zip(entries[:3], ("01. Intro.mp4", "02. Notes.html", "03. Setup.mp4")):
+                path = os.path.join(folder, name)
+                with open(path, "wb") as file:
+                    file.write(b"done")
+                key = cache.mark_download_started(1, lindex, lecture["title"], lecture["id"], lecture["asset"]["asset_type"])
+                cache.mark_download_completed(key, path)
+            with open(os.path.join(folder, "03. Setup.mp4"), "ab") as file:
+                file.write(b" and changed")
+            with mock.patch.object(main.Udemy, "fetch_lecture_info") as fetch:
+                plan = udemy.plan_lectures(iter(entries), DownloadCache("course", directory))
+            fetch.assert_not_called()
+        self.assertEqual([entry[3]["id"] for entry in plan], [3, 4])
+
+
+class SideTaskTests(unittest.TestCase):
+    """A lecture's captions and attachments, queued the way download_lecture queues them."""
+
+    def setUp(self):
+        io_pool.configure(4)
+        self.addCleanup(io_pool.shutdown)
+        # Each task waits for the other, so both must be running on the pool at the same time.
+        self.barrier = threading.Barrier(2, timeout=5)
+        self.finished = []
+
+    def side_tasks(self, directory, asset_error=None):
+        def caption(*args):
+            self.barrier.wait()
+            self.finished.append("caption")
+
+        def attachment(*args):
+            self.barrier.wait()
+            if asset_error:
+                raise asset_error
+            self.finished.append("attachment")
+
+        with mock.patch.object(process_captions, "_download_caption", caption), mock.patch.object(process_assets, "_download_file", attachment):
+            return [
+                (main.CAPTIONS_ERROR, main.start_captions([{"locale_id": "en_US"}], directory, "01. Intro", ["en_US"], False)),
+                (main.ASSETS_ERROR, main.start_supplementary_assets(None, [{"id": 1, "asset_type": "File"}], directory, 1, 1)),
+            ]
+
+    def test_captions_and_attachments_run_concurrently(self):
+        with tempfile.TemporaryDirectory() as directory:
+            result = main.collect_side_tasks(self.side_tasks(directory))
+        self.assertTrue(result.success)
+        self.assertFalse(self.barrier.broken)
+        self.assertEqual(sorted(self.finished), ["attachment", "caption"])
+
+    def test_failed_side_task_reaches_the_lecture_result(self):
+        with tempfile.TemporaryDirectory() as directory:
+            result = main.collect_side_tasks(self.side_tasks(directory, OSError("disk full")))
+        self.assertFalse(result.success)
+        self.assertEqual(result.error, f"{main.ASSETS_ERROR}: disk full")
+        self.assertEqual(self.finished, ["caption"])
+
+
+if __name__ == "__main__":
+    unittest.main()
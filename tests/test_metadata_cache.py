@@ -0,0 +1,49 @@
+import tempfile
+import time
+import unittest
+
+from metadata_cache import MetadataCache
+from utils import signed_url
+
+
+class MetadataCacheTests(unittest.TestCase):
+    def test_fresh_entry_is_served_from_disk(self):
+        with tempfile.TemporaryDirectory() as directory:
+            MetadataCache("course", directory).put("course", "https://example.test/", {"title": "T"}, {"ETag": '"v1"'})
+            cache = MetadataCache("course", directory)
+            entry = cache.get("course")
+            self.assertTrue(cache.is_fresh(entry))
+            self.assertEqual(entry["body"], {"title": "T"})
+
+    def test_stale_entry_is_revalidated_with_its_etag(self):
+        with tempfile.TemporaryDirectory() as directory:
+            cache = MetadataCache("course", directory, ttl=0)
+            entry = cache.put("curriculum", "https://example.test/", [], {"ETag": '"v1"'})
+            self.assertFalse(cache.is_fresh(entry))
+            self.assertEqual(cache.validators(entry), {"If-None-Match": '"v1"'})
+            cache.ttl = 60
+            cache.touch("curriculum", entry)
+            self.assertTrue(cache.is_fresh(cache.get("curriculum")))
+
+    def test_expired_media_urls_force_a_full_fetch(self):
+        with tempfile.TemporaryDirectory() as directory:
+            cache = MetadataCache("course", directory, media_ttl=60)
+            entry = cache.put("lecture_1", "https://example.test/", {"asset": {}}, {"ETag": '"v1"'}, has_media=True)
+            self.assertTrue(cache.is_fresh(entry))
+            entry["media_expires_at"] = time.time() - 1
+            self.assertFalse(cache.is_fresh(entry))
+            self.assertEqual(cache.validators(entry), {})
+
+    def test_signed_url_expiry_replaces_the_fixed_media_ttl(self):
+        with tempfile.TemporaryDirectory() as directory:
+            cache = MetadataCache("course", directory, media_ttl=24 * 3600)
+            expires = int(time.time()) + signed_url.REFRESH_MARGIN + 60
+            body = {"asset": {"media_sources": [{"src": f"https://cdn.test/a.mp4?Expires={expires}"}]}}
+            entry = cache.put("lecture_1", "https://example.test/", body, has_media=True)
+            self.assertEqual(entry["media_expires_at"], expires - signed_url.REFRESH_MARGIN)
+            self.assertTrue(cache.is_fresh(entry))
+            self.assertTrue(cache.is_media_expired(entry, now=expires - 30))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,49 @@
+import os
+import tempfile
+import unittest
+import urllib.request
+
+from download_cache import DownloadCache
+from utils import limits, metrics
+
+
+class MetricsTests(unittest.TestCase):
+    def tearDown(self):
+        metrics.close()
+        metrics.watch_cache(None)
+
+    def test_render_reports_cache_status_and_failures_by_type(self):
+        with tempfile.TemporaryDirectory() as directory:
+            cache = DownloadCache("course", directory)
+            cache.mark_download_failed(cache.mark_download_started(1, 1, "Intro", 1, "Video"), "HTTP 500")
+            cache.mark_download_started(1, 2, "Notes", 2, "Article")
+            metrics.watch_cache(cache)
+            with limits.slot("remux"):
+                text = metrics.render()
+        self.assertIn('udemy_downloader_lectures{status="failed"} 1', text)
+        self.assertIn('udemy_downloader_lectures{status="in_progress"} 1', text)
+        self.assertIn('udemy_downloader_lecture_failures{type="Video"} 1', text)
+        self.assertIn('udemy_downloader_active_jobs{stage="remux"} 1', text)
+
+    def test_histogram_buckets_are_cumulative(self):
+        histogram = metrics.Histogram((0.1, 1))
+        for value in (0.05, 0.5, 5):
+            histogram.observe(value)
+        self.assertEqual(histogram.render("latency")[:3], ['latency_bucket{le="0.1"} 1', 'latency_bucket{le="1"} 2', 'latency_bucket{le="+Inf"} 3'])
+
+    def test_textfile_and_endpoint_serve_the_same_metrics(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "udemy.prom")
+            metrics.configure(textfile=path, port=0)
+            port = metrics._server.server_address[1]
+            with urllib.request.urlopen(f"http://127.0.0.1:{port}/metrics") as response:
+                body = response.read().decode("utf-8")
+            metrics.close()
+            with open(path, encoding="utf-8") as file:
+                text = file.read()
+        self.assertIn("# TYPE udemy_downloader_bytes_downloaded_total counter", body)
+        self.assertIn("udemy_downloader_api_request_duration_seconds_count", text)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,55 @@
+import os
+import sys
+import tempfile
+import threading
+import unittest
+
+from utils import postprocess
+from utils.process_captions import save_caption
+
+VTT = b"WEBVTT\n\n00:00:01.000 --> 00:00:02.500\nHello\n"
+
+
+class PostprocessTests(unittest.TestCase):
+    def setUp(self):
+        postprocess.configure(remux_workers=1, cpu_workers=1)
+        self.addCleanup(postprocess.shutdown)
+
+    def test_remux_jobs_run_commands_and_shutdown_waits_for_callbacks(self):
+        finished = []
+        future = postprocess.submit_remux(postprocess.run, [sys.executable, "-c", "import sys; sys.stderr.write('bad'); sys.exit(3)"])
+        future.add_done_callback(lambda done: finished.append(done.result()))
+        postprocess.shutdown()
+        self.assertEqual(finished, [(3, "bad")])
+
+    def test_running_remux_is_not_counted_as_queued(self):
+        started, release = threading.Event(), threading.Event()
+
+        def remux():
+            started.set()
+            release.wait(5)
+
+        first = postprocess.submit_remux(remux)
+        started.wait(5)
+        second = postprocess.submit_remux(lambda: None)
+        self.assertEqual(postprocess.queued_remuxes(), 1)
+        release.set()
+        first.result()
+        second.result()
+        self.assertEqual(postprocess.queued_remuxes(), 0)
+
+    def test_srt_conversion_runs_on_the_cpu_pool(self):
+        with tempfile.TemporaryDirectory() as directory:
+            vtt_path = os.path.join(directory, "lecture.vtt")
+            srt_path = os.path.join(directory, "lecture.srt")
+            save_caption(VTT, vtt_path, srt_path)
+            self.assertFalse(os.path.exists(vtt_path))
+            with open(srt_path, encoding="utf-8") as file:
+                self.assertIn("00:00:01,000 --> 00:00:02,500", file.read())
+            save_caption(VTT, vtt_path, srt_path, keep_vtt=True)
+            with open(vtt_path, "rb") as file:
+                self.assertEqual(file.read(), VTT)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,30 @@
+import threading
+import unittest
+
+from utils.prefetch import prefetch
+
+
+class PrefetchTests(unittest.TestCase):
+    def test_results_keep_input_order(self):
+        results = [(item, future.result()) for item, future in prefetch(range(10), lambda item: item * 2, depth=3, workers=3)]
+        self.assertEqual(results, [(item, item * 2) for item in range(10)])
+
+    def test_fetches_never_run_more_than_depth_ahead(self):
+        started = []
+        lock = threading.Lock()
+
+        def fetch(item):
+            with lock:
+                started.append(item)
+            return item
+
+        lectures = prefetch(range(100), fetch, depth=4)
+        item, future = next(lectures)
+        future.result()
+        self.assertEqual(item, 0)
+        self.assertLessEqual(len(started), 5)
+        lectures.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,118 @@
+import os
+import tempfile
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
+
+from utils import ranged_download, retry
+
+PAYLOAD = bytes(range(256)) * 400
+
+
+class _RangeHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    fail_from = None
+    requests = []
+
+    def do_GET(self):
+        header = self.headers.get("Range")
+        start, end = 0, len(PAYLOAD) - 1
+        if header:
+            first, _, last = header[len("bytes="):].partition("-")
+            start, end = int(first), min(int(last or len(PAYLOAD) - 1), len(PAYLOAD) - 1)
+        if start >= len(PAYLOAD):
+            type(self).requests.append((start, None))
+            self.send_response(416)
+            self.send_header("Content-Range", f"bytes */{len(PAYLOAD)}")
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        type(self).requests.append((start, end))
+        if self.fail_from is not None and start >= self.fail_from:
+            self.send_error(503)
+            return
+        body = PAYLOAD[start:end + 1]
+        self.send_response(206 if header else 200)
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("ETag", '"payload"')
+        if header:
+            self.send_header("Content-Range", f"bytes {start}-{end}/{len(PAYLOAD)}")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class RangedDownloadTests(unittest.TestCase):
+    def setUp(self):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), _RangeHandler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}/video.mp4"
+        _RangeHandler.fail_from = None
+        _RangeHandler.requests = []
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+        retry.configure(attempts=1)
+        self.addCleanup(retry.configure)
+
+    def test_segments_are_reassembled_in_order(self):
+        with tempfile.TemporaryDirectory() as directory, mock.patch.object(ranged_download, "SEGMENT_SIZE", 10000):
+            output = os.path.join(directory, "video.mp4")
+            self.assertEqual(ranged_download.download_ranged(self.url, output, connections=3), len(PAYLOAD))
+            with open(output, "rb") as file:
+                self.assertEqual(file.read(), PAYLOAD)
+            self.assertFalse(os.path.exists(output + ".part.json"))
+
+    def test_interrupted_download_resumes_missing_segments_only(self):
+        with tempfile.TemporaryDirectory() as directory, mock.patch.object(ranged_download, "SEGMENT_SIZE", 10000):
+            output = os.path.join(directory, "video.mp4")
+            _RangeHandler.fail_from = 50000
+            with self.assertRaises(Exception):
+                ranged_download.download_ranged(self.url, output, connections=2)
+            self.assertFalse(os.path.exists(output))
+            _RangeHandler.fail_from = None
+            _RangeHandler.requests = []
+            ranged_download.download_ranged(self.url, output, connections=2)
+            with open(output, "rb") as file:
+                self.assertEqual(file.read(), PAYLOAD)
+            self.assertTrue(all(start >= 50000 for start, _ in _RangeHandler.requests[1:]))
+
+    def test_single_stream_continues_a_partial_file(self):
+        with tempfile.TemporaryDirectory() as directory:
+            output = os.path.join(directory, "slides.pdf")
+            self.write_part(output, PAYLOAD[:1000])
+            self.assertEqual(ranged_download.download_resumable(self.url, output), (len(PAYLOAD), '"payload"'))
+            self.assertEqual(_RangeHandler.requests, [(1000, len(PAYLOAD) - 1)])
+            with open(output, "rb") as file:
+                self.assertEqual(file.read(), PAYLOAD)
+
+    def write_part(self, output, data):
+        with open(output + ".part", "wb") as file:
+            file.write(data)
+        with open(output + ".part.json", "w", encoding="utf-8") as file:
+            file.write('{"resume_etag": "\\"payload\\""}')
+
+    def test_complete_part_file_is_finished_on_416(self):
+        with tempfile.TemporaryDirectory() as directory:
+            output = os.path.join(directory, "slides.pdf")
+            self.write_part(output, PAYLOAD)
+            self.assertEqual(ranged_download.download_resumable(self.url, output), (len(PAYLOAD), '"payload"'))
+            self.assertEqual(_RangeHandler.requests, [(len(PAYLOAD), None)])
+            with open(output, "rb") as file:
+                self.assertEqual(file.read(), PAYLOAD)
+            self.assertFalse(os.path.exists(output + ".part.json"))
+
+    def test_oversized_part_file_is_discarded_on_416(self):
+        with tempfile.TemporaryDirectory() as directory:
+            output = os.path.join(directory, "slides.pdf")
+            self.write_part(output, PAYLOAD + b"stale")
+            self.assertEqual(ranged_download.download_resumable(self.url, output), (len(PAYLOAD), '"payload"'))
+            self.assertEqual(_RangeHandler.requests, [(len(PAYLOAD) + 5, None), (0, len(PAYLOAD) - 1)])
+            with open(output, "rb") as file:
+                self.assertEqual(file.read(), PAYLOAD)
+
+
+if __name__ == "__main__":
+    unittest.main()
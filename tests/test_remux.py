@@ -0,0 +1,43 @@
+import os
+import sys
+import tempfile
+import unittest
+
+from utils import remux
+
+
+class RemuxCommandTests(unittest.TestCase):
+    def setUp(self):
+        self.addCleanup(remux.configure)
+
+    def test_compatible_audio_is_copied(self):
+        command = remux.remux_command("in.mkv", "out.mp4", "aac")
+        self.assertEqual(command[command.index("-c:a") + 1], "copy")
+        self.assertNotIn("-movflags", command)
+        self.assertEqual(command[-2:], ["-y", "out.mp4"])
+
+    def test_other_or_unknown_audio_is_transcoded(self):
+        for codec in ("opus", "vorbis", None):
+            command = remux.remux_command("in.mkv", "out.mp4", codec)
+            self.assertEqual(command[command.index("-c:a") + 1], "aac")
+
+    def test_faststart_moves_the_index(self):
+        remux.configure(faststart=True)
+        command = remux.remux_command("in.mkv", "out.mp4", "aac")
+        self.assertEqual(command[command.index("-movflags") + 1], "+faststart")
+
+    def test_probe_reads_the_first_audio_codec(self):
+        original = remux.FFPROBE_PATH
+        self.addCleanup(setattr, remux, "FFPROBE_PATH", original)
+        with tempfile.TemporaryDirectory() as directory:
+            fake = os.path.join(directory, "ffprobe")
+            with open(fake, "w", encoding="utf-8") as file:
+                file.write(f"#!{sys.executable}\nprint('AAC')\n")
+            os.chmod(fake, 0o755)
+            remux.FFPROBE_PATH = fake
+            self.assertEqual(remux.audio_codec("in.mkv"), "aac")
+            remux.FFPROBE_PATH = os.path.join(directory, "missing")
+            self.assertIsNone(remux.audio_codec("in.mkv"))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,90 @@
+import unittest
+
+import requests
+
+from utils import retry
+from utils.download_result import DownloadResult
+from utils.process_m3u8 import downloader_failed
+from utils.retry import RetryPolicy
+
+
+def _http_error(status, headers=None):
+    response = requests.Response()
+    response.status_code = status
+    response.headers.update(headers or {})
+    return requests.HTTPError(f"HTTP {status}", response=response)
+
+
+class RetryPolicyTests(unittest.TestCase):
+    def setUp(self):
+        self.sleeps = []
+        self.policy = RetryPolicy(attempts=4, base_delay=1, max_delay=5, sleep=self.sleeps.append, rand=lambda: 1.0)
+
+    def flaky(self, errors, value="done"):
+        errors = list(errors)
+
+        def call():
+            if errors:
+                raise errors.pop(0)
+            return value
+        return call
+
+    def test_backoff_doubles_up_to_the_cap(self):
+        call = self.flaky([requests.ConnectionError("reset")] * 3)
+        self.assertEqual(self.policy.call(call), "done")
+        self.assertEqual(self.sleeps, [1, 2, 4])
+        self.assertEqual(self.policy.delay(10), 5)
+
+    def test_retry_after_header_sets_the_delay(self):
+        call = self.flaky([_http_error(429, {"Retry-After": "3"})])
+        self.policy.call(call)
+        self.assertEqual(self.sleeps, [3])
+
+    def test_client_errors_and_exhausted_attempts_are_raised(self):
+        with self.assertRaises(requests.HTTPError):
+            self.policy.call(self.flaky([_http_error(404)]))
+        self.assertEqual(self.sleeps, [])
+        with self.assertRaises(requests.Timeout):
+            self.policy.call(self.flaky([requests.Timeout("slow")] * 4))
+        self.assertEqual(len(self.sleeps), 3)
+
+    def test_listener_sees_every_retry(self):
+        seen = []
+        with retry.on_retry(lambda description, error: seen.append(description)):
+            self.policy.call(self.flaky([requests.ConnectionError("reset")] * 2), description="lecture 1")
+        self.policy.call(self.flaky([requests.ConnectionError("reset")]))
+        self.assertEqual(seen, ["lecture 1", "lecture 1"])
+
+
+class CallResultTests(unittest.TestCase):
+    def setUp(self):
+        retry._policy = RetryPolicy(attempts=3, sleep=lambda seconds: None)
+        self.addCleanup(retry.configure)
+
+    def test_failed_results_are_retried_and_the_last_one_returned(self):
+        results = [DownloadResult.failed("first", transient=True), DownloadResult.failed("second", transient=True),
+                   DownloadResult.failed("third", transient=True)]
+        result = retry.call_result(lambda: results.pop(0))
+        self.assertFalse(result.success)
+        self.assertEqual(result.error, "third")
+
+    def test_success_stops_retrying(self):
+        results = [DownloadResult.failed("first", http_status=503), DownloadResult.ok()]
+        self.assertTrue(retry.call_result(lambda: results.pop(0)).success)
+        self.assertEqual(results, [])
+
+    def test_rejected_signatures_are_not_retried(self):
+        results = [DownloadResult.failed("403 Forbidden", http_status=403), DownloadResult.ok()]
+        self.assertEqual(retry.call_result(lambda: results.pop(0)).http_status, 403)
+
+    def test_deterministic_failures_are_not_retried(self):
+        results = [downloader_failed(1, "ERROR: Decryption failed, wrong key?"), DownloadResult.ok()]
+        self.assertIn("Decryption failed", retry.call_result(lambda: results.pop(0)).error)
+
+    def test_network_failures_in_the_output_are_retried(self):
+        results = [downloader_failed(1, "System.Net.Http.HttpRequestException: Connection reset by peer"), DownloadResult.ok()]
+        self.assertTrue(retry.call_result(lambda: results.pop(0)).success)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,29 @@
+import unittest
+
+from utils import schedule
+
+
+def entry(lindex, seconds=None, asset_type="Video"):
+    asset = {"asset_type": asset_type}
+    if seconds is not None:
+        asset["time_estimation"] = seconds
+    return ("01", {"title": "Chapter"}, f"{lindex:02}", {"title": f"Lecture {lindex}", "asset": asset}, 1)
+
+
+class ScheduleTests(unittest.TestCase):
+    def test_curriculum_order_is_kept_by_default(self):
+        plan = [entry(1, 60), entry(2, 600), entry(3, 30)]
+        self.assertEqual(schedule.order(plan), plan)
+
+    def test_only_videos_have_an_estimate(self):
+        self.assertEqual(schedule.estimated_seconds(entry(1, 60)[3]), 60)
+        self.assertEqual(schedule.estimated_seconds(entry(2, 60, "Article")[3]), 0)
+
+    def test_longest_first_keeps_curriculum_order_among_ties(self):
+        plan = [entry(1, 60), entry(2), entry(3, 3600), entry(4, 60, "Article"), entry(5, 600)]
+        ordered = [lecture[2] for lecture in schedule.order(plan, "longest-first")]
+        self.assertEqual(ordered, ["03", "05", "01", "02", "04"])
+
+
+if __name__ == "__main__":
+    unittest.main()
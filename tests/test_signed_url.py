@@ -0,0 +1,62 @@
+import base64
+import json
+import unittest
+
+from utils import signed_url
+
+
+def _b64(data):
+    return base64.urlsafe_b64encode(json.dumps(data).encode()).decode().rstrip("=")
+
+
+class ExpiresAtTests(unittest.TestCase):
+    def test_cloudfront_expires_parameter(self):
+        self.assertEqual(signed_url.expires_at("https://cdn.test/a.mp4?Expires=1700000000&Signature=x&Key-Pair-Id=k"), 1700000000)
+
+    def test_millisecond_and_lowercase_exp(self):
+        self.assertEqual(signed_url.expires_at("https://cdn.test/a.m3u8?exp=1700000000000"), 1700000000)
+
+    def test_amazon_presigned_url(self):
+        url = "https://s3.test/a.vtt?X-Amz-Date=20231114T221320Z&X-Amz-Expires=600&X-Amz-Signature=x"
+        self.assertEqual(signed_url.expires_at(url), 1700000000 + 600)
+
+    def test_jwt_and_akamai_tokens(self):
+        jwt = ".".join([_b64({"alg": "HS256"}), _b64({"exp": 1700000100}), "signature"])
+        self.assertEqual(signed_url.expires_at(f"https://cdn.test/a.mpd?token={jwt}"), 1700000100)
+        self.assertEqual(signed_url.expires_at("https://cdn.test/a.mpd?hdnts=st%3D1~exp%3D1700000200~hmac%3Dab"), 1700000200)
+
+    def test_cloudfront_custom_policy(self):
+        policy = _b64({"Statement": [{"Condition": {"DateLessThan": {"AWS:EpochTime": 1700000300}}}]})
+        self.assertEqual(signed_url.expires_at(f"https://cdn.test/a.mp4?Policy={policy}&Signature=x"), 1700000300)
+
+    def test_unsigned_url_has_no_expiry(self):
+        self.assertIsNone(signed_url.expires_at("https://cdn.test/a.mp4?quality=720"))
+
+
+class LectureExpiryTests(unittest.TestCase):
+    body = {"asset": {
+        "media_sources": [{"src": "https://cdn.test/a.m3u8?Expires=2000", "type": "application/x-mpegURL"}],
+        "captions": [{"url": "https://cdn.test/a.vtt?Expires=1500"}],
+    }}
+
+    def test_earliest_expiry_covers_captions_and_media(self):
+        self.assertEqual(signed_url.earliest_expiry(self.body), 1500)
+
+    def test_expires_soon_uses_the_margin(self):
+        self.assertTrue(signed_url.expires_soon(self.body, margin=100, now=1450))
+        self.assertFalse(signed_url.expires_soon(self.body, margin=100, now=1000))
+        self.assertFalse(signed_url.expires_soon({"asset": {}}))
+
+    def test_forbidden_output_is_recognised(self):
+        self.assertEqual(signed_url.forbidden_status("ERROR: Response status code does not indicate success: 403 (Forbidden)."), 403)
+        self.assertIsNone(signed_url.forbidden_status("Connection reset by peer"))
+        self.assertEqual(signed_url.forbidden_status("Server returned 403 Forbidden (access denied)"), 403)
+        self.assertEqual(signed_url.forbidden_status("Response status code: 403"), 403)
+
+    def test_progress_numbers_are_not_forbidden(self):
+        for line in ("Vid 1080p | 403/1200 33.58%", "Aud en | 403.12MB / 1.20GB", "Forbidden characters removed from the title"):
+            self.assertIsNone(signed_url.forbidden_status(line))
+
+
+if __name__ == "__main__":
+    unittest.main()
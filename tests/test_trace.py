@@ -0,0 +1,55 @@
+import json
+import os
+import tempfile
+import unittest
+
+from utils import io_pool, trace
+
+
+class TraceTests(unittest.TestCase):
+    def tearDown(self):
+        trace.configure(None)
+
+    def test_spans_from_pool_tasks_reach_the_lecture(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "trace.jsonl")
+            trace.configure(path)
+            lecture_trace = trace.start(1, "01", {"id": 7, "title": "Intro"})
+            lecture_trace.add("metadata", lecture_trace.started, 0.25)
+            lecture_trace.enqueue()
+            lecture_trace.dequeue()
+
+            def caption():
+                with trace.span("captions") as span:
+                    span["bytes"] = 120
+
+            with trace.active(lecture_trace):
+                io_pool.submit(caption).result()
+                with trace.span("stream"):
+                    pass
+            trace.finish(lecture_trace, {"status": "completed", "file_size": 4096})
+            lines = trace.report()
+            with open(path, encoding="utf-8") as file:
+                records = [json.loads(line) for line in file]
+
+        lecture, summary = records
+        self.assertEqual((lecture["id"], lecture["status"], lecture["bytes"]), (7, "completed", 4096))
+        self.assertEqual([span["phase"] for span in lecture["spans"]], ["metadata", "queue", "captions", "stream"])
+        self.assertEqual(lecture["spans"][2]["bytes"], 120)
+        self.assertEqual(summary["phases"]["metadata"]["p50"], 0.25)
+        self.assertEqual(summary["slowest"][0]["title"], "Intro")
+        self.assertIn("Timing over 1 lectures", lines[0])
+
+    def test_span_outside_a_lecture_is_a_no_op(self):
+        with trace.span("stream") as span:
+            span["bytes"] = 1
+        self.assertIsNone(trace.current())
+
+    def test_percentile_uses_nearest_rank(self):
+        values = list(range(1, 21))
+        self.assertEqual((trace.percentile(values, 0.5), trace.percentile(values, 0.95)), (10, 19))
+        self.assertEqual(trace.percentile([3.0], 0.95), 3.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
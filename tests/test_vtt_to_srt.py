@@ -0,0 +1,60 @@
+import os
+import tempfile
+import unittest
+
+import webvtt
+
+from utils.vtt_to_srt import vtt_to_srt
+
+SAMPLE = (
+    "﻿WEBVTT - Lecture\nKind: captions\nLanguage: en\n\n"
+    "NOTE generated\nby the platform\n\n"
+    "STYLE\n::cue { color: white }\n\n"
+    "intro\n00:01.000 --> 00:02.500 align:start position:10%\n<v Speaker>Hello</v> <b>there</b>\nsecond line\n\n"
+    "00:00:03.000 --> 00:00:04.000\n  spaced  \n\n"
+    "1:02:03.004 --> 1:02:05.000\nlate\n"
+)
+# A cue right under the header, cues without text and a cue that is only tags.
+EDGE_CASES = (
+    "WEBVTT\n00:00.500 --> 00:01.000\nfirst\n\n"
+    "00:01.000 --> 00:02.000\n\n"
+    "empty\n00:02.000 --> 00:03.000\n\n"
+    "00:03.000 --> 00:04.000\n   \n\n"
+    "00:04.000 --> 00:05.000\n<b></b>\n\n"
+    "00:05.000 --> 00:06.000\nlast  \n"
+)
+
+
+class VttToSrtTests(unittest.TestCase):
+    def reference(self, data):
+        with tempfile.TemporaryDirectory() as directory:
+            vtt_path, srt_path = os.path.join(directory, "a.vtt"), os.path.join(directory, "a.srt")
+            with open(vtt_path, "wb") as file:
+                file.write(data)
+            webvtt.read(vtt_path).save_as_srt(srt_path)
+            with open(srt_path, "rb") as file:
+                return file.read()
+
+    def test_output_matches_webvtt(self):
+        for sample in (SAMPLE, EDGE_CASES):
+            for newline in ("\n", "\r\n"):
+                data = sample.replace("\n", newline).encode("utf-8")
+                self.assertEqual(vtt_to_srt(data), self.reference(data))
+
+    def test_cues_are_numbered_and_timestamps_normalised(self):
+        srt = vtt_to_srt(SAMPLE.encode("utf-8")).decode("utf-8")
+        self.assertTrue(srt.startswith("1\n00:00:01,000 --> 00:00:02,500\nHello there\n"))
+        self.assertIn("\n\n3\n01:02:03,004 --> 01:02:05,000\nlate", srt)
+
+    def test_cues_without_text_are_dropped(self):
+        srt = vtt_to_srt(EDGE_CASES.encode("utf-8")).decode("utf-8")
+        self.assertTrue(srt.startswith("1\n00:00:00,500 --> 00:00:01,000\nfirst\n\n2\n00:00:04,000"))
+        self.assertTrue(srt.endswith("3\n00:00:05,000 --> 00:00:06,000\nlast"))
+
+    def test_missing_header_is_rejected(self):
+        with self.assertRaises(ValueError):
+            vtt_to_srt(b"00:00:01.000 --> 00:00:02.000\nHi\n")
+
+
+if __name__ == "__main__":
+    unittest.main()
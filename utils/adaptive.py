@@ -0,0 +1,92 @@
+"""AIMD controller that tunes how many lectures download at once."""
+
+import threading
+import time
+
+from constants import logger
+from utils import bandwidth
+
+# Seconds of traffic compared between decisions.
+WINDOW = 15.0
+# Throughput must beat the previous window by this factor to count as "still rising".
+GAIN = 1.05
+THROTTLE_STATUSES = {429, 500, 502, 503, 504}
+
+
+class AdaptiveConcurrency:
+    """Gate worker slots with a limit that grows while throughput rises and halves on errors.
+
+    Workers call ``acquire()`` before a lecture and ``release()`` after it. Throttled HTTP
+    responses and failed downloads are reported through ``record_response`` and
+    ``record_failure``.
+    """
+
+    def __init__(self, maximum, start=2, window=WINDOW, clock=time.monotonic, bytes_counter=bandwidth.bytes_transferred):
+        self.maximum = max(1, maximum)
+        self.limit = max(1, min(start, self.maximum))
+        self.window = window
+        self._clock = clock
+        self._bytes_counter = bytes_counter
+        self._condition = threading.Condition()
+        self._active = 0
+        self._busy = False
+        self._errors = 0
+        self._last_reason = None
+        self._window_start = clock()
+        self._window_bytes = bytes_counter()
+        self._last_throughput = None
+        logger.info("Adaptive concurrency: starting with %d parallel lecture(s), up to %d", self.limit, self.maximum)
+
+    def acquire(self):
+        with self._condition:
+            while self._active >= self.limit:
+                self._condition.wait()
+            self._active += 1
+            if self._active >= self.limit:
+                self._busy = True
+
+    def release(self):
+        with self._condition:
+            self._active -= 1
+            self._adjust()
+            self._condition.notify_all()
+
+    def record_response(self, response, *args, **kwargs):
+        if response.status_code in THROTTLE_STATUSES:
+            self.record_failure(f"HTTP {response.status_code}")
+
+    def record_failure(self, reason="download failed"):
+        with self._condition:
+            self._errors += 1
+            self._last_reason = reason
+
+    def _adjust(self):
+        now = self._clock()
+        elapsed = now - self._window_start
+        if elapsed < self.window and not self._errors:
+            return
+        total = self._bytes_counter()
+        throughput = (total - self._window_bytes) / elapsed if elapsed > 0 else 0
+        previous, limit = self._last_throughput, self.limit
+        if self._errors:
+            self.limit = max(1, self.limit // 2)
+            reason = f"{self._errors} error(s), last: {self._last_reason}"
+            logger.warning("Adaptive concurrency: %d -> %d (backing off after %s)", limit, self.limit, reason)
+            # Judge the reduced level on a fresh window instead of the throttled one.
+            throughput = None
+        elif not self._busy:
+            logger.info("Adaptive concurrency: holding at %d (slots were not all in use; %s)", limit, _format(throughput))
+        elif previous is None or throughput > previous * GAIN:
+            self.limit = min(self.maximum, self.limit + 1)
+            if self.limit != limit:
+                logger.info("Adaptive concurrency: %d -> %d (throughput rising: %s)", limit, self.limit, _format(throughput))
+        else:
+            logger.info("Adaptive concurrency: holding at %d (throughput flat: %s vs %s)", limit, _format(throughput), _format(previous))
+        self._last_throughput = throughput
+        self._window_start, self._window_bytes = now, total
+        self._errors = 0
+        self._busy = self._active >= self.limit
+
+
+def _format(rate):
+    return f"{rate / 1024 ** 2:.2f} MiB/s"
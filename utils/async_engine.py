@@ -0,0 +1,190 @@
+"""asyncio download engine: coroutines instead of one blocked thread per lecture.
+
+Small transfers (captions, attachments) share a wide limit, heavy stream jobs
+(N_m3u8DL-RE, MP4 transfers) and FFmpeg remuxes narrow ones, all taken from
+``utils.limits``. Subprocesses run
+through ``asyncio.create_subprocess_exec``; captions use aiohttp when it is
+installed and the shared ``requests`` session on a worker thread otherwise.
+"""
+
+import asyncio
+import codecs
+import os
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from constants import remove_emojis_and_binary
+from utils import bandwidth, limits, trace
+from utils.bandwidth import throttle
+from utils.download_result import DownloadResult
+from utils.downloader_output import TAIL_LINES, OutputFollower
+from utils.process_captions import caption_paths, fetch_caption, save_caption
+from utils.process_m3u8 import downloader_failed, finish_hls, hls_command, select_media_playlist
+from utils.process_mpd import convert_command, convert_failed, dash_command, dash_failed, finish_dash
+from utils.retry import RETRY_STATUSES, call_result_async, get_policy
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+# Default --file-concurrency for this engine: captions and attachments are tiny; many can wait on the network at once.
+DEFAULT_TRANSFER_LIMIT = 64
+# Subprocess output is read in chunks of this size; a longer run without a line break is passed on as one line.
+READ_SIZE = 64 * 1024
+
+
+class OutputLines:
+    """Split a byte stream into lines ending in ``\n``, treating ``\r\n``, ``\r`` and ``\n`` alike."""
+
+    def __init__(self, max_line=READ_SIZE):
+        self.max_line = max_line
+        self._decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        self._buffer = ""
+
+    def feed(self, chunk):
+        text = self._buffer + self._decoder.decode(chunk)
+        # A trailing \r may be the first half of \r\n; keep it until the next chunk.
+        held = text.endswith("\r")
+        if held:
+            text = text[:-1]
+        parts = text.replace("\r\n", "\n").replace("\r", "\n").split("\n")
+        self._buffer = parts.pop() + ("\r" if held else "")
+        if len(self._buffer) > self.max_line:
+            parts.append(self._buffer)
+            self._buffer = ""
+        return [part + "\n" for part in parts]
+
+    def close(self):
+        rest = (self._buffer + self._decoder.decode(b"", final=True)).rstrip("\r")
+        self._buffer = ""
+        return [rest] if rest else []
+
+
+def _aiohttp_retryable(error):
+    if isinstance(error, aiohttp.ClientResponseError):
+        return error.status in RETRY_STATUSES
+    return isinstance(error, (aiohttp.ClientConnectionError, aiohttp.ClientPayloadError, asyncio.TimeoutError))
+
+
+class AsyncEngine:
+    """Shared limits, HTTP client and subprocess runner for the ``--engine async`` mode.
+
+    Use as ``async with AsyncEngine() as engine``; the HTTP client is closed on exit.
+    Limits not given here come from ``utils.limits``.
+    """
+
+    def __init__(self, stream_limit=None, transfer_limit=None, remux_limit=None):
+        self.stream_limit = max(1, stream_limit or limits.limit("stream"))
+        self.transfer_limit = max(1, transfer_limit or limits.limit("file"))
+        self.streams = asyncio.Semaphore(self.stream_limit)
+        self.transfers = asyncio.Semaphore(self.transfer_limit)
+        self.remux = asyncio.Semaphore(max(1, remux_limit or limits.limit("remux")))
+        self._http = None
+
+    async def __aenter__(self):
+        # Blocking work goes through asyncio.to_thread. The loop's default executor has only
+        # min(32, cores + 4) threads, which would cap the file and stream limits well below their settings.
+        workers = limits.limit("api") + self.transfer_limit + self.stream_limit
+        asyncio.get_running_loop().set_default_executor(ThreadPoolExecutor(max_workers=workers, thread_name_prefix="async-engine"))
+        if aiohttp is not None:
+            self._http = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(sock_connect=15, sock_read=120))
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        if self._http is not None:
+            await self._http.close()
+
+    async def transfer(self, fn, *args, **kwargs):
+        """Run a blocking small-file transfer, such as a resumable attachment, inside the transfer limit."""
+        async with self.transfers:
+            return await asyncio.to_thread(fn, *args, **kwargs)
+
+    async def fetch(self, url, description):
+        """GET a signed URL and return ``(content, etag)``."""
+        async with self.transfers:
+            if self._http is None:
+                response = await asyncio.to_thread(get_policy().call, fetch_caption, url, description=description)
+                content, etag = response.content, response.headers.get("ETag")
+            else:
+                content, etag = await get_policy().call_async(self._get, url, retryable=_aiohttp_retryable, description=description)
+        await asyncio.to_thread(throttle, len(content))
+        return content, etag
+
+    async def _get(self, url):
+        async with self._http.get(url, raise_for_status=True) as response:
+            return await response.read(), response.headers.get("ETag")
+
+    async def run_process(self, command, on_line=None):
+        """Run a command, feeding each output line to ``on_line``; return ``(returncode, tail of the output)``.
+
+        Like text-mode ``Popen``, a lone ``\r`` ends a line too, so progress redrawn in place is seen.
+        """
+        process = await asyncio.create_subprocess_exec(*command, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.STDOUT)
+        tail = deque(maxlen=TAIL_LINES)
+        lines = OutputLines()
+        try:
+            while True:
+                chunk = await process.stdout.read(READ_SIZE)
+                for line in lines.feed(chunk) if chunk else lines.close():
+                    tail.append(line)
+                    if on_line is not None:
+                        on_line(line)
+                if not chunk:
+                    break
+            return await process.wait(), "".join(tail)
+        finally:
+            if process.returncode is None:
+                process.kill()
+                await process.wait()
+
+    async def _run_downloader(self, command, task_id, progress, on_failure):
+        follower = OutputFollower(progress, task_id)
+        async with self.streams:
+            with bandwidth.subprocess_share() as max_speed:
+                code, output = await self.run_process(command + ["--max-speed", max_speed] if max_speed else command, follower.feed)
+        follower.finish()
+        return on_failure(code, output) if code else DownloadResult.ok()
+
+    async def caption(self, caption, download_folder_path, title, convert_to_srt, download_cache=None, keep_vtt=False):
+        url, vtt_path, final_path, file_key = caption_paths(caption, download_folder_path, title, convert_to_srt)
+        if download_cache and download_cache.is_file_completed(file_key, final_path):
+            return
+        with trace.span("captions") as span:
+            content, etag = await self.fetch(url, f"caption {os.path.basename(vtt_path)}")
+            await asyncio.to_thread(save_caption, content, vtt_path, final_path, keep_vtt)
+            span["bytes"] = len(content)
+        if download_cache:
+            download_cache.mark_file_completed(file_key, final_path, etag)
+
+    async def hls(self, m3u8_url, download_folder_path, title, task_id, progress, drm_key=None):
+        progress.update(task_id, description=f"Downloading stream {remove_emojis_and_binary(title)}", completed=0)
+        try:
+            media_url = await asyncio.to_thread(select_media_playlist, m3u8_url)
+        except ValueError as error:
+            return DownloadResult.failed(f"Could not read the HLS playlist: {error}")
+        except requests.RequestException as error:
+            response = getattr(error, "response", None)
+            return DownloadResult.failed(f"Could not fetch the HLS playlist: {error}", getattr(response, "status_code", None))
+        command = hls_command(media_url, os.path.dirname(download_folder_path), f"{title}.mp4", drm_key)
+        result = await call_result_async(self._run_downloader, command, task_id, progress, downloader_failed,
+                                         description=f"HLS download of {remove_emojis_and_binary(title)}")
+        return await asyncio.to_thread(finish_hls, result, download_folder_path, title, task_id, progress)
+
+    async def dash(self, mpd_url, download_folder_path, title, key, task_id, progress):
+        progress.update(task_id, description=f"Downloading stream {remove_emojis_and_binary(title)}", completed=0)
+        command = dash_command(mpd_url, download_folder_path, title, key)
+        result = await call_result_async(self._run_downloader, command, task_id, progress, dash_failed,
+                                         description=f"DASH download of {remove_emojis_and_binary(title)}")
+        if not result.success:
+            return result
+        convert = await asyncio.to_thread(convert_command, download_folder_path, title)
+        if convert:
+            async with self.remux:
+                with trace.span("remux"):
+                    code, output = await self.run_process(convert)
+            if code:
+                return convert_failed(output)
+        return await asyncio.to_thread(finish_dash, download_folder_path, title, task_id, progress, bool(convert))
@@ -0,0 +1,107 @@
+"""Process-wide token bucket that keeps total download speed under --max-rate."""
+
+import re
+import threading
+import time
+from contextlib import contextmanager
+
+UNITS = {"": 1, "K": 1024, "M": 1024 ** 2, "G": 1024 ** 3}
+# Share of the ceiling left to captions and attachments while every stream slot is busy.
+MIN_PYTHON_SHARE = 0.05
+
+_lock = threading.Lock()
+_bucket = None
+_stream_slots = 1
+_bytes_total = 0
+
+
+def parse_rate(text):
+    """Turn ``50M``, ``800K`` or ``1048576`` (bytes per second) into an integer."""
+    match = re.fullmatch(r"\s*(\d+(?:\.\d+)?)\s*([KMG]?)(?:i?B)?(?:/s)?\s*", str(text), re.IGNORECASE)
+    if not match:
+        raise ValueError(f"invalid rate {text!r}; use a number of bytes per second such as 50M or 800K")
+    rate = int(float(match.group(1)) * UNITS[match.group(2).upper()])
+    if rate <= 0:
+        raise ValueError("the rate must be greater than zero")
+    return rate
+
+
+def format_rate(rate):
+    """Format bytes per second the way N_m3u8DL-RE's --max-speed expects, e.g. ``12800K``."""
+    return f"{max(1, int(rate // 1024))}K"
+
+
+class TokenBucket:
+    """Token bucket that lets a consumer overdraw and then sleeps off the debt, so large chunks stay fair."""
+
+    def __init__(self, rate, burst=None):
+        self.rate = float(rate)
+        self.capacity = float(burst or rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def consume(self, amount):
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= amount
+            delay = -self._tokens / self.rate if self._tokens < 0 else 0
+        if delay:
+            time.sleep(delay)
+
+    def set_rate(self, rate):
+        with self._lock:
+            self.rate = float(rate)
+
+
+def configure(rate, stream_slots=1):
+    """Enable the limiter for ``rate`` bytes per second shared by ``stream_slots`` downloader subprocesses."""
+    global _bucket, _stream_slots
+    with _lock:
+        _bucket = TokenBucket(rate) if rate else None
+        _stream_slots = max(1, stream_slots)
+
+
+def throttle(amount):
+    """Account for ``amount`` bytes read by Python code, sleeping when the ceiling is exceeded."""
+    global _bytes_total
+    with _lock:
+        _bytes_total += amount
+        bucket = _bucket
+    if bucket is not None:
+        bucket.consume(amount)
+
+
+def record(amount):
+    """Count bytes transferred outside Python (e.g. by N_m3u8DL-RE) without throttling."""
+    global _bytes_total
+    with _lock:
+        _bytes_total += amount
+
+
+def bytes_transferred():
+    with _lock:
+        return _bytes_total
+
+
+@contextmanager
+def subprocess_share():
+    """Reserve one stream slot's share of the ceiling for a downloader subprocess.
+
+    Yields the ``--max-speed`` value to pass, or ``None`` when no limit is configured.
+    """
+    with _lock:
+        bucket = _bucket
+        if bucket is None:
+            share = None
+        else:
+            share = bucket.capacity / _stream_slots
+            bucket.set_rate(max(bucket.rate - share, bucket.capacity * MIN_PYTHON_SHARE))
+    try:
+        yield format_rate(share) if share else None
+    finally:
+        if share:
+            with _lock:
+                bucket.set_rate(min(bucket.rate + share, bucket.capacity))
@@ -0,0 +1,63 @@
+"""Fixed pool of worker threads fed through a bounded queue."""
+
+import queue
+import threading
+
+_STOP = object()
+
+
+class Dispatcher:
+    """Run ``handler(job)`` on ``workers`` threads.
+
+    ``submit`` blocks while the queue is full, so the producer never runs more than
+    ``queue_size`` jobs ahead of the workers and dispatch costs O(1) per job.
+    The first exception raised by a handler is re-raised from ``close``.
+    """
+
+    def __init__(self, handler, workers, queue_size=None):
+        self.handler = handler
+        self._queue = queue.Queue(maxsize=max(1, queue_size or workers))
+        self._error = None
+        self._error_lock = threading.Lock()
+        self._threads = [threading.Thread(target=self._work, name=f"lecture-{index}", daemon=True) for index in range(max(1, workers))]
+        for thread in self._threads:
+            thread.start()
+
+    def submit(self, job):
+        self._queue.put(job)
+
+    def pending(self):
+        return self._queue.qsize()
+
+    def _work(self):
+        while True:
+            job = self._queue.get()
+            if job is _STOP:
+                return
+            try:
+                self.handler(job)
+            except BaseException as error:
+                with self._error_lock:
+                    if self._error is None:
+                        self._error = error
+
+    def close(self, discard_pending=False):
+        if discard_pending:
+            try:
+                while True:
+                    self._queue.get_nowait()
+            except queue.Empty:
+                pass
+        for _ in self._threads:
+            self._queue.put(_STOP)
+        for thread in self._threads:
+            thread.join()
+        if self._error is not None:
+            raise self._error
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        # On an error in the producer, finish the lectures in flight but start no new ones.
+        self.close(discard_pending=exc_type is not None)
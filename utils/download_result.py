@@ -1,4 +1,5 @@
-from dataclasses import dataclass
+from concurrent.futures import Future
+from dataclasses import dataclass, field
 from typing import Optional
 
 
@@ -8,11 +9,21 @@ class DownloadResult:
 
     success: bool
     error: Optional[str] = None
+    # Set when the failure came from an HTTP response; a 403 usually means a signed URL expired.
+    http_status: Optional[int] = None
+    # Set when the download finished but post-processing still runs; resolves to the final DownloadResult.
+    pending: Optional[Future] = field(default=None, compare=False)
+    # Set when the same attempt may well succeed again: a dropped connection, a timeout, a 5xx or 429.
+    transient: bool = False
 
     @classmethod
     def ok(cls):
         return cls(True)
 
     @classmethod
-    def failed(cls, error):
-        return cls(False, str(error))
+    def failed(cls, error, http_status=None, transient=False):
+        return cls(False, str(error), http_status, transient=transient)
+
+    @classmethod
+    def deferred(cls, future):
+        return cls(True, pending=future)
@@ -0,0 +1,134 @@
+"""Cheap handling of N_m3u8DL-RE output: a bounded diagnostic tail, coalesced progress updates and live byte counts."""
+
+import re
+import time
+from collections import deque
+
+from utils import bandwidth
+
+# Enough context for an error message; older lines are dropped as new ones arrive.
+TAIL_LINES = 50
+# Matches the Live display's refresh_per_second=10; faster updates are never seen.
+REFRESH_INTERVAL = 0.1
+# Failures that may succeed on a second attempt: network errors, timeouts, server errors and rate limits.
+_TRANSIENT = re.compile(
+    r"HttpRequestException|SocketException|TaskCanceledException|timed? ?out|"
+    r"connection (?:reset|refused|closed|aborted)|error occurred while sending the request|"
+    r"response ended prematurely|unable to read data from the transport|no such host|name or service not known|"
+    r"temporary failure in name resolution|network is unreachable|"
+    r"\b(?:429|5\d\d) \(|(?:HTTP|status(?: code)?)\D{0,3}(?:429|5\d\d)\b",
+    re.IGNORECASE,
+)
+
+
+# "12.3MB/47.1MB": bytes done so far out of the track's (estimated) total.
+_SIZE = re.compile(r"(\d+(?:\.\d+)?)\s*([KMGT]?i?B)\s*/\s*\d+(?:\.\d+)?\s*[KMGT]?i?B")
+_UNITS = {"B": 1, "KB": 1024, "MB": 1024 ** 2, "GB": 1024 ** 3, "TB": 1024 ** 4}
+# Where the track description ends: the progress bar, the segment count or the percentage.
+_TRACK_END = re.compile(r"[━─]|\s\d+/\d+\s|\s\d+(?:\.\d+)?%")
+
+
+def parse_size(line):
+    """Return the bytes done from a progress line, or None."""
+    match = _SIZE.search(line)
+    if not match:
+        return None
+    value, unit = match.groups()
+    return float(value) * _UNITS[unit.upper().replace("I", "")]
+
+
+def track_name(line):
+    """The track description in front of the progress bar, e.g. ``Aud en 128Kbps``."""
+    match = _TRACK_END.search(line)
+    return (line[:match.start()] if match else line).strip()
+
+
+def transient_failure(output):
+    """True when a downloader's output tail shows a failure worth retrying as-is."""
+    return bool(_TRANSIENT.search(output or ""))
+
+
+def parse_percent(line):
+    """Return the first ``NN.NN%`` value in ``line`` as a float, or None. Scans only around the first '%'."""
+    end = line.find("%")
+    while end != -1:
+        start = end
+        while start > 0 and (line[start - 1].isdigit() or line[start - 1] == "."):
+            start -= 1
+        number = line[start:end]
+        if "." in number and number[0] != "." and number[-1] != ".":
+            try:
+                return float(number)
+            except ValueError:
+                pass
+        end = line.find("%", end + 1)
+    return None
+
+
+class ProgressUpdater:
+    """Forward percentages to a rich progress row at most once per ``interval`` seconds."""
+
+    def __init__(self, progress, task_id, interval=REFRESH_INTERVAL, clock=time.monotonic):
+        self.progress = progress
+        self.task_id = task_id
+        self.interval = interval
+        self._clock = clock
+        self._last_update = None
+        self._shown = None
+        self._latest = None
+
+    def __call__(self, percent):
+        self._latest = min(percent, 99)
+        now = self._clock()
+        if self._last_update is None or now - self._last_update >= self.interval:
+            self.flush()
+            self._last_update = now
+
+    def flush(self):
+        if self._latest is not None and self._latest != self._shown:
+            self.progress.update(self.task_id, completed=self._latest)
+            self._shown = self._latest
+
+
+class OutputFollower:
+    """Consume downloader output line by line, keeping only the tail and updating progress.
+
+    Bytes reported done are passed to ``record`` as they arrive, so throughput is visible
+    while the download runs instead of only when the finished file is known.
+    """
+
+    def __init__(self, progress, task_id, tail_lines=TAIL_LINES, record=bandwidth.record):
+        self.tail = deque(maxlen=tail_lines)
+        self.updater = ProgressUpdater(progress, task_id)
+        self.record = record
+        # Bytes already counted per track; each video and audio track reports separately.
+        self._counted = {}
+
+    def feed(self, line):
+        self.tail.append(line)
+        percent = parse_percent(line)
+        if percent is not None:
+            self.updater(percent)
+            done = parse_size(line)
+            if done is not None:
+                self._count(track_name(line), done)
+
+    def _count(self, track, done):
+        # The total is only an estimate while segments arrive, so it is not part of the key.
+        delta = int(done) - self._counted.get(track, 0)
+        if delta > 0:
+            self._counted[track] = int(done)
+            self.record(delta)
+
+    def finish(self):
+        """Show the last percentage and return the tail of the output."""
+        self.updater.flush()
+        return "".join(self.tail)
+
+
+def follow(lines, progress, task_id):
+    """Consume an iterable of output lines and return the tail of the output."""
+    follower = OutputFollower(progress, task_id)
+    for line in lines:
+        follower.feed(line)
+    return follower.finish()
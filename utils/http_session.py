@@ -0,0 +1,103 @@
+"""One pooled, thread-safe HTTP session shared by the API client and every downloader."""
+
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+DEFAULT_POOL_SIZE = 4
+# Distinct hosts kept warm: the API, the web host and a few media CDNs.
+HOST_POOLS = 10
+
+_lock = threading.Lock()
+_session = None
+_stats = {"requests": 0, "new": 0}
+_response_hooks = []
+
+
+def _count_request(conn):
+    with _lock:
+        _stats["requests"] += 1
+        if getattr(conn, "sock", None) is None:
+            _stats["new"] += 1
+
+
+class _CountingHTTPConnectionPool(HTTPConnectionPool):
+    def _make_request(self, conn, *args, **kwargs):
+        _count_request(conn)
+        return super()._make_request(conn, *args, **kwargs)
+
+
+class _CountingHTTPSConnectionPool(HTTPSConnectionPool):
+    def _make_request(self, conn, *args, **kwargs):
+        _count_request(conn)
+        return super()._make_request(conn, *args, **kwargs)
+
+
+class _PooledAdapter(HTTPAdapter):
+    """Keep-alive adapter that records whether each request opened a new socket."""
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {"http": _CountingHTTPConnectionPool, "https": _CountingHTTPSConnectionPool}
+
+
+def _dispatch_response(response, *args, **kwargs):
+    for hook in list(_response_hooks):
+        hook(response)
+
+
+def add_response_hook(hook):
+    """Call ``hook(response)`` for every response the shared session receives, redirects included."""
+    with _lock:
+        _response_hooks.append(hook)
+
+
+def pool_size_for(stream_slots, connections, file_slots, api_slots=0):
+    """Sockets one host may need at once: every ranged video connection plus every small-file transfer.
+
+    Videos, captions and attachments often come from the same CDN host; the API host needs ``api_slots``.
+    """
+    return max(api_slots, stream_slots * connections + file_slots)
+
+
+def configure(cookie_jar=None, pool_size=DEFAULT_POOL_SIZE):
+    """Create the shared session; ``pool_size`` is the number of kept-alive sockets per host.
+
+    Size it with ``pool_size_for()``: a smaller pool discards sockets ("Connection pool is full") and loses the reuse.
+    """
+    global _session
+    session = requests.Session()
+    adapter = _PooledAdapter(pool_connections=HOST_POOLS, pool_maxsize=max(1, pool_size))
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    if cookie_jar is not None:
+        session.cookies = cookie_jar
+    session.hooks["response"].append(_dispatch_response)
+    with _lock:
+        previous, _session = _session, session
+    if previous is not None:
+        previous.close()
+    return session
+
+
+def get_session():
+    """Return the shared session, creating an anonymous one if ``configure`` was never called."""
+    with _lock:
+        session = _session
+    return session if session is not None else configure()
+
+
+def connection_stats():
+    with _lock:
+        total, new = _stats["requests"], _stats["new"]
+    return {"requests": total, "new": new, "reused": total - new}
+
+
+def close():
+    global _session
+    with _lock:
+        session, _session = _session, None
+    if session is not None:
+        session.close()
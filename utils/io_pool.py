@@ -0,0 +1,51 @@
+"""Shared thread pool for the small transfers of every lecture: captions and supplementary files."""
+
+import contextvars
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from utils.download_result import DownloadResult
+
+DEFAULT_WORKERS = 8
+
+_lock = threading.Lock()
+_executor = None
+
+
+def configure(workers=DEFAULT_WORKERS):
+    global _executor
+    with _lock:
+        previous, _executor = _executor, ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="io")
+    if previous is not None:
+        previous.shutdown(wait=False)
+
+
+def submit(fn, *args, **kwargs):
+    with _lock:
+        executor = _executor
+    if executor is None:
+        configure()
+        return submit(fn, *args, **kwargs)
+    # Carry context variables (such as the lecture's retry listener) into the pool thread.
+    return executor.submit(contextvars.copy_context().run, fn, *args, **kwargs)
+
+
+def wait_all(futures, error_prefix):
+    """Wait for every sub-task and turn the first failure into a DownloadResult.
+
+    Never call this from inside a pool task: a pool full of waiting parents would deadlock.
+    """
+    wait(futures)
+    for future in futures:
+        error = future.exception()
+        if error is not None:
+            return DownloadResult.failed(f"{error_prefix}: {error}")
+    return DownloadResult.ok()
+
+
+def shutdown():
+    global _executor
+    with _lock:
+        executor, _executor = _executor, None
+    if executor is not None:
+        executor.shutdown(wait=True)
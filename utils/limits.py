@@ -0,0 +1,60 @@
+"""Independent concurrency limits per kind of work.
+
+API calls, small files (captions, attachments), stream jobs (videos) and FFmpeg
+remuxes each get their own semaphore, so CPU-bound remuxes cannot hold back the
+network and a burst of small files cannot delay the videos.
+"""
+
+import os
+import threading
+from contextlib import contextmanager
+
+DEFAULTS = {
+    "api": 4,
+    "file": 8,
+    "stream": 4,
+    # FFmpeg uses several threads per job; leave cores for the downloads.
+    "remux": max(1, (os.cpu_count() or 2) // 2),
+}
+
+_lock = threading.Lock()
+_limits = dict(DEFAULTS)
+_semaphores = {kind: threading.BoundedSemaphore(value) for kind, value in DEFAULTS.items()}
+_active = dict.fromkeys(DEFAULTS, 0)
+
+
+def configure(**limits):
+    """Set limits by kind, e.g. ``configure(api=4, remux=1)``; a ``None`` value keeps the current limit."""
+    with _lock:
+        for kind, value in limits.items():
+            if kind not in DEFAULTS:
+                raise ValueError(f"Unknown concurrency limit: {kind}")
+            if value is not None:
+                _limits[kind] = max(1, value)
+                _semaphores[kind] = threading.BoundedSemaphore(_limits[kind])
+
+
+def limit(kind):
+    with _lock:
+        return _limits[kind]
+
+
+@contextmanager
+def slot(kind):
+    """Hold one slot of ``kind`` for the duration of the block."""
+    with _lock:
+        semaphore = _semaphores[kind]
+    with semaphore:
+        with _lock:
+            _active[kind] += 1
+        try:
+            yield
+        finally:
+            with _lock:
+                _active[kind] -= 1
+
+
+def in_use():
+    """Slots currently held, by kind."""
+    with _lock:
+        return dict(_active)
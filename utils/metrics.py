@@ -0,0 +1,195 @@
+"""Prometheus metrics for unattended runs.
+
+The values come from what the downloader already tracks: the download cache's
+status counts, the bandwidth and connection counters, retries, the concurrency
+slots in use and the queues. They are exported as a textfile for the node
+exporter's textfile collector, rewritten every ``interval`` seconds, and/or
+served at ``http://127.0.0.1:<port>/metrics``.
+"""
+
+import bisect
+import os
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+
+from constants import logger
+from utils import bandwidth, http_session, limits, postprocess, retry
+
+PREFIX = "udemy_downloader"
+DEFAULT_INTERVAL = 15
+API_LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+_lock = threading.Lock()
+_cache = None
+_queues = {}
+_textfile = None
+_interval = DEFAULT_INTERVAL
+_stop = threading.Event()
+_writer = None
+_server = None
+_hooked = False
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = tuple(buckets)
+        self._counts = [0] * len(self.buckets)
+        self._sum = 0.0
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        with self._lock:
+            index = bisect.bisect_left(self.buckets, value)
+            if index < len(self.buckets):
+                self._counts[index] += 1
+            self._sum += value
+            self._count += 1
+
+    def render(self, name):
+        with self._lock:
+            counts, total, count = list(self._counts), self._sum, self._count
+        lines, cumulative = [], 0
+        for bound, bucket in zip(self.buckets, counts):
+            cumulative += bucket
+            lines.append(f'{name}_bucket{{le="{bound:g}"}} {cumulative}')
+        lines += [f'{name}_bucket{{le="+Inf"}} {count}', f"{name}_sum {total:.6f}", f"{name}_count {count}"]
+        return lines
+
+
+api_latency = Histogram(API_LATENCY_BUCKETS)
+
+
+def observe_response(response):
+    """Response hook: time every Udemy API call (not media or caption transfers)."""
+    if "/api-2.0/" in urlsplit(response.url).path and response.elapsed is not None:
+        api_latency.observe(response.elapsed.total_seconds())
+
+
+def watch_cache(download_cache):
+    """Report lecture counts from this run's download cache."""
+    global _cache
+    with _lock:
+        _cache = download_cache
+
+
+def watch_queue(name, depth):
+    """Report ``depth()`` as the length of the named queue."""
+    with _lock:
+        _queues[name] = depth
+
+
+def _metric(name, kind, description, samples):
+    lines = [f"# HELP {PREFIX}_{name} {description}", f"# TYPE {PREFIX}_{name} {kind}"]
+    for labels, value in samples:
+        label_text = ",".join(f'{key}="{val}"' for key, val in labels.items())
+        lines.append(f"{PREFIX}_{name}{{{label_text}}} {value}" if label_text else f"{PREFIX}_{name} {value}")
+    return lines
+
+
+def render():
+    """The current values in the Prometheus text exposition format."""
+    with _lock:
+        cache, queues = _cache, dict(_queues)
+    connections = http_session.connection_stats()
+    in_use = limits.in_use()
+    queues["remux"] = postprocess.queued_remuxes
+    lines = []
+    lines += _metric("bytes_downloaded_total", "counter", "Bytes of video, caption and attachment data received.",
+                     [({}, bandwidth.bytes_transferred())])
+    lines += _metric("http_requests_total", "counter", "HTTP requests sent over the shared session.", [({}, connections["requests"])])
+    lines += _metric("http_connections_total", "counter", "New HTTP connections opened by the shared session.", [({}, connections["new"])])
+    lines += _metric("retries_total", "counter", "Requests and downloads retried after a transient failure.", [({}, retry.retry_count())])
+    lines += _metric("active_jobs", "gauge", "Jobs holding a concurrency slot now, by stage.", [({"stage": kind}, count) for kind, count in in_use.items()])
+    lines += _metric("stage_limit", "gauge", "Maximum jobs at once, by stage.", [({"stage": kind}, limits.limit(kind)) for kind in in_use])
+    lines += _metric("queue_depth", "gauge", "Jobs waiting to start, by queue.", [({"queue": name}, depth()) for name, depth in sorted(queues.items())])
+    lines += [f"# HELP {PREFIX}_api_request_duration_seconds Udemy API response time.",
+              f"# TYPE {PREFIX}_api_request_duration_seconds histogram"]
+    lines += api_latency.render(f"{PREFIX}_api_request_duration_seconds")
+    if cache is not None:
+        summary = cache.get_download_summary()
+        lines += _metric("lectures", "gauge", "Lectures in the download cache, by status.",
+                         [({"status": status}, summary[status]) for status in ("completed", "failed", "in_progress")])
+        lines += _metric("lecture_failures", "gauge", "Failed lectures, by asset type.",
+                         [({"type": kind}, count) for kind, count in sorted(cache.failures_by_type().items())])
+    return "\n".join(lines) + "\n"
+
+
+def write_textfile(path):
+    """Replace ``path`` atomically so the collector never reads a half-written file."""
+    directory = os.path.dirname(os.path.abspath(path))
+    temp_name = None
+    try:
+        with tempfile.NamedTemporaryFile("w", encoding="utf-8", delete=False, dir=directory, suffix=".tmp") as file:
+            file.write(render())
+            temp_name = file.name
+        os.replace(temp_name, path)
+    except OSError as error:
+        if temp_name and os.path.exists(temp_name):
+            os.unlink(temp_name)
+        logger.warning("Could not write metrics to %s: %s", path, error)
+
+
+def _write_periodically():
+    while not _stop.wait(_interval):
+        write_textfile(_textfile)
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if urlsplit(self.path).path != "/metrics":
+            self.send_error(404)
+            return
+        body = render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def configure(textfile=None, port=None, interval=DEFAULT_INTERVAL):
+    """Start exporting: rewrite ``textfile`` every ``interval`` seconds and/or serve ``/metrics`` on ``port``."""
+    global _textfile, _interval, _writer, _server, _hooked
+    close()
+    if not textfile and port is None:
+        return
+    if not _hooked:
+        http_session.add_response_hook(observe_response)
+        _hooked = True
+    _stop.clear()
+    _interval = max(1, interval)
+    if textfile:
+        _textfile = textfile
+        write_textfile(textfile)
+        _writer = threading.Thread(target=_write_periodically, name="metrics-textfile", daemon=True)
+        _writer.start()
+    if port is not None:
+        try:
+            _server = ThreadingHTTPServer(("127.0.0.1", port), _MetricsHandler)
+        except OSError as error:
+            logger.error("Could not serve metrics on port %d: %s", port, error)
+            return
+        threading.Thread(target=_server.serve_forever, name="metrics-http", daemon=True).start()
+        logger.info("Serving metrics at http://127.0.0.1:%d/metrics", _server.server_address[1])
+
+
+def close():
+    """Write the final values and stop exporting."""
+    global _textfile, _writer, _server
+    _stop.set()
+    if _writer is not None:
+        _writer.join()
+        _writer = None
+    if _textfile:
+        write_textfile(_textfile)
+        _textfile = None
+    if _server is not None:
+        _server.shutdown()
+        _server.server_close()
+        _server = None
@@ -0,0 +1,93 @@
+"""Post-processing stage that runs beside the downloads.
+
+FFmpeg remuxes go to a thread pool sized by the remux limit: the work happens in
+the FFmpeg process, so a thread only waits for it. Pure-Python CPU work such as
+WebVTT to SRT conversion goes to a process pool sized to the CPU cores, so it
+does not compete with the download threads for the GIL.
+"""
+
+import contextvars
+import os
+import subprocess
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+_lock = threading.Lock()
+_remux_workers = max(1, (os.cpu_count() or 2) // 2)
+_cpu_workers = os.cpu_count() or 1
+_remux_executor = None
+_cpu_executor = None
+_queued_remuxes = 0
+
+
+def configure(remux_workers=None, cpu_workers=None):
+    global _remux_workers, _cpu_workers
+    shutdown()
+    with _lock:
+        if remux_workers:
+            _remux_workers = max(1, remux_workers)
+        if cpu_workers:
+            _cpu_workers = max(1, cpu_workers)
+
+
+def _remux_pool():
+    global _remux_executor
+    with _lock:
+        if _remux_executor is None:
+            _remux_executor = ThreadPoolExecutor(max_workers=_remux_workers, thread_name_prefix="remux")
+        return _remux_executor
+
+
+def _cpu_pool():
+    global _cpu_executor
+    with _lock:
+        if _cpu_executor is None:
+            try:
+                _cpu_executor = ProcessPoolExecutor(max_workers=_cpu_workers)
+            except (OSError, NotImplementedError):
+                # No working multiprocessing (some sandboxes): threads still keep the work off the caller.
+                _cpu_executor = ThreadPoolExecutor(max_workers=_cpu_workers, thread_name_prefix="cpu")
+        return _cpu_executor
+
+
+def submit_remux(fn, *args, **kwargs):
+    """Run ``fn`` (which starts FFmpeg and waits for it) on the remux pool and return its future."""
+    global _queued_remuxes
+    with _lock:
+        _queued_remuxes += 1
+    # Carry context variables (such as the lecture's trace) into the pool thread.
+    return _remux_pool().submit(_start_remux, contextvars.copy_context(), fn, *args, **kwargs)
+
+
+def _start_remux(context, fn, *args, **kwargs):
+    global _queued_remuxes
+    with _lock:
+        _queued_remuxes -= 1
+    return context.run(fn, *args, **kwargs)
+
+
+def queued_remuxes():
+    """Remux jobs submitted and waiting for a pool thread."""
+    with _lock:
+        return _queued_remuxes
+
+
+def submit_cpu(fn, *args):
+    """Run a picklable, module-level ``fn`` on the CPU pool and return its future."""
+    return _cpu_pool().submit(fn, *args)
+
+
+def run(command):
+    """Run a post-processing command and return ``(returncode, stderr)``."""
+    process = subprocess.run(command, capture_output=True, text=True, encoding="utf-8", errors="replace")
+    return process.returncode, process.stderr
+
+
+def shutdown():
+    """Wait for every queued job (and its completion callbacks), then release the pools."""
+    global _remux_executor, _cpu_executor
+    with _lock:
+        executors, _remux_executor, _cpu_executor = [_remux_executor, _cpu_executor], None, None
+    for executor in executors:
+        if executor is not None:
+            executor.shutdown(wait=True)
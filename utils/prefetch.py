@@ -0,0 +1,29 @@
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+
+def prefetch(items, fetch, depth, workers=2):
+    """Yield ``(item, future)`` in order while ``fetch(item)`` runs for up to ``depth`` items ahead.
+
+    A new fetch is only started when the consumer takes an item, so a slow consumer
+    never has more than ``depth`` responses waiting in memory.
+    """
+    items = iter(items)
+    window = deque()
+    executor = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="prefetch")
+    try:
+        def fill():
+            while len(window) < max(1, depth):
+                try:
+                    item = next(items)
+                except StopIteration:
+                    return
+                window.append((item, executor.submit(fetch, item)))
+
+        fill()
+        while window:
+            item, future = window.popleft()
+            fill()
+            yield item, future
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
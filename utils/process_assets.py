@@ -1,37 +1,49 @@
 import os
 
 from constants import LINK_ASSET_URL, FILE_ASSET_URL
-from utils.download_result import DownloadResult
-
-
-def download_supplementary_assets(udemy, assets, output_dir, course_id, lecture_id):
-    try:
-        os.makedirs(output_dir, exist_ok=True)
-        for asset in assets:
-            asset_type = asset.get("asset_type")
-            if asset_type == "File":
-                _download_file(udemy, asset, course_id, lecture_id, output_dir)
-            elif asset_type == "ExternalLink":
-                _write_link(udemy, asset, course_id, lecture_id, output_dir)
-        return DownloadResult.ok()
-    except (OSError, KeyError, IndexError, ValueError) as error:
-        return DownloadResult.failed(f"Supplementary asset download failed: {error}")
-
-
-def _download_file(udemy, asset, course_id, lecture_id, output_dir):
-    metadata = udemy.request(FILE_ASSET_URL.format(course_id=course_id, lecture_id=lecture_id, asset_id=asset["id"])).json()
-    url = metadata["download_urls"]["File"][0]["file"]
-    response = udemy.request(url)
-    response.raise_for_status()
+from utils import io_pool, limits, trace
+from utils.ranged_download import download_resumable
+
+ERROR_PREFIX = "Supplementary asset download failed"
+
+
+def start_supplementary_assets(udemy, assets, output_dir, course_id, lecture_id, download_cache=None):
+    """Queue every asset of a lecture on the shared I/O pool and return the futures."""
+    return [io_pool.submit(*job) for job in asset_jobs(udemy, assets, output_dir, course_id, lecture_id, download_cache)]
+
+
+def asset_jobs(udemy, assets, output_dir, course_id, lecture_id, download_cache=None):
+    """Return one ``(function, *args)`` tuple per downloadable asset, ready for any executor."""
+    os.makedirs(output_dir, exist_ok=True)
+    handlers = {"File": _download_file, "ExternalLink": _write_link}
+    return [(handlers[asset["asset_type"]], udemy, asset, course_id, lecture_id, output_dir, download_cache)
+            for asset in assets if asset.get("asset_type") in handlers]
+
+
+def _download_file(udemy, asset, course_id, lecture_id, output_dir, download_cache=None):
     name = os.path.basename(asset.get("filename") or f"asset-{asset['id']}")
-    with open(os.path.join(output_dir, name), "wb") as file:
-        for chunk in response.iter_content(chunk_size=1024 * 128):
-            if chunk:
-                file.write(chunk)
+    path = os.path.join(output_dir, name)
+    file_key = f"asset_{lecture_id}_{asset['id']}"
+    if download_cache and download_cache.is_file_completed(file_key, path):
+        return
+    with trace.span("assets") as span:
+        metadata = udemy.request(FILE_ASSET_URL.format(course_id=course_id, lecture_id=lecture_id, asset_id=asset["id"])).json()
+        url = metadata["download_urls"]["File"][0]["file"]
+        with limits.slot("file"):
+            span["bytes"], etag = download_resumable(url, path)
+    if download_cache:
+        download_cache.mark_file_completed(file_key, path, etag)
 
 
-def _write_link(udemy, asset, course_id, lecture_id, output_dir):
-    response = udemy.request(LINK_ASSET_URL.format(course_id=course_id, lecture_id=lecture_id, asset_id=asset["id"])).json()
+def _write_link(udemy, asset, course_id, lecture_id, output_dir, download_cache=None):
     name = os.path.basename(asset.get("filename") or f"asset-{asset['id']}") + ".url"
-    with open(os.path.join(output_dir, name), "w", encoding="utf-8") as file:
+    path = os.path.join(output_dir, name)
+    file_key = f"link_{lecture_id}_{asset['id']}"
+    if download_cache and download_cache.is_file_completed(file_key, path):
+        return
+    with trace.span("assets"):
+        response = udemy.request(LINK_ASSET_URL.format(course_id=course_id, lecture_id=lecture_id, asset_id=asset["id"])).json()
+    with open(path, "w", encoding="utf-8") as file:
         file.write(f"[InternetShortcut]\nURL={response['external_url']}\n")
+    if download_cache:
+        download_cache.mark_file_completed(file_key, path)
@@ -1,28 +1,61 @@
 import os
-import requests
-import webvtt
-
-from utils.download_result import DownloadResult
-
-
-def download_captions(captions, download_folder_path, title, captions_list, convert_to_srt):
-    try:
-        for caption in (caption for caption in captions if caption.get("locale_id") in captions_list):
-            url = caption.get("url")
-            if not url:
-                return DownloadResult.failed("Caption metadata did not include a URL.")
-            response = requests.get(url, timeout=(15, 120))
-            response.raise_for_status()
-            if not caption.get("file_name", "").endswith(".vtt"):
-                return DownloadResult.failed("Only WebVTT captions are supported.")
-            name = f"{title} - {caption.get('video_label', 'caption')}.vtt"
-            vtt_path = os.path.join(download_folder_path, name)
-            with open(vtt_path, "wb") as file:
-                file.write(response.content)
-            if convert_to_srt:
-                srt_path = vtt_path[:-4] + ".srt"
-                webvtt.read(vtt_path).save_as_srt(srt_path)
-                os.remove(vtt_path)
-        return DownloadResult.ok()
-    except (requests.RequestException, OSError, ValueError) as error:
-        return DownloadResult.failed(f"Caption download failed: {error}")
+
+from utils import io_pool, limits, postprocess, trace
+from utils.bandwidth import throttle
+from utils.http_session import get_session
+from utils.retry import get_policy
+from utils.vtt_to_srt import vtt_to_srt
+
+ERROR_PREFIX = "Caption download failed"
+
+
+def start_captions(captions, download_folder_path, title, captions_list, convert_to_srt, download_cache=None, keep_vtt=False):
+    """Queue one download per selected caption locale on the shared I/O pool and return the futures."""
+    return [io_pool.submit(_download_caption, caption, download_folder_path, title, convert_to_srt, download_cache, keep_vtt)
+            for caption in captions if caption.get("locale_id") in captions_list]
+
+
+def fetch_caption(url):
+    with limits.slot("file"):
+        response = get_session().get(url, timeout=(15, 120))
+        response.raise_for_status()
+        response.content
+    return response
+
+
+def caption_paths(caption, download_folder_path, title, convert_to_srt):
+    """Validate a caption entry and return ``(url, vtt_path, final_path, file_key)``."""
+    url = caption.get("url")
+    if not url:
+        raise ValueError("Caption metadata did not include a URL.")
+    if not caption.get("file_name", "").endswith(".vtt"):
+        raise ValueError("Only WebVTT captions are supported.")
+    vtt_path = os.path.join(download_folder_path, f"{title} - {caption.get('video_label', 'caption')}.vtt")
+    final_path = vtt_path[:-4] + ".srt" if convert_to_srt else vtt_path
+    return url, vtt_path, final_path, f"caption_{final_path}"
+
+
+def save_caption(content, vtt_path, final_path, keep_vtt=False):
+    """Write the caption; an SRT is converted straight from the downloaded bytes, the VTT is written only when kept."""
+    outputs = []
+    if final_path != vtt_path:
+        # Conversion is pure-Python CPU work; the process pool keeps it off the download threads' GIL.
+        outputs.append((final_path, postprocess.submit_cpu(vtt_to_srt, content).result()))
+    if final_path == vtt_path or keep_vtt:
+        outputs.append((vtt_path, content))
+    for path, data in outputs:
+        with open(path, "wb") as file:
+            file.write(data)
+
+
+def _download_caption(caption, download_folder_path, title, convert_to_srt, download_cache=None, keep_vtt=False):
+    url, vtt_path, final_path, file_key = caption_paths(caption, download_folder_path, title, convert_to_srt)
+    if download_cache and download_cache.is_file_completed(file_key, final_path):
+        return
+    with trace.span("captions") as span:
+        response = get_policy().call(fetch_caption, url, description=f"caption {os.path.basename(vtt_path)}")
+        throttle(len(response.content))
+        save_caption(response.content, vtt_path, final_path, keep_vtt)
+        span["bytes"] = len(response.content)
+    if download_cache:
+        download_cache.mark_file_completed(file_key, final_path, response.headers.get("ETag"))
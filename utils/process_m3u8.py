@@ -1,5 +1,4 @@
 import os
-import re
 import shutil
 import subprocess
 from urllib.parse import urljoin, urlparse, urlunparse
@@ -8,37 +7,46 @@ import m3u8
 import requests
 
 from constants import remove_emojis_and_binary
+from utils import bandwidth, limits
 from utils.download_result import DownloadResult
+from utils.downloader_output import follow, transient_failure
+from utils.http_session import get_session
+from utils.retry import call_result, get_policy
+from utils.signed_url import forbidden_status
 
 N_M3U8DL_RE_PATH = os.getenv("N_M3U8DL_RE_PATH", "n_m3u8dl-re.exe")
 SHAKA_PACKAGER_PATH = os.getenv("SHAKA_PACKAGER_PATH", "shaka-packager.exe")
 
 
-def _run_downloader(source_url, output_dir, output_name, task_id, progress, drm_key=None):
+def hls_command(source_url, output_dir, output_name, drm_key=None):
     command = [N_M3U8DL_RE_PATH, source_url, "--save-dir", output_dir, "--save-name", output_name,
                "--auto-select", "--concurrent-download", "--del-after-done", "--no-log", "--tmp-dir", output_dir,
                "--log-level", "ERROR"]
     if drm_key:
         command.extend(["--key", drm_key, "--decryption-engine", "SHAKA_PACKAGER",
                         "--decryption-binary-path", os.path.abspath(SHAKA_PACKAGER_PATH), "-mt", "-M", "format=mkv"])
+    return command
+
+
+def downloader_failed(code, output):
+    detail = output[-2000:].strip() or "No diagnostic output was produced."
+    print(f"DEBUG: N_m3u8DL-RE failed (exit {code}):\n{detail}")
+    return DownloadResult.failed(f"N_m3u8DL-RE exited with code {code}. {detail}", forbidden_status(detail), transient_failure(detail))
 
-    safe_command = ["[REDACTED]" if item == drm_key else item for item in command]
-    print("DEBUG: Running N_m3u8DL-RE:", subprocess.list2cmdline(safe_command))
-    process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True,
-                               encoding="utf-8", errors="replace")
-    output_lines = []
-    pattern = re.compile(r"(\d+\.\d+%)")
-    for output in iter(process.stdout.readline, ""):
-        output_lines.append(output)
-        matches = pattern.findall(output)
-        if matches:
-            progress.update(task_id, completed=min(float(matches[0][:-1]), 99))
-    process.wait()
-    output = "".join(output_lines)
+
+def _run_downloader(source_url, output_dir, output_name, task_id, progress, drm_key=None):
+    command = hls_command(source_url, output_dir, output_name, drm_key)
+    with limits.slot("stream"), bandwidth.subprocess_share() as max_speed:
+        if max_speed:
+            command.extend(["--max-speed", max_speed])
+        safe_command = ["[REDACTED]" if item == drm_key else item for item in command]
+        print("DEBUG: Running N_m3u8DL-RE:", subprocess.list2cmdline(safe_command))
+        process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True,
+                                   encoding="utf-8", errors="replace")
+        output = follow(iter(process.stdout.readline, ""), progress, task_id)
+        process.wait()
     if process.returncode:
-        detail = output[-2000:].strip() or "No diagnostic output was produced."
-        print(f"DEBUG: N_m3u8DL-RE failed (exit {process.returncode}):\n{detail}")
-        return DownloadResult.failed(f"N_m3u8DL-RE exited with code {process.returncode}. {detail}")
+        return downloader_failed(process.returncode, output)
     return DownloadResult.ok()
 
 
@@ -51,9 +59,14 @@ def _with_parent_query(parent_url, child_url):
     return child_url
 
 
-def _select_media_playlist(master_url):
-    response = requests.get(master_url, timeout=(15, 120))
+def _fetch_playlist(url):
+    response = get_session().get(url, timeout=(15, 120))
     response.raise_for_status()
+    return response
+
+
+def select_media_playlist(master_url):
+    response = get_policy().call(_fetch_playlist, master_url, description="HLS master playlist")
     playlist = m3u8.loads(response.text)
     if not playlist.playlists:
         return master_url
@@ -66,15 +79,23 @@ def download_and_merge_m3u8(m3u8_url, download_folder_path, title, task_id, prog
     progress.update(task_id, description=f"Downloading stream {remove_emojis_and_binary(title)}", completed=0)
     output_dir = os.path.dirname(download_folder_path)
     try:
-        media_url = _select_media_playlist(m3u8_url)
+        media_url = select_media_playlist(m3u8_url)
     except requests.RequestException as error:
-        return DownloadResult.failed(f"Could not fetch the HLS playlist: {error}")
+        response = getattr(error, "response", None)
+        return DownloadResult.failed(f"Could not fetch the HLS playlist: {error}", getattr(response, "status_code", None))
     except ValueError as error:
         return DownloadResult.failed(f"Could not read the HLS playlist: {error}")
-    result = _run_downloader(media_url, output_dir, f"{title}.mp4", task_id, progress, drm_key)
+    result = call_result(_run_downloader, media_url, output_dir, f"{title}.mp4", task_id, progress, drm_key,
+                         description=f"HLS download of {remove_emojis_and_binary(title)}")
+    return finish_hls(result, download_folder_path, title, task_id, progress)
+
+
+def finish_hls(result, download_folder_path, title, task_id, progress):
+    """Check the downloader's output file and clean up the lecture's temporary folder."""
     if not result.success:
         progress.console.log(f"[red]HLS download failed: {remove_emojis_and_binary(title)}[/red]")
         return result
+    output_dir = os.path.dirname(download_folder_path)
     output_file = os.path.join(output_dir, f"{title}.mp4")
     if not os.path.isfile(output_file) or os.path.getsize(output_file) == 0:
         return DownloadResult.failed(f"HLS downloader reported success but did not create {output_file}.")
@@ -1,10 +1,14 @@
 import os
-import re
 import shutil
 import subprocess
 
 from constants import remove_emojis_and_binary
+from utils import bandwidth, limits, postprocess, trace
+from utils.remux import audio_codec, remux_command
 from utils.download_result import DownloadResult
+from utils.downloader_output import follow, transient_failure
+from utils.retry import call_result
+from utils.signed_url import forbidden_status
 
 N_M3U8DL_RE_PATH = os.getenv("N_M3U8DL_RE_PATH", "n_m3u8dl-re.exe")
 SHAKA_PACKAGER_PATH = os.getenv("SHAKA_PACKAGER_PATH", "shaka-packager.exe")
@@ -15,38 +19,76 @@ def _run(command, task_id, progress):
     print("DEBUG: Running N_m3u8DL-RE:", subprocess.list2cmdline(safe_command))
     process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True,
                                encoding="utf-8", errors="replace")
-    lines, pattern = [], re.compile(r"(\d+\.\d+%)")
-    for output in iter(process.stdout.readline, ""):
-        lines.append(output)
-        matches = pattern.findall(output)
-        if matches:
-            progress.update(task_id, completed=min(float(matches[0][:-1]), 99))
+    output = follow(iter(process.stdout.readline, ""), progress, task_id)
     process.wait()
-    return process.returncode, "".join(lines)
+    return process.returncode, output
 
 
-def download_and_merge_mpd(mpd_url, download_folder_path, title, length, key, task_id, progress):
-    progress.update(task_id, description=f"Downloading stream {remove_emojis_and_binary(title)}", completed=0)
+def dash_failed(code, output):
+    detail = output[-2000:].strip() or "No diagnostic output was produced."
+    print(f"DEBUG: DASH downloader failed (exit {code}):\n{detail}")
+    return DownloadResult.failed(f"DASH downloader exited with code {code}. {detail}", forbidden_status(detail), transient_failure(detail))
+
+
+def _download_stream(command, task_id, progress):
+    with limits.slot("stream"), bandwidth.subprocess_share() as max_speed:
+        code, output = _run(command + ["--max-speed", max_speed] if max_speed else command, task_id, progress)
+    if code:
+        return dash_failed(code, output)
+    return DownloadResult.ok()
+
+
+def dash_command(mpd_url, download_folder_path, title, key):
     command = [N_M3U8DL_RE_PATH, mpd_url, "--save-dir", download_folder_path, "--save-name", f"{title}.mp4",
                "--auto-select", "--concurrent-download", "--del-after-done", "--no-log", "--tmp-dir", download_folder_path,
                "--log-level", "ERROR"]
     if key:
         command.extend(["--key", key, "--decryption-engine", "SHAKA_PACKAGER",
                         "--decryption-binary-path", os.path.abspath(SHAKA_PACKAGER_PATH), "-mt", "-M", "format=mkv"])
-    code, output = _run(command, task_id, progress)
-    if code:
-        detail = output[-2000:].strip() or "No diagnostic output was produced."
-        print(f"DEBUG: DASH downloader failed (exit {code}):\n{detail}")
-        return DownloadResult.failed(f"DASH downloader exited with code {code}. {detail}")
+    return command
+
+
+def convert_command(download_folder_path, title):
+    """Return the FFmpeg command that turns a decrypted MKV into the final MP4, or None when there is no MKV.
 
+    Probes the audio track first so an already MP4-compatible track is copied instead of re-encoded.
+    """
     final_file = os.path.join(os.path.dirname(download_folder_path), f"{title}.mp4")
     mkv_files = [os.path.join(download_folder_path, name) for name in os.listdir(download_folder_path) if name.lower().endswith(".mkv")]
-    if mkv_files:
-        convert = subprocess.run(["ffmpeg", "-loglevel", "error", "-i", mkv_files[0], "-c:v", "copy", "-c:a", "aac", "-y", final_file],
-                                 capture_output=True, text=True, encoding="utf-8", errors="replace")
-        if convert.returncode:
-            return DownloadResult.failed(f"FFmpeg could not convert the DASH output: {convert.stderr[-1000:]}")
-    else:
+    if not mkv_files:
+        return None
+    return remux_command(mkv_files[0], final_file, audio_codec(mkv_files[0]))
+
+
+def convert_failed(stderr):
+    return DownloadResult.failed(f"FFmpeg could not convert the DASH output: {stderr[-1000:]}")
+
+
+def download_and_merge_mpd(mpd_url, download_folder_path, title, length, key, task_id, progress):
+    progress.update(task_id, description=f"Downloading stream {remove_emojis_and_binary(title)}", completed=0)
+    command = dash_command(mpd_url, download_folder_path, title, key)
+    result = call_result(_download_stream, command, task_id, progress, description=f"DASH download of {remove_emojis_and_binary(title)}")
+    if not result.success:
+        return result
+    # The remux runs on the post-processing stage so this worker can start the next download.
+    progress.update(task_id, description=f"Post-processing {remove_emojis_and_binary(title)}")
+    return DownloadResult.deferred(postprocess.submit_remux(_convert_and_finish, download_folder_path, title, task_id, progress))
+
+
+def _convert_and_finish(download_folder_path, title, task_id, progress):
+    convert = convert_command(download_folder_path, title)
+    if convert:
+        with limits.slot("remux"), trace.span("remux"):
+            code, stderr = postprocess.run(convert)
+        if code:
+            return convert_failed(stderr)
+    return finish_dash(download_folder_path, title, task_id, progress, converted=bool(convert))
+
+
+def finish_dash(download_folder_path, title, task_id, progress, converted=False):
+    """Move the downloaded MP4 into place when no conversion ran, then verify it and clean up."""
+    final_file = os.path.join(os.path.dirname(download_folder_path), f"{title}.mp4")
+    if not converted:
         candidates = [os.path.join(download_folder_path, f"{title}.mp4"), final_file]
         source = next((path for path in candidates if os.path.isfile(path) and os.path.getsize(path) > 0), None)
         if not source:
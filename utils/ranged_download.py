@@ -0,0 +1,232 @@
+"""Segmented HTTP downloads over several connections with byte-level resume."""
+
+import contextvars
+import json
+import os
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from utils.bandwidth import throttle
+from utils.http_session import get_session
+from utils.retry import get_policy, is_retryable
+
+CHUNK_SIZE = 1024 * 128
+SEGMENT_SIZE = 1024 * 1024 * 8
+DEFAULT_CONNECTIONS = 4
+TIMEOUT = (15, 120)
+
+
+class RangeNotSatisfied(RuntimeError):
+    """The server ignored a Range request or the remote file changed between segments."""
+
+
+class IncompleteDownload(RuntimeError):
+    """The connection ended before the announced number of bytes arrived."""
+
+
+def _retryable(error):
+    return isinstance(error, IncompleteDownload) or is_retryable(error)
+
+
+def probe(url):
+    return get_policy().call(_probe, url, description=f"probe of {url}")
+
+
+def _probe(url):
+    """Return ``(size, etag, accepts_ranges)`` using a one-byte range request."""
+    with get_session().get(url, headers={"Range": "bytes=0-0"}, stream=True, timeout=TIMEOUT) as response:
+        response.raise_for_status()
+        etag = response.headers.get("ETag")
+        if response.status_code == 206:
+            total = response.headers.get("Content-Range", "").rpartition("/")[2]
+            if total.isdigit():
+                return int(total), etag, True
+        return int(response.headers.get("Content-Length") or 0), etag, False
+
+
+def _missing_segments(size, done):
+    done = {tuple(item) for item in done}
+    for start in range(0, size, SEGMENT_SIZE):
+        segment = (start, min(start + SEGMENT_SIZE, size) - 1)
+        if segment not in done:
+            yield segment
+
+
+def _write_json(path, data):
+    directory = os.path.dirname(path) or "."
+    with tempfile.NamedTemporaryFile("w", encoding="utf-8", delete=False, dir=directory, suffix=".tmp") as file:
+        json.dump(data, file)
+        temp_name = file.name
+    os.replace(temp_name, path)
+
+
+class _ResumeState:
+    """Completed byte ranges of ``<output>.part``, persisted in ``<output>.part.json``."""
+
+    def __init__(self, path, size, etag):
+        self.path = path
+        self.size = size
+        self.etag = etag
+        self.done = []
+        self._lock = threading.Lock()
+
+    @classmethod
+    def load(cls, path, size, etag):
+        state = cls(path, size, etag)
+        try:
+            with open(path, "r", encoding="utf-8") as file:
+                saved = json.load(file)
+            if saved.get("size") == size and saved.get("etag") == etag:
+                state.done = [tuple(item) for item in saved.get("done", [])]
+        except (OSError, ValueError, AttributeError):
+            pass
+        return state
+
+    def completed_bytes(self):
+        return sum(end - start + 1 for start, end in self.done)
+
+    def mark_done(self, segment):
+        with self._lock:
+            self.done.append(segment)
+            _write_json(self.path, {"size": self.size, "etag": self.etag, "done": sorted(self.done)})
+
+
+def _fetch_segment(url, part_path, segment, etag, on_bytes):
+    start, end = segment
+    headers = {"Range": f"bytes={start}-{end}"}
+    if etag:
+        headers["If-Range"] = etag
+    with get_session().get(url, headers=headers, stream=True, timeout=TIMEOUT) as response:
+        response.raise_for_status()
+        if response.status_code != 206:
+            raise RangeNotSatisfied(f"server answered bytes {start}-{end} with HTTP {response.status_code}")
+        written = 0
+        with open(part_path, "r+b") as file:
+            file.seek(start)
+            for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+                if chunk:
+                    throttle(len(chunk))
+                    file.write(chunk)
+                    written += len(chunk)
+                    on_bytes(len(chunk))
+    if written != end - start + 1:
+        raise IncompleteDownload(f"bytes {start}-{end} ended after {written} bytes")
+
+
+def download_resumable(url, output_file, on_progress=None):
+    """Stream ``url`` over one connection, continuing an earlier ``.part`` file when the ETag still matches.
+
+    A retry after a dropped connection picks up from the bytes already written.
+    Returns ``(size, etag)`` of the finished file.
+    """
+    return get_policy().call(_download_resumable, url, output_file, on_progress, retryable=_retryable,
+                             description=f"download of {os.path.basename(output_file)}")
+
+
+def _download_resumable(url, output_file, on_progress):
+    part_path = output_file + ".part"
+    state_path = part_path + ".json"
+    offset, saved_etag = 0, None
+    try:
+        with open(state_path, "r", encoding="utf-8") as file:
+            saved_etag = json.load(file).get("resume_etag")
+        offset = os.path.getsize(part_path)
+    except (OSError, ValueError, AttributeError):
+        pass
+    headers = {"Range": f"bytes={offset}-", "If-Range": saved_etag} if offset and saved_etag else {}
+
+    with get_session().get(url, headers=headers, stream=True, timeout=TIMEOUT) as response:
+        if response.status_code == 416 and offset:
+            # Nothing lies past the end of the .part: it is either the whole file or stale.
+            total = response.headers.get("Content-Range", "").rpartition("/")[2]
+            if total.isdigit() and int(total) == offset:
+                return _finish_part(part_path, output_file, state_path, on_progress), saved_etag
+            _discard(part_path, state_path)
+            return _download_resumable(url, output_file, on_progress)
+        response.raise_for_status()
+        if response.status_code != 206:
+            offset = 0
+        etag = response.headers.get("ETag")
+        if etag:
+            _write_json(state_path, {"resume_etag": etag})
+        length = int(response.headers.get("Content-Length") or 0)
+        expected = offset + length if length else 0
+        downloaded = offset
+        with open(part_path, "ab" if offset else "wb") as file:
+            for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+                if chunk:
+                    throttle(len(chunk))
+                    file.write(chunk)
+                    downloaded += len(chunk)
+                    if on_progress:
+                        on_progress(downloaded, expected)
+
+    actual = os.path.getsize(part_path)
+    if expected and actual != expected:
+        raise IncompleteDownload(f"downloaded {actual} bytes but the server announced {expected}")
+    return _finish_part(part_path, output_file, state_path), etag
+
+
+def _finish_part(part_path, output_file, state_path, on_progress=None):
+    size = os.path.getsize(part_path)
+    if on_progress:
+        on_progress(size, size)
+    os.replace(part_path, output_file)
+    if os.path.exists(state_path):
+        os.remove(state_path)
+    return size
+
+
+def _discard(*paths):
+    for path in paths:
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def download_ranged(url, output_file, connections=DEFAULT_CONNECTIONS, on_progress=None):
+    """Download ``url`` to ``output_file``, resuming an earlier partial ``.part`` file when possible.
+
+    ``on_progress(downloaded, total)`` is called from worker threads. The output only
+    appears once its size matches what the server announced.
+    """
+    size, etag, accepts_ranges = probe(url)
+    if not accepts_ranges or size <= SEGMENT_SIZE or connections <= 1:
+        return download_resumable(url, output_file, on_progress)[0]
+
+    part_path = output_file + ".part"
+    state_path = part_path + ".json"
+    lock = threading.Lock()
+    progress = {"downloaded": 0}
+
+    def on_bytes(count):
+        with lock:
+            progress["downloaded"] += count
+            downloaded = progress["downloaded"]
+        if on_progress:
+            on_progress(downloaded, size)
+
+    state = _ResumeState.load(state_path, size, etag)
+    if not state.done or not os.path.isfile(part_path) or os.path.getsize(part_path) != size:
+        state.done = []
+        with open(part_path, "wb") as file:
+            file.truncate(size)
+    progress["downloaded"] = state.completed_bytes()
+
+    def fetch(segment):
+        get_policy().call(_fetch_segment, url, part_path, segment, etag, on_bytes, retryable=_retryable,
+                          description=f"bytes {segment[0]}-{segment[1]} of {os.path.basename(output_file)}")
+        state.mark_done(segment)
+
+    with ThreadPoolExecutor(max_workers=connections, thread_name_prefix="range") as executor:
+        futures = [executor.submit(contextvars.copy_context().run, fetch, segment) for segment in _missing_segments(size, state.done)]
+        for future in futures:
+            future.result()
+
+    actual = os.path.getsize(part_path)
+    if actual != size:
+        raise RangeNotSatisfied(f"downloaded {actual} bytes but the server announced {size}")
+    os.replace(part_path, output_file)
+    if os.path.exists(state_path):
+        os.remove(state_path)
+    return actual
@@ -0,0 +1,38 @@
+"""Build the FFmpeg command that turns a downloaded MKV into the final MP4."""
+
+import subprocess
+
+FFMPEG_PATH = "ffmpeg"
+FFPROBE_PATH = "ffprobe"
+# Audio codecs the MP4 container carries as-is; anything else is transcoded to AAC.
+MP4_AUDIO_CODECS = {"aac", "mp3", "ac3", "eac3", "alac"}
+
+_faststart = False
+
+
+def configure(faststart=False):
+    """With ``faststart`` the index is written at the front of each MP4 so it can play while streaming."""
+    global _faststart
+    _faststart = faststart
+
+
+def audio_codec(path):
+    """Return the codec name of the first audio track, or None if there is none or ffprobe is unavailable."""
+    command = [FFPROBE_PATH, "-v", "error", "-select_streams", "a:0", "-show_entries", "stream=codec_name",
+               "-of", "default=noprint_wrappers=1:nokey=1", path]
+    try:
+        probe = subprocess.run(command, capture_output=True, text=True, encoding="utf-8", errors="replace", timeout=60)
+    except (OSError, subprocess.TimeoutExpired):
+        return None
+    if probe.returncode:
+        return None
+    return probe.stdout.strip().lower() or None
+
+
+def remux_command(source, output, codec):
+    """Copy the video, and the audio too when ``codec`` is MP4-compatible; otherwise transcode the audio to AAC."""
+    audio = ["-c:a", "copy"] if codec in MP4_AUDIO_CODECS else ["-c:a", "aac"]
+    command = [FFMPEG_PATH, "-loglevel", "error", "-i", source, "-c:v", "copy", *audio]
+    if _faststart:
+        command.extend(["-movflags", "+faststart"])
+    return command + ["-y", output]
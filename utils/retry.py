@@ -0,0 +1,170 @@
+"""Shared retry policy: exponential backoff with full jitter, honoring Retry-After.
+
+Only wrap idempotent work with it: GET requests, resumable downloads and
+downloader subprocesses that start over cleanly.
+"""
+
+import asyncio
+import contextvars
+import random
+import threading
+import time
+from contextlib import contextmanager
+from email.utils import parsedate_to_datetime
+
+import requests
+
+from constants import logger
+
+DEFAULT_ATTEMPTS = 4
+BASE_DELAY = 1.0
+MAX_DELAY = 60.0
+RETRY_STATUSES = {408, 425, 429, 500, 502, 503, 504}
+PERMANENT_STATUSES = {401, 403, 404, 410}
+
+# Called as listener(description, error) before each retry; set per lecture with on_retry().
+_listener = contextvars.ContextVar("retry_listener", default=None)
+_count_lock = threading.Lock()
+_retries = 0
+
+
+def is_retryable(error):
+    if isinstance(error, requests.HTTPError):
+        return error.response is not None and error.response.status_code in RETRY_STATUSES
+    return isinstance(error, (requests.ConnectionError, requests.Timeout, requests.exceptions.ChunkedEncodingError))
+
+
+def retry_after(error):
+    """Return the server's Retry-After delay in seconds, if the error carries one."""
+    response = getattr(error, "response", None)
+    value = response.headers.get("Retry-After") if response is not None else None
+    if not value:
+        return None
+    if value.strip().isdigit():
+        return float(value)
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def _notify(description, error):
+    global _retries
+    with _count_lock:
+        _retries += 1
+    listener = _listener.get()
+    if listener is not None:
+        listener(description, error)
+
+
+def retry_count():
+    """Retries made so far in this process."""
+    with _count_lock:
+        return _retries
+
+
+class RetryPolicy:
+    def __init__(self, attempts=DEFAULT_ATTEMPTS, base_delay=BASE_DELAY, max_delay=MAX_DELAY, sleep=time.sleep, rand=random.random):
+        self.attempts = max(1, attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._sleep = sleep
+        self._rand = rand
+
+    def delay(self, attempt, server_delay=None):
+        if server_delay is not None:
+            return min(server_delay, self.max_delay)
+        return self._rand() * min(self.max_delay, self.base_delay * 2 ** (attempt - 1))
+
+    def call(self, fn, *args, retryable=is_retryable, description="request", **kwargs):
+        for attempt in range(1, self.attempts + 1):
+            try:
+                return fn(*args, **kwargs)
+            except Exception as error:
+                if attempt == self.attempts or not retryable(error):
+                    raise
+                wait = self.delay(attempt, retry_after(error))
+                logger.warning("Retrying %s in %.1fs (attempt %d of %d failed: %s)", description, wait, attempt, self.attempts, error)
+                _notify(description, error)
+                self._sleep(wait)
+
+    async def call_async(self, fn, *args, retryable=is_retryable, description="request", **kwargs):
+        """Like ``call`` for coroutine functions; waits with ``asyncio.sleep`` so the event loop keeps running."""
+        for attempt in range(1, self.attempts + 1):
+            try:
+                return await fn(*args, **kwargs)
+            except Exception as error:
+                if attempt == self.attempts or not retryable(error):
+                    raise
+                wait = self.delay(attempt, retry_after(error))
+                logger.warning("Retrying %s in %.1fs (attempt %d of %d failed: %s)", description, wait, attempt, self.attempts, error)
+                _notify(description, error)
+                await asyncio.sleep(wait)
+
+
+class _FailedResult(Exception):
+    def __init__(self, result):
+        super().__init__(result.error)
+        self.result = result
+
+    def __str__(self):
+        return (self.result.error or "failed").strip().splitlines()[0][:200]
+
+
+def call_result(fn, *args, description="download", **kwargs):
+    """Retry ``fn`` (which returns a DownloadResult) until it succeeds or the attempts run out."""
+    def attempt():
+        result = fn(*args, **kwargs)
+        if not result.success:
+            raise _FailedResult(result)
+        return result
+
+    try:
+        return _policy.call(attempt, retryable=_retryable_result, description=description)
+    except _FailedResult as failure:
+        return failure.result
+
+
+def _retryable_result(error):
+    # Each attempt starts the whole stream over, so only retry failures that can go away by themselves;
+    # a wrong key, a mux error or a full disk fails the same way every time.
+    if not isinstance(error, _FailedResult):
+        return False
+    result = error.result
+    return result.http_status not in PERMANENT_STATUSES and (result.transient or result.http_status in RETRY_STATUSES)
+
+
+async def call_result_async(fn, *args, description="download", **kwargs):
+    """``call_result`` for coroutine functions returning a DownloadResult."""
+    async def attempt():
+        result = await fn(*args, **kwargs)
+        if not result.success:
+            raise _FailedResult(result)
+        return result
+
+    try:
+        return await _policy.call_async(attempt, retryable=_retryable_result, description=description)
+    except _FailedResult as failure:
+        return failure.result
+
+
+_policy = RetryPolicy()
+
+
+def configure(attempts=DEFAULT_ATTEMPTS):
+    global _policy
+    _policy = RetryPolicy(attempts)
+
+
+def get_policy():
+    return _policy
+
+
+@contextmanager
+def on_retry(listener):
+    """Report every retry made in this context (and in pool tasks submitted from it) to ``listener``."""
+    token = _listener.set(listener)
+    try:
+        yield
+    finally:
+        _listener.reset(token)
@@ -0,0 +1,27 @@
+"""Order in which planned lectures are handed to the workers.
+
+The order only changes when a lecture starts; every lecture still goes to its
+numbered path in its chapter folder.
+"""
+
+POLICIES = ("curriculum", "longest-first")
+
+
+def estimated_seconds(lecture):
+    """The curriculum's duration estimate for a lecture; 0 for articles, quizzes and unknown lengths."""
+    asset = lecture.get('asset') or {}
+    # An article's estimate is reading time; it downloads in a moment.
+    if asset.get('asset_type') != "Video":
+        return 0
+    return asset.get('time_estimation') or 0
+
+
+def order(plan, policy="curriculum"):
+    """Return the plan entries ``(mindex, chapter, lindex, lecture, chapter_index)`` in the order to start them.
+
+    ``longest-first`` starts the longest videos first so no long download is left running
+    alone at the end; equal estimates keep their curriculum order.
+    """
+    if policy == "longest-first":
+        return sorted(plan, key=lambda entry: estimated_seconds(entry[3]), reverse=True)
+    return list(plan)
@@ -0,0 +1,109 @@
+"""Read the expiry time out of signed media and caption URLs."""
+
+import base64
+import calendar
+import json
+import re
+import time
+from urllib.parse import parse_qsl, urlsplit
+
+# Refresh a signed URL this many seconds before it expires: a long stream must not outlive its signature.
+REFRESH_MARGIN = 5 * 60
+
+_EPOCH_KEYS = {"expires", "exp", "expiry", "expiration"}
+_TOKEN_EXP = re.compile(r"(?:^|[~&])exp=(\d+)")
+# HTTP error text only ("403 (Forbidden)", "HTTP 403", "status code: 403"), not a bare 403 in a progress line.
+_FORBIDDEN = re.compile(r"\b403 \(?Forbidden\b|(?:HTTP|status(?: code)?)\D{0,3}403\b", re.IGNORECASE)
+
+
+def _epoch(value):
+    value = value.strip()
+    if not value.isdigit():
+        return None
+    seconds = int(value)
+    # Some signers use milliseconds.
+    return seconds / 1000 if seconds > 10 ** 11 else float(seconds)
+
+
+def _b64_json(value):
+    value = value.replace("-", "+").replace("_", "/").replace("~", "=")
+    try:
+        return json.loads(base64.b64decode(value + "=" * (-len(value) % 4)))
+    except (ValueError, TypeError):
+        return None
+
+
+def _jwt_expiry(value):
+    parts = value.split(".")
+    if len(parts) != 3:
+        return None
+    payload = _b64_json(parts[1])
+    exp = payload.get("exp") if isinstance(payload, dict) else None
+    return float(exp) if isinstance(exp, (int, float)) else None
+
+
+def _amz_expiry(params):
+    try:
+        signed_at = calendar.timegm(time.strptime(params["x-amz-date"], "%Y%m%dT%H%M%SZ"))
+        return signed_at + int(params["x-amz-expires"])
+    except (KeyError, ValueError):
+        return None
+
+
+def _policy_expiry(value):
+    """CloudFront custom policy: Statement[].Condition.DateLessThan.AWS:EpochTime."""
+    policy = _b64_json(value)
+    if not isinstance(policy, dict):
+        return None
+    times = [statement.get("Condition", {}).get("DateLessThan", {}).get("AWS:EpochTime")
+             for statement in policy.get("Statement", []) if isinstance(statement, dict)]
+    times = [value for value in times if isinstance(value, (int, float))]
+    return float(min(times)) if times else None
+
+
+def expires_at(url):
+    """Return the epoch second at which a signed URL stops working, or None if it carries no expiry."""
+    query = urlsplit(url).query
+    if not query:
+        return None
+    params = {key.lower(): value for key, value in parse_qsl(query, keep_blank_values=True)}
+    found = [_amz_expiry(params)]
+    for key, value in params.items():
+        if key in _EPOCH_KEYS:
+            found.append(_epoch(value))
+        elif key == "policy":
+            found.append(_policy_expiry(value))
+        else:
+            # Tokens such as Akamai's "exp=...~acl=...~hmac=..." or a JWT.
+            match = _TOKEN_EXP.search(value)
+            found.append(float(match.group(1)) if match else _jwt_expiry(value))
+    found = [value for value in found if value is not None]
+    return min(found) if found else None
+
+
+def _urls(value):
+    if isinstance(value, str):
+        if value.startswith(("http://", "https://")):
+            yield value
+    elif isinstance(value, dict):
+        for item in value.values():
+            yield from _urls(item)
+    elif isinstance(value, list):
+        for item in value:
+            yield from _urls(item)
+
+
+def earliest_expiry(body):
+    """Return the first expiry among all signed URLs in an API response."""
+    times = [expiry for expiry in map(expires_at, _urls(body)) if expiry is not None]
+    return min(times) if times else None
+
+
+def expires_soon(body, margin=REFRESH_MARGIN, now=None):
+    expiry = earliest_expiry(body)
+    return expiry is not None and (now or time.time()) + margin >= expiry
+
+
+def forbidden_status(output):
+    """Return 403 when downloader output reports a rejected (usually expired) signature."""
+    return 403 if _FORBIDDEN.search(output or "") else None
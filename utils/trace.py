@@ -0,0 +1,192 @@
+"""Per-lecture timing spans, written as JSON lines and summarized at the end of the run.
+
+Each lecture gets a ``LectureTrace``; code running for that lecture, including its
+pool tasks, records phases with ``span(phase)``. Nothing is written unless
+``configure`` was given a path.
+"""
+
+import contextvars
+import json
+import math
+import threading
+import time
+from contextlib import contextmanager
+
+# Phases in the order a lecture normally goes through them.
+PHASES = ("metadata", "queue", "captions", "assets", "stream", "remux", "cache")
+SLOWEST_SHOWN = 5
+
+_current = contextvars.ContextVar("lecture_trace", default=None)
+_lock = threading.Lock()
+_file = None
+_finished = []
+_started_at = time.monotonic()
+
+
+def configure(path=None):
+    """Write the trace to ``path`` (one JSON object per line); without a path tracing stays off."""
+    global _file, _started_at
+    close()
+    with _lock:
+        _finished.clear()
+        _started_at = time.monotonic()
+        if path:
+            _file = open(path, "w", encoding="utf-8")
+
+
+def enabled():
+    return _file is not None
+
+
+def _write(record):
+    with _lock:
+        if _file is not None:
+            _file.write(json.dumps(record, ensure_ascii=False) + "\n")
+            _file.flush()
+
+
+class LectureTrace:
+    def __init__(self, chapter_index, lecture_index, lecture):
+        self.chapter_index = chapter_index
+        self.lecture_index = lecture_index
+        self.lecture_id = lecture.get('id')
+        self.title = lecture.get('title')
+        self.started = time.monotonic()
+        self.spans = []
+        self._queued = None
+        self._lock = threading.Lock()
+
+    def add(self, phase, start, seconds, size=None):
+        span = {"phase": phase, "start": round(start - _started_at, 3), "seconds": round(seconds, 3)}
+        if size is not None:
+            span["bytes"] = size
+        with self._lock:
+            self.spans.append(span)
+            # Metadata may have been fetched before the trace was created.
+            self.started = min(self.started, start)
+
+    @contextmanager
+    def span(self, phase):
+        """Time the block as ``phase``; set ``"bytes"`` on the yielded dict to record a size."""
+        details = {}
+        start = time.monotonic()
+        try:
+            yield details
+        finally:
+            self.add(phase, start, time.monotonic() - start, details.get("bytes"))
+
+    def enqueue(self):
+        self._queued = time.monotonic()
+
+    def dequeue(self):
+        """Record the time since ``enqueue`` as the queue wait."""
+        if self._queued is not None:
+            now = time.monotonic()
+            self.add("queue", self._queued, now - self._queued)
+            self._queued = None
+
+    def totals(self):
+        with self._lock:
+            spans = list(self.spans)
+        totals = {}
+        for span in spans:
+            totals[span["phase"]] = totals.get(span["phase"], 0) + span["seconds"]
+        return totals
+
+
+def start(chapter_index, lecture_index, lecture):
+    return LectureTrace(chapter_index, lecture_index, lecture)
+
+
+def timed(fn, *args, **kwargs):
+    """Call ``fn`` and return ``(result, start, seconds)`` so the timing can be added to a trace later."""
+    start_time = time.monotonic()
+    result = fn(*args, **kwargs)
+    return result, start_time, time.monotonic() - start_time
+
+
+@contextmanager
+def active(lecture_trace):
+    """Make ``lecture_trace`` the target of ``span`` in this context and in pool tasks submitted from it."""
+    token = _current.set(lecture_trace)
+    try:
+        yield lecture_trace
+    finally:
+        _current.reset(token)
+
+
+def current():
+    return _current.get()
+
+
+@contextmanager
+def span(phase):
+    """Time the block as ``phase`` of the active lecture; a no-op outside one."""
+    lecture_trace = _current.get()
+    if lecture_trace is None:
+        yield {}
+        return
+    with lecture_trace.span(phase) as details:
+        yield details
+
+
+def finish(lecture_trace, record=None):
+    """Write the lecture's spans with its cache record's status and final file size."""
+    if lecture_trace is None or not enabled():
+        return
+    seconds = time.monotonic() - lecture_trace.started
+    totals = lecture_trace.totals()
+    size = (record or {}).get("file_size") or None
+    entry = {
+        "event": "lecture", "chapter": lecture_trace.chapter_index, "lecture": lecture_trace.lecture_index,
+        "id": lecture_trace.lecture_id, "title": lecture_trace.title,
+        "status": (record or {}).get("status") or "skipped", "seconds": round(seconds, 3), "bytes": size,
+        "stream_bytes_per_second": round(size / totals["stream"]) if size and totals.get("stream") else None,
+        "spans": lecture_trace.spans,
+    }
+    with _lock:
+        _finished.append({"title": entry["title"], "seconds": seconds, "totals": totals})
+    _write(entry)
+
+
+def percentile(values, fraction):
+    """Nearest-rank percentile of a non-empty list."""
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(fraction * len(ordered)) - 1)]
+
+
+def summary():
+    """Per-phase p50/p95/total over the finished lectures and the slowest lectures."""
+    with _lock:
+        finished = list(_finished)
+    phases = {}
+    for phase in PHASES:
+        values = [lecture["totals"][phase] for lecture in finished if phase in lecture["totals"]]
+        if values:
+            phases[phase] = {"lectures": len(values), "p50": round(percentile(values, 0.5), 3),
+                             "p95": round(percentile(values, 0.95), 3), "total": round(sum(values), 3)}
+    slowest = sorted(finished, key=lambda lecture: lecture["seconds"], reverse=True)[:SLOWEST_SHOWN]
+    return {"event": "summary", "lectures": len(finished), "phases": phases,
+            "slowest": [{"title": lecture["title"], "seconds": round(lecture["seconds"], 3)} for lecture in slowest]}
+
+
+def report():
+    """Append the summary to the trace, close it and return the summary as log lines."""
+    if not enabled():
+        return []
+    result = summary()
+    _write(result)
+    close()
+    lines = [f"Timing over {result['lectures']} lectures (seconds per lecture):"]
+    lines += [f"  {phase:<9} p50 {stats['p50']:>8.2f}  p95 {stats['p95']:>8.2f}  total {stats['total']:>9.1f}  ({stats['lectures']} lectures)"
+              for phase, stats in result["phases"].items()]
+    lines += [f"  slowest: {lecture['title']} ({lecture['seconds']:.1f}s)" for lecture in result["slowest"]]
+    return lines
+
+
+def close():
+    global _file
+    with _lock:
+        trace_file, _file = _file, None
+    if trace_file is not None:
+        trace_file.close()
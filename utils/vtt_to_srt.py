@@ -0,0 +1,75 @@
+"""Single-pass WebVTT to SRT conversion straight from the downloaded bytes.
+
+Produces the same output as ``webvtt.read(path).save_as_srt(...)`` without the
+temporary file or the intermediate caption objects.
+"""
+
+import re
+
+_TIMING = re.compile(r"^\s*((?:\d+:)?\d{1,2}:\d{2}[.,]\d{3})\s+-->\s+((?:\d+:)?\d{1,2}:\d{2}[.,]\d{3})")
+_TAGS = re.compile("<.*?>")
+
+
+def _timestamp(value):
+    clock, _, millis = value.replace(",", ".").partition(".")
+    parts = clock.split(":")
+    if len(parts) == 2:
+        parts.insert(0, "00")
+    hours, minutes, seconds = parts
+    return f"{int(hours):02d}:{minutes}:{seconds},{millis}"
+
+
+def iter_srt(lines):
+    """Yield SRT text for an iterable of WebVTT lines (without line endings), one cue at a time."""
+    index = 0
+    lines = iter(lines)
+    first = next(lines, "")
+    if not first.lstrip("\ufeff").startswith("WEBVTT"):
+        raise ValueError("Not a WebVTT file: missing the WEBVTT header.")
+    # The header is an ordinary block: a timing line right under WEBVTT makes it a cue.
+    block = [first]
+    for line in lines:
+        if line.strip():
+            block.append(line)
+            continue
+        if block:
+            index, chunk = _cue(block, index)
+            if chunk:
+                yield chunk
+            block = []
+    if block:
+        index, chunk = _cue(block, index)
+        if chunk:
+            yield chunk
+
+
+def _timing(block):
+    """The timing match of a cue block, or None for NOTE/STYLE/REGION blocks and cues without text."""
+    # An optional identifier line may precede the timing line.
+    if len(block) >= 2 and "-->" not in block[1]:
+        match = _TIMING.match(block[0])
+        if match:
+            return match, 1
+    if len(block) >= 3 and "-->" not in block[0] and "-->" not in block[2]:
+        match = _TIMING.match(block[1])
+        if match:
+            return match, 2
+    return None, None
+
+
+def _cue(block, index):
+    match, text_start = _timing(block)
+    if match is None:
+        return index, None
+    index += 1
+    start, end = (_timestamp(value) for value in match.groups())
+    # Tags are stripped from the whole text, so a cue that was only tags keeps no text lines.
+    text = _TAGS.sub("", "\n".join(block[text_start:])).splitlines()
+    separator = "\n\n" if index > 1 else ""
+    return index, separator + "\n".join([str(index), f"{start} --> {end}", *text])
+
+
+def vtt_to_srt(data):
+    """Convert WebVTT bytes to SRT bytes."""
+    text = data.decode("utf-8-sig", errors="replace")
+    return "".join(iter_srt(text.splitlines())).rstrip().encode("utf-8")